@@ -1,43 +1,108 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
 from brownie import *
 from tabulate import tabulate
 from rich.console import Console
-from helpers.multicall import Multicall
+from eth_utils import to_checksum_address
+from helpers.multicall import MISSING, Call, Multicall, func
+from helpers.multicall.cache import CallCache
+from helpers.multicall.multicall import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS
 from helpers.utils import val
 
-from helpers.snapshot.snap import Snap
+from helpers.snapshot.holders import HolderBalances, holder_calls
+from helpers.snapshot.profiler import ActionProfiler
+from helpers.snapshot.receipt import dirty_from_logs
+from helpers.snapshot.render import ConsoleSink, NullSink, changed_rows
+from helpers.snapshot.snap import Snap, SnapSchema
+from helpers.snapshot.store import SnapStore
 
 from _setup.StrategyResolver import StrategyResolver
 
 console = Console()
 
+## "chain:sett:strategy" -> immutable setup values, see SnapshotManager.fetch_setup
+_setup_cache = {}
+
 
 class SnapshotManager:
-    def __init__(self, sett, strategy, key):
+    def __init__(
+        self,
+        sett,
+        strategy,
+        key,
+        allow_failure=False,
+        derive_before=False,
+        access_mode=None,
+        incremental=False,
+        window=None,
+        store_path=None,
+        sink=None,
+        setup_cache=None,
+        profile=False,
+    ):
         self.key = key
+        ## Per phase timings of every settX call, see profiler.report()
+        self.profiler = ActionProfiler() if profile else None
+        if self.profiler is not None:
+            self.profiler.attach(web3)
+        ## If True, reverting views are recorded as MISSING instead of failing the snap
+        self.allow_failure = allow_failure
+        ## If True, the tx is sent first and before / after are snapped from its parent block / block
+        self.derive_before = derive_before
+        ## If True, after snaps only refetch what the tx logs show may have changed
+        self.incremental = incremental
+        ## None, "record", "replay" or "strict", see snap_tx
+        self.access_mode = access_mode
+        ## action -> keys read by its confirm_* checks
+        self.access_profiles = {}
+        ## Call outputs by block, checked against the block hash so reverts don't go stale
+        self.cache = CallCache()
         self.sett = sett
         self.strategy = strategy
-        self.want = interface.IERC20Detailed(self.sett.token())
-        self.resolver = self.init_resolver(self.strategy.getName())
-        self.snaps = {}
+        ## Every address / name needed below, read in one multicall
+        setup = self.fetch_setup(setup_cache)
+        self.want = interface.IERC20Detailed(setup["sett.token"])
+        self.resolver = self.init_resolver(setup["strategy.getName"])
+        ## Where printCompare / printTable go, NullSink() to skip rendering,
+        ## BackgroundSink(sink) to render on another thread
+        self.sink = sink if sink is not None else ConsoleSink()
+        ## Keys are interned once and shared by every Snap
+        self.schema = SnapSchema()
+        ## Only the last `window` snaps stay in memory, older ones go to SQLite at store_path
+        self.snaps = SnapStore(self.schema, window, store_path)
         self.settSnaps = {}
         self.entities = {}
 
         # custom test
         # IERC20 address
-        self.esgmx = interface.IERC20Detailed(self.strategy.ESGMX())
-        self.stakedGmxTracker = interface.IERC20Detailed(self.strategy.stakedGmxTracker())
-        self.feeGmxTracker = interface.IERC20Detailed(self.strategy.feeGmxTracker())
-        self.GmxVester = interface.IERC20Detailed(self.strategy.GmxVester())
-        self.weth = interface.IERC20Detailed(self.strategy.WETH())
-
-        assert self.want == self.strategy.want()
+        self.esgmx = interface.IERC20Detailed(setup["strategy.ESGMX"])
+        self.stakedGmxTracker = interface.IERC20Detailed(setup["strategy.stakedGmxTracker"])
+        self.feeGmxTracker = interface.IERC20Detailed(setup["strategy.feeGmxTracker"])
+        self.GmxVester = interface.IERC20Detailed(setup["strategy.GmxVester"])
+        self.weth = interface.IERC20Detailed(setup["strategy.WETH"])
+
+        # tokenKey used in balances.<tokenKey>.<entityKey> -> token
+        self.tokens = {
+            "want": self.want,
+            "sett": self.sett,
+            "esgmx": self.esgmx,
+            "stakedGmxTracker": self.stakedGmxTracker,
+            "feeGmxTracker": self.feeGmxTracker,
+            "GmxVester": self.GmxVester,
+            "weth": self.weth,
+        }
+
+        assert self.want.address == setup["strategy.want"]
 
         # Common entities for all strategies
         self.addEntity("sett", self.sett.address)
         self.addEntity("strategy", self.strategy.address)
-        self.addEntity("governance", self.strategy.governance())
-        self.addEntity("treasury", self.sett.treasury())
-        self.addEntity("strategist", self.strategy.strategist())
+        self.addEntity("governance", setup["strategy.governance"])
+        self.addEntity("treasury", setup["sett.treasury"])
+        self.addEntity("strategist", setup["strategy.strategist"])
 
         # custom test
         # self.addEntity("sgTracker", self.stakedGmxTracker.address)
@@ -46,6 +111,60 @@ class SnapshotManager:
         for key, dest in destinations.items():
             self.addEntity(key, dest)
 
+    def setup_calls(self, immutable=True):
+        """
+        Calls for what the manager reads at construction
+        Immutable ones (token, name, strategy constants) can be cached, the roles can't
+        """
+        sett = self.sett.address
+        strategy = self.strategy.address
+        calls = [
+            Call(sett, [func.sett.treasury], [["sett.treasury", None]]),
+            Call(strategy, [func.strategy.governance], [["strategy.governance", None]]),
+            Call(strategy, [func.strategy.strategist], [["strategy.strategist", None]]),
+        ]
+        if immutable:
+            calls += [
+                Call(sett, [func.sett.token], [["sett.token", None]]),
+                Call(strategy, [func.strategy.getName], [["strategy.getName", None]]),
+                Call(strategy, [func.strategy.want], [["strategy.want", None]]),
+            ]
+            calls += [
+                Call(strategy, [signature], [["strategy." + name, None]])
+                for name, signature in func.gmxStrategy.items()
+            ]
+        return calls
+
+    def fetch_setup(self, setup_cache=None):
+        """
+        Reads every address the manager needs in a single multicall
+        Immutable values are kept per (chain, sett, strategy) in the process,
+        and in the JSON file setup_cache if given
+        """
+        key = "{}:{}:{}".format(chain.id, self.sett.address, self.strategy.address)
+        if key not in _setup_cache and setup_cache and os.path.exists(setup_cache):
+            with open(setup_cache) as file:
+                _setup_cache.update(json.load(file))
+
+        cached = _setup_cache.get(key)
+        setup = Multicall(self.setup_calls(immutable=cached is None))()
+        if cached is None:
+            cached = {
+                name: value
+                for name, value in setup.items()
+                if name not in ("sett.treasury", "strategy.governance", "strategy.strategist")
+            }
+            _setup_cache[key] = cached
+            if setup_cache:
+                with open(setup_cache, "w") as file:
+                    json.dump(_setup_cache, file, indent=2)
+        setup.update(cached)
+
+        return {
+            name: to_checksum_address(value) if name != "strategy.getName" else value
+            for name, value in setup.items()
+        }
+
     def add_snap_calls(self, entities):
         calls = []
         calls = self.resolver.add_balances_snap(calls, entities)
@@ -58,9 +177,45 @@ class SnapshotManager:
         
         return calls
 
-    def snap(self, trackedUsers=None):
+    def resolve_block(self, block):
+        """
+        (block number, block to call at) for a block number or hash, the current height if None
+        A hash is passed to eth_call as an EIP-1898 {"blockHash": ...} so every call reads
+        that exact block, the number only labels the snap
+        """
+        if block is None:
+            block = chain.height
+        if isinstance(block, int):
+            return block, block
+        if not isinstance(block, str):
+            block = "0x" + bytes(block).hex()
+        return web3.eth.get_block(block).number, {"blockHash": block}
+
+    def fetch(self, calls, block):
+        if isinstance(block, int):
+            ## After chain.revert / undo the number can be another block
+            self.cache.check(chain.id, block, web3.eth.get_block(block).hash)
+        multi = Multicall(
+            calls,
+            block=block,
+            require_success=not self.allow_failure,
+            cache=self.cache,
+        )
+        # multi.printCalls()
+        data = multi()
+        if self.profiler is not None:
+            self.profiler.add_rpc(multi.stats)
+        return data
+
+    def snap(self, trackedUsers=None, block=None, keys=None, strict=False):
+        """
+        Snapshot at block (number or hash), defaults to the current height
+        Every multicall is pinned to that block so the snap is consistent
+        If keys is set only calls returning those keys are fetched, reading any other key
+        loads the rest of the snap, or raises if strict
+        """
         print("snap")
-        snapBlock = chain.height
+        snapBlock, callBlock = self.resolve_block(block)
         entities = self.entities
 
         if trackedUsers:
@@ -68,116 +223,334 @@ class SnapshotManager:
                 entities[key] = user
 
         calls = self.add_snap_calls(entities)
-        multi = Multicall(calls)
-        # multi.printCalls()
-
-        data = multi()
-        self.snaps[snapBlock] = Snap(
+        loader = None
+        if keys is not None:
+            allCalls = calls
+            calls = [
+                call for call in calls if any(name in keys for name, _ in call.returns)
+            ]
+            if not strict:
+
+                def loader():
+                    ## Reads of keys that weren't requested, profiled on their own
+                    with self.phase("load"):
+                        return self.fetch(allCalls, callBlock)
+
+        data = self.fetch(calls, callBlock)
+        snap = Snap(
             data,
             snapBlock,
             [x[0] for x in entities.items()],
+            loader=loader,
+            strict=strict,
+            schema=self.schema,
         )
+        self.snaps[snapBlock] = snap
+
+        missing = snap.missing() if self.allow_failure else []
+        if missing:
+            console.print(
+                "[yellow]Missing values at block {}: {}[/yellow]".format(
+                    snapBlock, ", ".join(missing)
+                )
+            )
 
-        return self.snaps[snapBlock]
+        return snap
+
+    def snap_range(
+        self,
+        blocks,
+        trackedUsers=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        keys=None,
+        strict=False,
+    ):
+        """
+        Historical snaps for many blocks fetched concurrently, needs an archive node
+        Returns {block: Snap} ordered like blocks
+        """
+        blocks = list(blocks)
+        if trackedUsers:
+            for key, user in trackedUsers.items():
+                self.entities[key] = user
+
+        workers = max(1, min(max_workers, len(blocks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            snaps = list(
+                executor.map(
+                    lambda block: self.snap(block=block, keys=keys, strict=strict),
+                    blocks,
+                )
+            )
+        return {snap.block: snap for snap in snaps}
+
+    def snap_holders(self, holders, block=None, tokens=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        balanceOf of every holder for every token in self.tokens (or the given tokenKeys)
+        holders can be any iterable, it is consumed chunk_size addresses at a time and
+        each chunk is one chunked multicall pinned to the same block
+        Unlike snap, holders are not added to self.entities and nothing is cached
+        Returns a HolderBalances matrix
+        """
+        snapBlock, callBlock = self.resolve_block(block)
+        tokens = {
+            tokenKey: self.tokens[tokenKey].address
+            for tokenKey in (tokens if tokens is not None else self.tokens)
+        }
+        result = HolderBalances(snapBlock, tokens)
+
+        def flush(chunk):
+            offset = len(result)
+            added = result.add_holders(chunk)
+            if added:
+                multi = Multicall(
+                    holder_calls(tokens, added, offset),
+                    block=callBlock,
+                    chunk_size=chunk_size,
+                    require_success=not self.allow_failure,
+                )
+                result.fill(multi())
+                if self.profiler is not None:
+                    self.profiler.add_rpc(multi.stats)
+
+        chunk = []
+        for holder in holders:
+            chunk.append(holder)
+            if len(chunk) == chunk_size:
+                flush(chunk)
+                chunk = []
+        flush(chunk)
+        return result
 
     def addEntity(self, key, entity):
         self.entities[key] = entity
 
+    def close(self):
+        """
+        Closes the sink and the snap store, a temporary spill file is deleted
+        Stops the profiler counting requests sent through web3
+        """
+        if hasattr(self.sink, "close"):
+            self.sink.close()
+        self.snaps.close()
+        if self.profiler is not None:
+            self.profiler.detach()
+
     def init_resolver(self, name):
         print("init_resolver", name)
         return StrategyResolver(self)
 
+    def snap_after(self, before, tx, trackedUsers=None):
+        """
+        Snap at the block of tx, built from before and the tx receipt logs
+        Balances untouched by a Transfer / staking / vesting log are copied from before,
+        every sett and strategy metric is refetched
+        """
+        snapBlock = tx.block_number
+        entities = self.entities
+
+        if trackedUsers:
+            for key, user in trackedUsers.items():
+                entities[key] = user
+
+        dirty = dirty_from_logs(tx.logs)
+        calls = [
+            call for call in self.add_snap_calls(entities) if dirty.needs_refetch(call)
+        ]
+
+        snap = Snap({}, snapBlock, [x[0] for x in entities.items()], schema=self.schema)
+        snap.values = list(before.values)
+        for key, value in self.fetch(calls, snapBlock).items():
+            snap.set(key, value)
+        self.snaps[snapBlock] = snap
+        return snap
+
+    def profile(self, action):
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.action(action)
+
+    def phase(self, name):
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def snap_around(self, tx, trackedUsers=None, keys=None, strict=False):
+        """
+        Snaps the parent block and the block of tx concurrently
+        Matches snapping before and after sending tx as long as tx is alone in its block
+        """
+        block = tx.block_number
+        snaps = self.snap_range([block - 1, block], trackedUsers, keys=keys, strict=strict)
+        return snaps[block - 1], snaps[block]
+
+    def snap_tx(self, send, trackedUsers, action=None):
+        """
+        Returns before, tx, after for the transaction sent by send()
+        With access_mode set, the keys read from the snaps are recorded per action,
+        and in "replay" / "strict" mode later snaps for the action only fetch those keys
+        """
+        keys = None
+        strict = self.access_mode == "strict"
+        if self.access_mode in ("replay", "strict"):
+            keys = self.access_profiles.get(action)
+
+        if self.incremental and keys is None:
+            if self.derive_before:
+                with self.phase("tx"):
+                    tx = send()
+                with self.phase("before"):
+                    before = self.snap(trackedUsers, block=tx.block_number - 1)
+            else:
+                with self.phase("before"):
+                    before = self.snap(trackedUsers)
+                with self.phase("tx"):
+                    tx = send()
+            with self.phase("after"):
+                after = self.snap_after(before, tx, trackedUsers)
+        elif self.derive_before:
+            with self.phase("tx"):
+                tx = send()
+            with self.phase("snaps"):
+                before, after = self.snap_around(tx, trackedUsers, keys, strict)
+        else:
+            with self.phase("before"):
+                before = self.snap(trackedUsers, keys=keys, strict=strict)
+            with self.phase("tx"):
+                tx = send()
+            with self.phase("after"):
+                after = self.snap(trackedUsers, keys=keys, strict=strict)
+
+        if self.profiler is not None:
+            self.profiler.add_tx(tx)
+        if self.access_mode is not None:
+            accessed = self.access_profiles.setdefault(action, set())
+            before.accessed = accessed
+            after.accessed = accessed
+        return before, tx, after
+
     def settTend(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        before = self.snap(trackedUsers)
-        tx = self.strategy.tend(overrides)
-        after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_tend(before, after, tx)
+        with self.profile("tend"):
+            before, tx, after = self.snap_tx(
+                lambda: self.strategy.tend(overrides), trackedUsers, "tend"
+            )
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_tend(before, after, tx)
 
     def settHarvest(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        before = self.snap(trackedUsers)
-        tx = self.strategy.harvest(overrides)
-        after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_harvest(before, after, tx)
+        with self.profile("harvest"):
+            before, tx, after = self.snap_tx(
+                lambda: self.strategy.harvest(overrides), trackedUsers, "harvest"
+            )
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_harvest(before, after, tx)
 
     def settDeposit(self, amount, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        before = self.snap(trackedUsers)
-        self.sett.deposit(amount, overrides)
-        after = self.snap(trackedUsers)
-
-        if confirm:
-            self.resolver.confirm_deposit(
-                before, after, {"user": user, "amount": amount}
+        with self.profile("deposit"):
+            before, tx, after = self.snap_tx(
+                lambda: self.sett.deposit(amount, overrides), trackedUsers, "deposit"
             )
 
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_deposit(
+                        before, after, {"user": user, "amount": amount}
+                    )
+
     def settDepositAll(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        userBalance = self.want.balanceOf(user)
-        before = self.snap(trackedUsers)
-        self.sett.depositAll(overrides)
-        after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_deposit(
-                before, after, {"user": user, "amount": userBalance}
+        with self.profile("depositAll"):
+            before, tx, after = self.snap_tx(
+                lambda: self.sett.depositAll(overrides), trackedUsers, "depositAll"
             )
+            userBalance = before.balances("want", "user")
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_deposit(
+                        before, after, {"user": user, "amount": userBalance}
+                    )
 
     def settEarn(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        before = self.snap(trackedUsers)
-        self.sett.earn(overrides)
-        after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_earn(before, after, {"user": user})
+        with self.profile("earn"):
+            before, tx, after = self.snap_tx(
+                lambda: self.sett.earn(overrides), trackedUsers, "earn"
+            )
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_earn(before, after, {"user": user})
 
     def settWithdraw(self, amount, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        before = self.snap(trackedUsers)
-        tx = self.sett.withdraw(amount, overrides)
-        after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_withdraw(
-                before, after, {"user": user, "amount": amount}, tx
+        with self.profile("withdraw"):
+            before, tx, after = self.snap_tx(
+                lambda: self.sett.withdraw(amount, overrides), trackedUsers, "withdraw"
             )
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_withdraw(
+                        before, after, {"user": user, "amount": amount}, tx
+                    )
 
     def settWithdrawAll(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
-        userBalance = self.sett.balanceOf(user)
-        before = self.snap(trackedUsers)
-        tx = self.sett.withdraw(userBalance, overrides)
-        after = self.snap(trackedUsers)
-
-        if confirm:
-            self.resolver.confirm_withdraw(
-                before, after, {"user": user, "amount": userBalance}, tx
+        with self.profile("withdrawAll"):
+            userBalance = self.sett.balanceOf(user)
+            before, tx, after = self.snap_tx(
+                lambda: self.sett.withdraw(userBalance, overrides),
+                trackedUsers,
+                "withdrawAll",
             )
 
+            if confirm:
+                with self.phase("confirm"):
+                    self.resolver.confirm_withdraw(
+                        before, after, {"user": user, "amount": userBalance}, tx
+                    )
+
     def format(self, key, value):
-        if type(value) is int:
-            if "stakingRewards.staked" or "stakingRewards.earned" in key:
-                return val(value)
-            # Ether-scaled balances
-            # TODO: Handle based on token decimals
-            if (
-                "balance" in key
-                or key == "sett.available"
-                or key == "sett.getPricePerFullShare"
-                or key == "sett.totalSupply"
-            ):
-                return val(value)
+        if type(value) is not int:
+            return value
+
+        # Token balances, scaled by the decimals of their token
+        parts = key.split(".")
+        if parts[0] in ("balances", "shares") and parts[1] in self.tokens:
+            return val(value, token=self.tokens[parts[1]])
+        if parts[0] == "depositBalances":
+            return val(value, token=self.want)
+
+        # Amounts of want, and vault shares
+        if key in (
+            "sett.balance",
+            "sett.available",
+            "strategy.balanceOf",
+            "strategy.balanceOfPool",
+            "strategy.balanceOfWant",
+        ):
+            return val(value, token=self.want)
+        if key == "sett.totalSupply":
+            return val(value, token=self.sett)
+        if key == "sett.getPricePerFullShare":
+            return val(value)
+
+        # Fees in bps, timestamps, decimals
         return value
 
     def diff(self, a, b):
+        if a is MISSING or b is MISSING:
+            return MISSING
         if type(a) is int and type(b) is int:
             return b - a
         else:
@@ -185,34 +558,14 @@ class SnapshotManager:
 
     def printCompare(self, before: Snap, after: Snap):
         # self.printPermissions()
-        table = []
-        console.print(
-            "[green]=== Compare: {} Sett {} -> {} ===[/green]".format(
-                self.key, before.block, after.block
-            )
-        )
-
-        for key, item in before.data.items():
-
-            a = item
-            b = after.get(key)
-
+        if isinstance(self.sink, NullSink):
+            return
+        with self.phase("compare"):
             # Don't add items that don't change
-            if a != b:
-                table.append(
-                    [
-                        key,
-                        self.format(key, a),
-                        self.format(key, b),
-                        self.format(key, self.diff(a, b)),
-                    ]
-                )
-
-        print(
-            tabulate(
-                table, headers=["metric", "before", "after", "diff"], tablefmt="grid"
-            )
-        )
+            rows = changed_rows(before, after)
+            ## The rows shown are read too, so replays still fetch them
+            before.mark_read([metric for metric, _, _ in rows])
+            self.sink.compare(self.key, before, after, rows, self.format, self.diff)
 
     def printPermissions(self):
         # Accounts
@@ -246,14 +599,13 @@ class SnapshotManager:
 
     def printTable(self, snap: Snap):
         # Numerical Data
-        table = []
-        console.print("[green]=== Status Report: {} Sett ===[green]".format(self.key))
-
-        for key, item in snap.data.items():
+        if isinstance(self.sink, NullSink):
+            return
+        rows = [
+            (key, item)
+            for key, item in snap.data.items()
             # Don't display 0 balances:
-            if "balances" in key and item == 0:
-                continue
-            table.append([key, self.format(key, item)])
-
-        table.append(["---------------", "--------------------"])
-        print(tabulate(table, headers=["metric", "value"]))
+            if not ("balances" in key and item == 0)
+        ]
+        snap.mark_read([metric for metric, _ in rows])
+        self.sink.table(self.key, snap, rows, self.format)
@@ -12,10 +12,14 @@ from helpers.utils import (
 )
 from helpers.constants import *
 from helpers.multicall import Call, as_wei, func
+from helpers.multicall.calldata import CalldataTemplate
 from rich.console import Console
 
 console = Console()
 
+balanceOfTemplate = CalldataTemplate(func.erc20.balanceOf)
+sharesOfTemplate = CalldataTemplate(func.digg.sharesOf)
+
 
 class StrategyCoreResolver:
     def __init__(self, manager):
@@ -23,29 +27,34 @@ class StrategyCoreResolver:
 
     # ===== Read strategy data =====
 
-    def add_entity_shares_for_tokens(self, calls, tokenKey, token, entities):
-        for entityKey, entity in entities.items():
+    def add_entity_calls_for_token(self, calls, template, keyPrefix, token, entities):
+        """
+        Adds one call per entity, splicing each entity address into the calldata template
+        """
+        target = token.address
+        for (entityKey, entity), data in zip(
+            entities.items(), template.render_many(entities.values())
+        ):
             calls.append(
                 Call(
-                    token.address,
-                    [func.digg.sharesOf, entity],
-                    [["shares." + tokenKey + "." + entityKey, as_wei]],
+                    target,
+                    [template.signature.signature, entity],
+                    [[keyPrefix + entityKey, as_wei]],
+                    data=data,
                 )
             )
 
         return calls
 
-    def add_entity_balances_for_tokens(self, calls, tokenKey, token, entities):
-        for entityKey, entity in entities.items():
-            calls.append(
-                Call(
-                    token.address,
-                    [func.erc20.balanceOf, entity],
-                    [["balances." + tokenKey + "." + entityKey, as_wei]],
-                )
-            )
+    def add_entity_shares_for_tokens(self, calls, tokenKey, token, entities):
+        return self.add_entity_calls_for_token(
+            calls, sharesOfTemplate, "shares." + tokenKey + ".", token, entities
+        )
 
-        return calls
+    def add_entity_balances_for_tokens(self, calls, tokenKey, token, entities):
+        return self.add_entity_calls_for_token(
+            calls, balanceOfTemplate, "balances." + tokenKey + ".", token, entities
+        )
 
     # custom test
     def add_sgTracker_snap(self, calls, sgTrackerAddr, addrA, addrB, tokenKey):
@@ -98,7 +107,12 @@ class StrategyCoreResolver:
             )
         )
         calls.append(
-            Call(sett.address, [func.erc20.decimals], [["sett.decimals", as_wei]])
+            Call(
+                sett.address,
+                [func.erc20.decimals],
+                [["sett.decimals", as_wei]],
+                immutable=True,
+            )
         )
         calls.append(
             Call(sett.address, [func.erc20.totalSupply], [["sett.totalSupply", as_wei]])
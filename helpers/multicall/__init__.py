@@ -4,7 +4,17 @@ https://github.com/banteg/multicall.py
 """
 __version__ = "0.1.1"
 
-from helpers.multicall.signature import Signature
+from helpers.multicall.signature import Signature, get_signature
 from helpers.multicall.call import Call
 from helpers.multicall.multicall import Multicall
 from helpers.multicall.functions import func, as_wei
+from helpers.multicall.constants import MISSING
+
+
+def __getattr__(name):
+    ## AsyncMulticall needs aiohttp, which brownie doesn't install, so it's imported on first use
+    if name in ("AsyncMulticall", "AsyncRPC"):
+        from helpers.multicall import async_multicall
+
+        return getattr(async_multicall, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,159 @@
+import asyncio
+from itertools import count
+from typing import List
+
+import aiohttp
+from brownie import web3
+
+from helpers.multicall import Call
+from helpers.multicall.batch import build_batch, parse_batch, to_block_param
+from helpers.multicall.decoding import decode_outputs
+from helpers.multicall.multicall import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_GAS_PER_CALL,
+    aggregate_tx,
+    aggregator_for,
+    chunk_calls,
+    deployed_aggregators,
+    parse_aggregate,
+)
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_TIMEOUT = 60
+
+
+class RPCError(Exception):
+    pass
+
+
+class AsyncRPC:
+    """
+    JSON-RPC client over a persistent aiohttp connection pool
+    Share one instance between AsyncMulticalls to reuse connections
+
+    async with AsyncRPC(endpoint) as rpc:
+        data = await AsyncMulticall(calls, rpc)()
+    """
+
+    def __init__(self, endpoint=None, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.endpoint = endpoint or web3.provider.endpoint_uri
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+        self._ids = count(1)
+        self._chain_id = None
+
+    def _session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def post(self, payload):
+        async with self._session().post(self.endpoint, json=payload) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def request(self, method, params):
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        body = await self.post(payload)
+        if body.get("error"):
+            raise RPCError("{} failed: {}".format(method, body["error"]))
+        return body["result"]
+
+    async def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = int(await self.request("eth_chainId", []), 16)
+        return self._chain_id
+
+    async def block_number(self):
+        return int(await self.request("eth_blockNumber", []), 16)
+
+    async def eth_call(self, tx, block=None):
+        result = await self.request("eth_call", [tx, to_block_param(block)])
+        return bytes.fromhex(result[2:])
+
+    async def aggregator(self, require_success=True):
+        """
+        Async get_aggregator, None if the chain has no aggregator deployed
+        """
+        chain_id = await self.chain_id()
+        address = aggregator_for(chain_id, require_success)
+        if address is None:
+            return None
+        key = (chain_id, address)
+        if key not in deployed_aggregators:
+            code = await self.request("eth_getCode", [address, "latest"])
+            deployed_aggregators[key] = code not in ("0x", "0x0")
+        return address if deployed_aggregators[key] else None
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncMulticall:
+    """
+    asyncio counterpart of Multicall, chunks are awaited concurrently on one event loop
+    """
+
+    def __init__(
+        self,
+        calls: List[Call],
+        rpc: AsyncRPC,
+        block=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        gas_limit=None,
+        gas_per_call=DEFAULT_GAS_PER_CALL,
+        require_success=True,
+    ):
+        self.calls = calls
+        self.rpc = rpc
+        self.block = block
+        self.chunk_size = chunk_size
+        self.gas_limit = gas_limit
+        self.gas_per_call = gas_per_call
+        self.require_success = require_success
+
+    async def aggregate(self, calls, block, address):
+        if address is None:
+            body = await self.rpc.post(build_batch(calls, block, self.gas_limit))
+            successes, outputs = parse_batch(calls, body, self.require_success)
+            return (None if self.require_success else successes), outputs
+
+        tx = aggregate_tx(calls, address, self.require_success, self.gas_limit)
+        output = await self.rpc.eth_call(tx, block)
+        return parse_aggregate(output, self.require_success)
+
+    async def __call__(self):
+        address = await self.rpc.aggregator(self.require_success)
+        chunks = chunk_calls(
+            self.calls, self.chunk_size, self.gas_limit, self.gas_per_call
+        )
+
+        ## All chunks, and every eth_call of a batch, must read the same state
+        block = self.block
+        if block is None and (len(chunks) > 1 or address is None):
+            block = await self.rpc.block_number()
+
+        if len(chunks) <= 1:
+            chunks = [self.calls]
+            outputs = [await self.aggregate(self.calls, block, address)]
+        else:
+            outputs = await asyncio.gather(
+                *[self.aggregate(chunk, block, address) for chunk in chunks]
+            )
+
+        result = {}
+        for chunk, (successes, chunk_outputs) in zip(chunks, outputs):
+            decode_outputs(chunk, chunk_outputs, result, successes)
+        return result
@@ -0,0 +1,92 @@
+from threading import Lock
+
+import requests
+from brownie import web3
+
+DEFAULT_TIMEOUT = 60
+
+_session = None
+_session_lock = Lock()
+
+
+class BatchCallError(Exception):
+    pass
+
+
+def to_block_param(block):
+    if block is None:
+        return "latest"
+    if isinstance(block, int):
+        return hex(block)
+    return block
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+def rpc_tx(to, data, gas=None):
+    """
+    eth_call transaction object with its fields hex encoded for JSON-RPC
+    """
+    tx = {"to": to, "data": "0x" + data.hex()}
+    if gas:
+        tx["gas"] = hex(gas)
+    return tx
+
+
+def build_batch(calls, block, gas=None):
+    block_param = to_block_param(block)
+    return [
+        {
+            "jsonrpc": "2.0",
+            "id": i,
+            "method": "eth_call",
+            "params": [rpc_tx(call.target, call.data, gas), block_param],
+        }
+        for i, call in enumerate(calls)
+    ]
+
+
+def parse_batch(calls, body, require_success=True):
+    """
+    Returns (successes, outputs) ordered like calls, whatever order the node answered in
+    """
+    if not isinstance(body, list):
+        raise BatchCallError("Node did not accept the batch: {}".format(body))
+
+    by_id = {item.get("id"): item for item in body}
+    successes = []
+    outputs = []
+    for i, call in enumerate(calls):
+        item = by_id.get(i)
+        if item is None or "error" in item:
+            if require_success:
+                error = item["error"] if item else "no response"
+                raise BatchCallError(
+                    "{} on {} failed: {}".format(call.function, call.target, error)
+                )
+            successes.append(False)
+            outputs.append(b"")
+        else:
+            successes.append(True)
+            outputs.append(bytes.fromhex(item["result"][2:]))
+    return successes, outputs
+
+
+def batch_eth_call(calls, block, gas=None, require_success=True, endpoint=None):
+    """
+    Sends one eth_call per call in a single JSON-RPC batch request
+    Used when no aggregator contract is available on the chain
+    """
+    response = get_session().post(
+        endpoint or web3.provider.endpoint_uri,
+        json=build_batch(calls, block, gas),
+        timeout=DEFAULT_TIMEOUT,
+    )
+    response.raise_for_status()
+    return parse_batch(calls, response.json(), require_success)
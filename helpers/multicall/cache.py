@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from threading import Lock
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def block_key(block):
+    """
+    What a block is cached under: its number, or its hash for EIP-1898 {"blockHash": ...}
+    None for "latest" and other tags, which are never cached
+    """
+    if isinstance(block, int):
+        return block
+    if isinstance(block, dict) and "blockHash" in block:
+        return block["blockHash"]
+    return None
+
+
+class CallCache:
+    """
+    LRU cache of raw call outputs keyed on (chain id, block, target, calldata)
+    Calls marked immutable are cached independently of the block and never evicted
+
+    A reverted chain reuses block numbers for different blocks, so before reading a block
+    by number call check() with its hash: if the number now has another hash, everything
+    cached from that block on is dropped. Entries keyed by block hash never go stale
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.immutable = {}
+        ## (chain id, block number) -> hash the entries of that block were read at
+        self.hashes = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = Lock()
+
+    def check(self, chain_id, block, block_hash):
+        """
+        Records block_hash for block, invalidating the block and the ones after it
+        if they were cached under another hash
+        """
+        with self.lock:
+            known = self.hashes.get((chain_id, block))
+            if known == block_hash:
+                return
+            if known is not None:
+                self.invalidations += 1
+                for key in [
+                    key
+                    for key in self.entries
+                    if key[0] == chain_id and isinstance(key[1], int) and key[1] >= block
+                ]:
+                    del self.entries[key]
+                for key in [key for key in self.hashes if key[0] == chain_id and key[1] > block]:
+                    del self.hashes[key]
+            self.hashes[(chain_id, block)] = block_hash
+
+    def get(self, chain_id, block, call):
+        """
+        Returns (success, output) or None on a miss
+        """
+        with self.lock:
+            block = block_key(block)
+            if call.immutable:
+                entry = self.immutable.get((chain_id, call.target, call.data))
+            elif block is not None:
+                key = (chain_id, block, call.target, call.data)
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+            else:
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, chain_id, block, call, success, output):
+        with self.lock:
+            if call.immutable:
+                if success:
+                    self.immutable[(chain_id, call.target, call.data)] = (success, output)
+                return
+            block = block_key(block)
+            if block is None:
+                return
+
+            self.entries[(chain_id, block, call.target, call.data)] = (success, output)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.immutable.clear()
+            self.hashes.clear()
+
+    def __len__(self):
+        return len(self.entries) + len(self.immutable)
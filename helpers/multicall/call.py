@@ -1,23 +1,29 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/call.py
 from eth_utils import to_checksum_address
 from brownie import web3
-from helpers.multicall import Signature
+from helpers.multicall import get_signature
 
 
 class Call:
-    def __init__(self, target, function, returns=None):
+    def __init__(self, target, function, returns=None, data=None, immutable=False):
         self.target = to_checksum_address(target)
         if isinstance(function, list):
             self.function, *self.args = function
         else:
             self.function = function
             self.args = None
-        self.signature = Signature(self.function)
+        self.signature = get_signature(self.function)
         self.returns = returns
+        ## Precomputed calldata, e.g. from a CalldataTemplate
+        self._data = data
+        ## Output never changes, e.g. decimals(), so it can be cached across blocks
+        self.immutable = immutable
 
     @property
     def data(self):
-        return self.signature.encode_data(self.args)
+        if self._data is None:
+            self._data = self.signature.encode_data(self.args)
+        return self._data
 
     def decode_output(self, output):
         decoded = self.signature.decode_data(output)
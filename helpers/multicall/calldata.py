@@ -0,0 +1,96 @@
+from functools import lru_cache
+
+from helpers.multicall.signature import get_signature
+
+WORD = 32
+ZERO_WORD = bytes(WORD)
+
+
+def encode_uint(value):
+    return value.to_bytes(WORD, "big")
+
+
+@lru_cache(maxsize=4096)
+def encode_address(address):
+    """
+    Left pads a hex address into a single ABI word
+    """
+    raw = bytes.fromhex(address[2:] if address[:2] in ("0x", "0X") else address)
+    if len(raw) != 20:
+        raise ValueError("Invalid address {}".format(address))
+    return bytes(12) + raw
+
+
+def _pad(data):
+    remainder = len(data) % WORD
+    return data + bytes(WORD - remainder) if remainder else data
+
+
+class CalldataTemplate:
+    """
+    Calldata for a signature whose inputs are all addresses, e.g. balanceOf(address)
+    The selector is computed once and every address is spliced in as a padded word
+    """
+
+    def __init__(self, signature):
+        self.signature = get_signature(signature)
+        inputs = self.signature.input_types[1:-1]
+        self.arity = len(inputs.split(",")) if inputs else 0
+        if inputs and set(inputs.split(",")) != {"address"}:
+            raise ValueError(
+                "Templates only support address arguments, got {}".format(
+                    self.signature.input_types
+                )
+            )
+        self.prefix = self.signature.fourbyte
+
+    def render(self, *addresses):
+        assert len(addresses) == self.arity
+        return self.prefix + b"".join([encode_address(a) for a in addresses])
+
+    def render_many(self, addresses):
+        prefix = self.prefix
+        return [prefix + encode_address(address) for address in addresses]
+
+
+def encode_aggregate(selector, calls):
+    """
+    Encodes the calldata for aggregate((address,bytes)[]) in a single pass
+    calls is a list of (target, calldata)
+    """
+    heads = []
+    tails = []
+    offset = WORD * len(calls)
+    for target, data in calls:
+        heads.append(encode_uint(offset))
+        tail = b"".join(
+            [encode_address(target), encode_uint(2 * WORD), encode_uint(len(data)), _pad(data)]
+        )
+        tails.append(tail)
+        offset += len(tail)
+
+    return b"".join(
+        [selector, encode_uint(WORD), encode_uint(len(calls))] + heads + tails
+    )
+
+
+def encode_aggregate3(selector, calls, allow_failure=True):
+    """
+    Encodes the calldata for aggregate3((address,bool,bytes)[]) in a single pass
+    calls is a list of (target, calldata)
+    """
+    flag = encode_uint(1 if allow_failure else 0)
+    heads = []
+    tails = []
+    offset = WORD * len(calls)
+    for target, data in calls:
+        heads.append(encode_uint(offset))
+        tail = b"".join(
+            [encode_address(target), flag, encode_uint(3 * WORD), encode_uint(len(data)), _pad(data)]
+        )
+        tails.append(tail)
+        offset += len(tail)
+
+    return b"".join(
+        [selector, encode_uint(WORD), encode_uint(len(calls))] + heads + tails
+    )
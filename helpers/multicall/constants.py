@@ -29,3 +29,42 @@ MULTICALL_ADDRESSES = {
     Network.Arbitrum: "0x7A7443F8c577d537f1d8cD4a629d40a3148Dd7ee",
     Network.Hardhat: "0x7A7443F8c577d537f1d8cD4a629d40a3148Dd7ee",
 }
+
+## Multicall3 is deployed at the same address on every chain it supports
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ADDRESSES = {
+    Network.Mainnet: MULTICALL3_ADDRESS,
+    Network.Kovan: MULTICALL3_ADDRESS,
+    Network.Rinkeby: MULTICALL3_ADDRESS,
+    Network.Görli: MULTICALL3_ADDRESS,
+    Network.xDai: MULTICALL3_ADDRESS,
+    Network.Fantom: MULTICALL3_ADDRESS,
+    Network.BSC: MULTICALL3_ADDRESS,
+    Network.Polygon: MULTICALL3_ADDRESS,
+    Network.Arbitrum: MULTICALL3_ADDRESS,
+    ## Local forks of Arbitrum
+    Network.Forknet: MULTICALL3_ADDRESS,
+    Network.Hardhat: MULTICALL3_ADDRESS,
+}
+
+
+class Missing:
+    """
+    Value of a call that reverted when running with require_success=False
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    __str__ = __repr__
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = Missing()
@@ -0,0 +1,129 @@
+from eth_abi.exceptions import DecodingError, InsufficientDataBytes
+
+from helpers.multicall.constants import MISSING
+
+WORD = 32
+
+
+def _decode_uint256(word):
+    return int.from_bytes(word, "big")
+
+
+def _decode_bool(word):
+    value = int.from_bytes(word, "big")
+    ## Anything other than 0 / 1 is left to eth_abi to reject
+    return bool(value) if value <= 1 else None
+
+
+def _decode_address(word):
+    if int.from_bytes(word[:12], "big"):
+        return None
+    return "0x" + word[12:].hex()
+
+
+## Single static return types we decode without going through eth_abi
+FAST_DECODERS = {
+    "(uint256)": _decode_uint256,
+    "(bool)": _decode_bool,
+    "(address)": _decode_address,
+}
+
+
+def _read_uint(view, offset):
+    end = offset + WORD
+    if end > len(view):
+        raise InsufficientDataBytes(
+            "Tried to read 32 bytes at offset {}.  Only got {} bytes".format(
+                offset, len(view)
+            )
+        )
+    return int.from_bytes(view[offset:end], "big")
+
+
+def split_bytes_array(view, offset):
+    """
+    Splits an ABI encoded bytes[] starting at offset into memoryview slices
+    """
+    length = _read_uint(view, offset)
+    start = offset + WORD
+    items = []
+    for i in range(length):
+        item = start + _read_uint(view, start + i * WORD)
+        size = _read_uint(view, item)
+        if item + WORD + size > len(view):
+            raise InsufficientDataBytes("bytes[] item {} is out of bounds".format(i))
+        items.append(view[item + WORD : item + WORD + size])
+    return items
+
+
+def decode_aggregate_output(output):
+    """
+    Decodes the (uint256,bytes[]) returned by aggregate without copying the blobs
+    """
+    view = memoryview(output)
+    block = _read_uint(view, 0)
+    return block, split_bytes_array(view, _read_uint(view, WORD))
+
+
+def decode_aggregate3_output(output):
+    """
+    Decodes the (bool,bytes)[] returned by aggregate3 into successes and output slices
+    """
+    view = memoryview(output)
+    offset = _read_uint(view, 0)
+    length = _read_uint(view, offset)
+    start = offset + WORD
+    successes = []
+    outputs = []
+    for i in range(length):
+        item = start + _read_uint(view, start + i * WORD)
+        successes.append(bool(_read_uint(view, item)))
+        data = item + _read_uint(view, item + WORD)
+        size = _read_uint(view, data)
+        if data + WORD + size > len(view):
+            raise InsufficientDataBytes("Result {} is out of bounds".format(i))
+        outputs.append(view[data + WORD : data + WORD + size])
+    return successes, outputs
+
+
+def set_missing(call, result):
+    for name, _ in call.returns or []:
+        result[name] = MISSING
+
+
+def decode_outputs(calls, outputs, result=None, successes=None):
+    """
+    Decodes every output into result, keyed by the names in each call's returns
+    Falls back to eth_abi for anything that isn't a single static word
+    When successes is passed, failed or undecodable calls are set to MISSING
+    """
+    if result is None:
+        result = {}
+    for i, (call, output) in enumerate(zip(calls, outputs)):
+        if successes is not None and not successes[i]:
+            set_missing(call, result)
+            continue
+
+        decoded = None
+        decode = FAST_DECODERS.get(call.signature.output_types)
+        if decode is not None and len(output) == WORD:
+            value = decode(output)
+            if value is not None:
+                decoded = (value,)
+
+        if call.returns is None:
+            result.update(call.decode_output(bytes(output)))
+            continue
+
+        if decoded is None:
+            try:
+                decoded = call.signature.decode_data(bytes(output))
+            except DecodingError:
+                ## e.g. empty return data from a target without code
+                if successes is None:
+                    raise
+                set_missing(call, result)
+                continue
+        for (name, handler), value in zip(call.returns, decoded):
+            result[name] = handler(value) if handler else value
+    return result
@@ -32,6 +32,8 @@ sett = DotMap(
     lastHarvestedAt="lastHarvestedAt()(uint256)",
     performanceFeeGovernance="performanceFeeGovernance()(uint256)",
     performanceFeeStrategist="performanceFeeStrategist()(uint256)",
+    token="token()(address)",
+    treasury="treasury()(address)",
 )
 strategy = DotMap(
     balanceOfPool="balanceOfPool()(uint256)",
@@ -45,6 +47,17 @@ strategy = DotMap(
     sharesOfPool="sharesOfPool()(uint256)",
     sharesOfWant="sharesOfWant()(uint256)",
     sharesOf="sharesOf()(uint256)",
+    want="want()(address)",
+    governance="governance()(address)",
+    strategist="strategist()(address)",
+)
+
+gmxStrategy = DotMap(
+    ESGMX="ESGMX()(address)",
+    stakedGmxTracker="stakedGmxTracker()(address)",
+    feeGmxTracker="feeGmxTracker()(address)",
+    GmxVester="GmxVester()(address)",
+    WETH="WETH()(address)",
 )
 
 stakedGmxTracker = DotMap(
@@ -78,4 +91,5 @@ func = DotMap(
     digg=digg,
     pancakeChef=pancakeChef,
     stakedGmxTracker=stakedGmxTracker,
+    gmxStrategy=gmxStrategy,
 )
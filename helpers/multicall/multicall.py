@@ -1,18 +1,121 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/multicall.py
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from typing import List
 
 from brownie import web3
 
-from helpers.multicall import Call
-from helpers.multicall.constants import MULTICALL_ADDRESSES
+from helpers.multicall import Call, get_signature
+from helpers.multicall.batch import batch_eth_call, rpc_tx
+from helpers.multicall.calldata import encode_aggregate, encode_aggregate3
+from helpers.multicall.constants import MULTICALL3_ADDRESSES, MULTICALL_ADDRESSES
+from helpers.multicall.decoding import (
+    decode_aggregate3_output,
+    decode_aggregate_output,
+    decode_outputs,
+)
 from rich.console import Console
 
 console = Console()
 
+AGGREGATE = "aggregate((address,bytes)[])(uint256,bytes[])"
+AGGREGATE3 = "aggregate3((address,bool,bytes)[])((bool,bytes)[])"
+
+## Defaults keep a chunk well below node eth_call gas caps and response limits
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_GAS_PER_CALL = 100_000
+DEFAULT_MAX_WORKERS = 4
+
+
+def chunk_calls(calls, chunk_size=DEFAULT_CHUNK_SIZE, gas_limit=None, gas_per_call=DEFAULT_GAS_PER_CALL):
+    """
+    Splits calls into ordered chunks bounded by call count and, if set, by estimated gas
+    """
+    size = chunk_size or len(calls) or 1
+    if gas_limit:
+        size = min(size, max(1, gas_limit // gas_per_call))
+    return [calls[i : i + size] for i in range(0, len(calls), size)]
+
+
+## (chain id, address) -> whether the aggregator has code on that chain
+deployed_aggregators = {}
+
+
+def aggregator_for(chain_id, require_success=True):
+    table = MULTICALL_ADDRESSES if require_success else MULTICALL3_ADDRESSES
+    return table.get(chain_id)
+
+
+def get_aggregator(chain_id, require_success=True):
+    """
+    Returns the aggregator address to use on chain_id, or None if there is none deployed
+    """
+    address = aggregator_for(chain_id, require_success)
+    if address is None:
+        return None
+    key = (chain_id, address)
+    if key not in deployed_aggregators:
+        deployed_aggregators[key] = len(web3.eth.get_code(address)) > 0
+    return address if deployed_aggregators[key] else None
+
+
+def aggregate_tx(calls, address, require_success=True, gas_limit=None):
+    """
+    eth_call transaction running calls through aggregate at address,
+    or through aggregate3 with allowFailure when require_success is False
+    """
+    targets = [(call.target, call.data) for call in calls]
+    if require_success:
+        calldata = encode_aggregate(get_signature(AGGREGATE).fourbyte, targets)
+    else:
+        calldata = encode_aggregate3(get_signature(AGGREGATE3).fourbyte, targets)
+    return rpc_tx(address, calldata, gas_limit)
+
+
+def parse_aggregate(output, require_success=True):
+    """
+    (successes, outputs) returned by an aggregate_tx, successes is None if require_success
+    """
+    if require_success:
+        _, outputs = decode_aggregate_output(output)
+        return None, outputs
+    return decode_aggregate3_output(output)
+
+
+def new_stats():
+    return {"rpc": 0, "direct": 0, "request_bytes": 0, "response_bytes": 0}
+
 
 class Multicall:
-    def __init__(self, calls: List[Call]):
+    def __init__(
+        self,
+        calls: List[Call],
+        block=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        gas_limit=None,
+        gas_per_call=DEFAULT_GAS_PER_CALL,
+        max_workers=DEFAULT_MAX_WORKERS,
+        require_success=True,
+        cache=None,
+    ):
+        """
+        With require_success=False calls go through Multicall3's aggregate3
+        and the outputs of reverting calls are set to MISSING
+        If the chain has no aggregator, calls are sent as one JSON-RPC batch of eth_calls
+        With a CallCache, only calls missing from the cache are sent
+        """
         self.calls = calls
+        self.block = block
+        self.chunk_size = chunk_size
+        self.gas_limit = gas_limit
+        self.gas_per_call = gas_per_call
+        self.max_workers = max_workers
+        self.require_success = require_success
+        self.cache = cache
+        ## RPC requests made by the last __call__, how many were sent outside of web3
+        ## (JSON-RPC batches), and calldata / return data sizes
+        self.stats = new_stats()
+        self.stats_lock = Lock()
 
     def printCalls(self):
         for call in self.calls:
@@ -20,14 +123,94 @@ class Multicall:
                 {"target": call.target, "function": call.function, "args": call.args}
             )
 
+    def record(self, request_bytes=0, response_bytes=0, direct=False):
+        with self.stats_lock:
+            self.stats["rpc"] += 1
+            if direct:
+                self.stats["direct"] += 1
+            self.stats["request_bytes"] += request_bytes
+            self.stats["response_bytes"] += response_bytes
+
+    def aggregate(self, calls, block, address):
+        """
+        Runs one aggregate eth_call and returns (successes, raw outputs) of calls
+        successes is None when every call is required to succeed
+        """
+        if address is None:
+            successes, outputs = batch_eth_call(
+                calls, block, self.gas_limit, self.require_success
+            )
+            self.record(
+                sum(len(call.data) for call in calls),
+                sum(len(output) for output in outputs),
+                direct=True,
+            )
+            return (None if self.require_success else successes), outputs
+
+        tx = aggregate_tx(calls, address, self.require_success, self.gas_limit)
+        output = web3.eth.call(tx, block)
+        self.record(len(tx["data"]) // 2 - 1, len(output))
+        return parse_aggregate(output, self.require_success)
+
+    def fetch(self, calls, block, address):
+        """
+        Raw (successes, outputs) for calls, chunked and run on the thread pool
+        """
+        chunks = chunk_calls(calls, self.chunk_size, self.gas_limit, self.gas_per_call)
+
+        ## All chunks, and every eth_call of a batch, must read the same state
+        if block is None and (len(chunks) > 1 or address is None):
+            block = web3.eth.block_number
+            self.record()
+
+        if len(chunks) <= 1:
+            results = [self.aggregate(calls, block or "latest", address)]
+        else:
+            workers = max(1, min(self.max_workers, len(chunks)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(
+                        lambda chunk: self.aggregate(chunk, block, address), chunks
+                    )
+                )
+
+        successes = [True] * len(calls)
+        outputs = []
+        for chunk_successes, chunk_outputs in results:
+            if chunk_successes is not None:
+                successes[len(outputs) : len(outputs) + len(chunk_outputs)] = chunk_successes
+            outputs.extend(chunk_outputs)
+        return successes, outputs
+
     def __call__(self):
-        aggregate = Call(
-            MULTICALL_ADDRESSES[web3.eth.chainId],
-            "aggregate((address,bytes)[])(uint256,bytes[])",
+        self.stats = new_stats()
+        chain_id = web3.eth.chainId
+        self.record()
+        calls = self.calls
+        successes = [True] * len(calls)
+        outputs = [None] * len(calls)
+
+        pending = range(len(calls))
+        if self.cache is not None:
+            pending = []
+            for i, call in enumerate(calls):
+                entry = self.cache.get(chain_id, self.block, call)
+                if entry is None:
+                    pending.append(i)
+                else:
+                    successes[i], outputs[i] = entry
+
+        if pending:
+            address = get_aggregator(chain_id, self.require_success)
+            fetched_successes, fetched_outputs = self.fetch(
+                [calls[i] for i in pending], self.block, address
+            )
+            for i, success, output in zip(pending, fetched_successes, fetched_outputs):
+                successes[i] = success
+                outputs[i] = output
+                if self.cache is not None:
+                    self.cache.put(chain_id, self.block, calls[i], success, bytes(output))
+
+        return decode_outputs(
+            calls, outputs, {}, None if self.require_success else successes
         )
-        args = [[[call.target, call.data] for call in self.calls]]
-        block, outputs = aggregate(args)
-        result = {}
-        for call, output in zip(self.calls, outputs):
-            result.update(call.decode_output(output))
-        return result
@@ -1,6 +1,8 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/signature.py
+from threading import Lock
 
-from eth_abi import encode_single, decode_single
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
 from eth_utils import function_signature_to_4byte_selector
 
 
@@ -26,20 +28,66 @@ def parse_signature(signature):
 
 
 class Signature:
+    """
+    Parsed signature with its selector and ABI codecs resolved up front.
+    Instances are shared between calls, use get_signature instead of building new ones.
+    """
+
+    __slots__ = (
+        "signature",
+        "parts",
+        "input_types",
+        "output_types",
+        "function",
+        "fourbyte",
+        "encoder",
+        "decoder",
+    )
+
     def __init__(self, signature):
-        self.signature = signature
-        self.parts = parse_signature(signature)
-        self.input_types = self.parts[1]
-        self.output_types = self.parts[2]
-        self.function = "".join(self.parts[:2])
-        self.fourbyte = function_signature_to_4byte_selector(self.function)
+        set_attr = object.__setattr__
+        parts = parse_signature(signature)
+        set_attr(self, "signature", signature)
+        set_attr(self, "parts", tuple(parts))
+        set_attr(self, "input_types", parts[1])
+        set_attr(self, "output_types", parts[2])
+        set_attr(self, "function", "".join(parts[:2]))
+        set_attr(self, "fourbyte", function_signature_to_4byte_selector(self.function))
+        set_attr(self, "encoder", registry.get_encoder(self.input_types))
+        set_attr(self, "decoder", registry.get_decoder(self.output_types))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Signature {} is immutable".format(self.signature))
+
+    def __repr__(self):
+        return "Signature({!r})".format(self.signature)
 
     def encode_data(self, args=None):
-        return (
-            self.fourbyte + encode_single(self.input_types, args)
-            if args
-            else self.fourbyte
-        )
+        return self.fourbyte + self.encoder(args) if args else self.fourbyte
 
     def decode_data(self, output):
-        return decode_single(self.output_types, output)
+        if not isinstance(output, (bytes, bytearray)):
+            raise TypeError(
+                "The `data` value must be of bytes type.  Got {0}".format(type(output))
+            )
+        return self.decoder(ContextFramesBytesIO(output))
+
+
+## Process wide registry, one Signature per signature string
+_signatures = {}
+_signatures_lock = Lock()
+
+
+def get_signature(signature):
+    """
+    Returns the shared Signature for `signature`, parsing and hashing it only once
+    """
+    try:
+        return _signatures[signature]
+    except KeyError:
+        pass
+
+    with _signatures_lock:
+        if signature not in _signatures:
+            _signatures[signature] = Signature(signature)
+        return _signatures[signature]
@@ -3,6 +3,11 @@ from dotmap import DotMap
   Set of functions to calculate shares burned, fees, and want withdrawn or deposited
 """
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 MAX_BPS = 10_000
 SECS_PER_YEAR = 31_556_952
 
@@ -161,3 +166,209 @@ def get_report_fees(
         shares_management=shares_management,
         shares_perf_strategist=shares_perf_strategist,
     )
+
+
+# ===== Batch variants =====
+## Each argument is a scalar or a sequence / NumPy array, scalars are broadcast
+## Results match the scalar functions exactly: int64 arrays are only used when every
+## product fits, otherwise the math runs on object arrays of Python ints
+## Without NumPy they return lists
+
+## Products below this are exact in int64, with room for float64 rounding in the check
+INT64_SAFE = 2.0 ** 62
+
+
+def _is_scalar(arg):
+    return not hasattr(arg, "__len__")
+
+
+def _columns(args):
+    size = None
+    for arg in args:
+        if not _is_scalar(arg):
+            if size is not None and len(arg) != size:
+                raise ValueError("Batch arguments have different lengths")
+            size = len(arg)
+    if size is None:
+        size = 1
+    return [[arg] * size if _is_scalar(arg) else arg for arg in args]
+
+
+## Checked int64 arithmetic, raising OverflowError sends the batch to the object path
+
+
+def _mul(a, b):
+    if a.dtype == np.int64 and not (
+        np.abs(a.astype(np.float64)) * np.abs(b.astype(np.float64)) < INT64_SAFE
+    ).all():
+        raise OverflowError
+    return a * b
+
+
+def _add(a, b):
+    if a.dtype == np.int64 and not (
+        np.abs(a.astype(np.float64)) + np.abs(b.astype(np.float64)) < INT64_SAFE
+    ).all():
+        raise OverflowError
+    return a + b
+
+
+def _div(a, b):
+    ## int64 division by zero returns 0, Python ints raise
+    if a.dtype == np.int64 and (b == 0).any():
+        raise ZeroDivisionError("integer division or modulo by zero")
+    return a // b
+
+
+def _pow10(exponent):
+    if exponent.dtype == np.int64 and (exponent > 18).any():
+        raise OverflowError
+    return 10 ** exponent
+
+
+def _int64(column):
+    array = np.asarray(column)
+    if array.dtype.kind == "i":
+        return array.astype(np.int64)
+    if array.dtype.kind == "u" and (array < 2 ** 63).all():
+        return array.astype(np.int64)
+    return None
+
+
+def _run_batch(kernel, scalar, args):
+    columns = _columns(args)
+    if np is None:
+        return [scalar(*row) for row in zip(*columns)]
+
+    fast = [_int64(column) for column in columns]
+    if all(column is not None for column in fast):
+        try:
+            return kernel(*fast)
+        except OverflowError:
+            pass
+    ## Python ints, NumPy integer scalars would wrap again on the object path
+    return kernel(
+        *[np.array([int(value) for value in column], dtype=object) for column in columns]
+    )
+
+
+def _from_want_to_shares_kernel(want_deposited, total_supply, balance):
+    return _div(_mul(want_deposited, total_supply), balance)
+
+
+def _withdrawal_fees_in_want_kernel(shares_to_burn, ppfs, vault_decimals, withdrawal_fee_bps):
+    value = _mul(shares_to_burn, ppfs) // _pow10(vault_decimals)
+    return _mul(value, withdrawal_fee_bps) // MAX_BPS
+
+
+def _withdrawal_fees_in_shares_kernel(
+    shares_to_burn, ppfs, vault_decimals, withdrawal_fee_bps, total_supply, vault_balance
+):
+    fee_in_want = _withdrawal_fees_in_want_kernel(
+        shares_to_burn, ppfs, vault_decimals, withdrawal_fee_bps
+    )
+    return _div(_mul(fee_in_want, total_supply), vault_balance)
+
+
+def _report_fees_kernel(
+    total_harvest_gain,
+    performance_fee_treasury,
+    performance_fee_strategist,
+    management_fee,
+    time_since_last_harvest,
+    total_supply_before_deposit,
+    balance_before_deposit,
+):
+    balance = _add(balance_before_deposit, total_harvest_gain)
+    new_total_supply = total_supply_before_deposit
+
+    fee_in_want_treasury = _mul(total_harvest_gain, performance_fee_treasury) // MAX_BPS
+    management_fee_in_want = (
+        _mul(_mul(management_fee, balance_before_deposit), time_since_last_harvest)
+        // SECS_PER_YEAR
+        // MAX_BPS
+    )
+    fee_in_want_strategist = _mul(total_harvest_gain, performance_fee_strategist) // MAX_BPS
+
+    pool = balance - fee_in_want_treasury - management_fee_in_want - fee_in_want_strategist
+    shares_perf_treasury = _div(_mul(fee_in_want_treasury, new_total_supply), pool)
+    new_total_supply = _add(new_total_supply, shares_perf_treasury)
+    pool = pool + fee_in_want_treasury
+
+    shares_management = _div(_mul(management_fee_in_want, new_total_supply), pool)
+    new_total_supply = _add(new_total_supply, shares_management)
+    pool = pool + management_fee_in_want
+
+    shares_perf_strategist = _div(_mul(fee_in_want_strategist, new_total_supply), pool)
+
+    return DotMap(
+        shares_perf_treasury=shares_perf_treasury,
+        shares_management=shares_management,
+        shares_perf_strategist=shares_perf_strategist,
+    )
+
+
+def from_want_to_shares_batch(
+    want_deposited, total_supply_before_deposit, balance_before_deposit
+):
+    """
+    from_want_to_shares over many scenarios
+    """
+    return _run_batch(
+        _from_want_to_shares_kernel,
+        from_want_to_shares,
+        (want_deposited, total_supply_before_deposit, balance_before_deposit),
+    )
+
+
+def get_withdrawal_fees_in_shares_batch(
+    shares_to_burn,
+    ppfs_before_withdraw,
+    vault_decimals,
+    withdrawal_fee_bps,
+    total_supply_before_withdraw,
+    vault_balance_before_withdraw,
+):
+    """
+    get_withdrawal_fees_in_shares over many scenarios
+    """
+    return _run_batch(
+        _withdrawal_fees_in_shares_kernel,
+        get_withdrawal_fees_in_shares,
+        (
+            shares_to_burn,
+            ppfs_before_withdraw,
+            vault_decimals,
+            withdrawal_fee_bps,
+            total_supply_before_withdraw,
+            vault_balance_before_withdraw,
+        ),
+    )
+
+
+def get_report_fees_batch(
+    total_harvest_gain,
+    performance_fee_treasury,
+    performance_fee_strategist,
+    management_fee,
+    time_since_last_harvest,
+    total_supply_before_deposit,
+    balance_before_deposit,
+):
+    """
+    get_report_fees over many scenarios
+    Returns one DotMap of arrays with NumPy, a list of DotMaps without
+    """
+    return _run_batch(
+        _report_fees_kernel,
+        get_report_fees,
+        (
+            total_harvest_gain,
+            performance_fee_treasury,
+            performance_fee_strategist,
+            management_fee,
+            time_since_last_harvest,
+            total_supply_before_deposit,
+            balance_before_deposit,
+        ),
+    )
@@ -0,0 +1,3 @@
+from helpers.simulator.strategy import SimulationRevert, StrategyModel
+from helpers.simulator.vault import VaultModel
+from helpers.simulator.manager import SimulationManager
@@ -0,0 +1,253 @@
+from collections import defaultdict
+
+from dotmap import DotMap
+
+from helpers.multicall import MISSING
+from helpers.simulator.strategy import SimulationRevert, StrategyModel
+from helpers.simulator.vault import VaultModel
+from helpers.snapshot.render import NullSink, changed_rows
+from helpers.snapshot.snap import Snap, SnapSchema
+
+from _setup.config import (
+    MANAGEMENT_FEE,
+    PERFORMANCE_FEE_GOVERNANCE,
+    PERFORMANCE_FEE_STRATEGIST,
+    WITHDRAWAL_FEE,
+)
+
+## Entities of every snap, like the ones SnapshotManager adds
+ENTITIES = ("sett", "strategy", "governance", "treasury", "strategist")
+
+
+class SimulationManager:
+    """
+    SnapshotManager-style action API over VaultModel / StrategyModel, no chain needed
+    Users are entity keys or addresses, overrides["from"] can be either or an account
+    With a resolver class (e.g. StrategyResolver) every action builds before / after snaps
+    with the SnapshotManager keys and runs its confirm_* checks on them,
+    without one no snap is built
+    """
+
+    def __init__(self, vault=None, strategy=None, resolver=None, sink=None, block_time=1, key="sim"):
+        self.key = key
+        self.strategy = strategy if strategy is not None else StrategyModel()
+        self.sett = (
+            vault
+            if vault is not None
+            else VaultModel(
+                self.strategy,
+                performance_fee_governance=PERFORMANCE_FEE_GOVERNANCE,
+                performance_fee_strategist=PERFORMANCE_FEE_STRATEGIST,
+                withdrawal_fee=WITHDRAWAL_FEE,
+                management_fee=MANAGEMENT_FEE,
+            )
+        )
+        self.block = 0
+        self.timestamp = self.sett.lastHarvestedAt
+        ## Seconds per simulated block
+        self.block_time = block_time
+        ## Want held by users
+        self.wantBalances = defaultdict(int)
+        self.sink = sink if sink is not None else NullSink()
+        self.schema = SnapSchema()
+        self.resolver = resolver(self) if resolver is not None else None
+
+    # ===== Chain =====
+
+    def sleep(self, seconds):
+        self.strategy.accrue(seconds)
+        self.timestamp += seconds
+
+    def mine(self, blocks=1):
+        for _ in range(blocks):
+            self.block += 1
+            self.sleep(self.block_time)
+
+    def fund(self, user, amount):
+        """
+        Gives want to user, like borrowing it from the whale
+        """
+        self.wantBalances[user] += amount
+
+    def checkpoint(self):
+        return (
+            dict(self.sett.__dict__),
+            dict(self.sett.shares),
+            dict(self.strategy.__dict__),
+            dict(self.wantBalances),
+        )
+
+    def restore(self, checkpoint):
+        vault, shares, strategy, wantBalances = checkpoint
+        self.sett.__dict__.update(vault)
+        self.sett.shares = defaultdict(int, shares)
+        self.strategy.__dict__.update(strategy)
+        self.wantBalances = defaultdict(int, wantBalances)
+
+    def receipt(self, **values):
+        return DotMap(block_number=self.block, timestamp=self.timestamp, **values)
+
+    # ===== Snaps =====
+
+    def snap(self, trackedUsers=None):
+        """
+        Snap of the model with the keys SnapshotManager records
+        """
+        sett = self.sett
+        strategy = self.strategy
+        entities = {key: key for key in ENTITIES}
+        if trackedUsers:
+            entities.update(trackedUsers)
+
+        data = {
+            "sett.balance": sett.balance(),
+            "sett.available": sett.available(),
+            "sett.getPricePerFullShare": sett.getPricePerFullShare(),
+            "sett.decimals": sett.decimals,
+            "sett.totalSupply": sett.totalSupply,
+            "sett.withdrawalFee": sett.withdrawalFee,
+            "sett.managementFee": sett.managementFee,
+            "sett.lastHarvestedAt": sett.lastHarvestedAt,
+            "sett.performanceFeeGovernance": sett.performanceFeeGovernance,
+            "sett.performanceFeeStrategist": sett.performanceFeeStrategist,
+            "strategy.balanceOfPool": strategy.balanceOfPool(),
+            "strategy.balanceOfWant": strategy.balanceOfWant(),
+            "strategy.balanceOf": strategy.balanceOf(),
+            "depositBalances.sgTracker": strategy.staked,
+        }
+        for entityKey, entity in entities.items():
+            for tokenKey, value in self.token_balances(entity).items():
+                data["balances." + tokenKey + "." + entityKey] = value
+        return Snap(data, self.block, list(entities), schema=self.schema)
+
+    def token_balances(self, entity):
+        strategy = self.strategy
+        balances = {
+            "want": self.wantBalances.get(entity, 0),
+            "sett": self.sett.shares.get(entity, 0),
+            "esgmx": 0,
+            "stakedGmxTracker": 0,
+            "feeGmxTracker": 0,
+            "GmxVester": 0,
+            "weth": 0,
+        }
+        if entity == "sett":
+            balances["want"] = self.sett.want
+        elif entity == "strategy":
+            balances.update(
+                want=strategy.want,
+                esgmx=strategy.esgmx,
+                stakedGmxTracker=strategy.staked,
+                feeGmxTracker=strategy.feeGmxTracker,
+                GmxVester=strategy.vester,
+                weth=strategy.weth,
+            )
+        return balances
+
+    # ===== Actions =====
+
+    def user(self, overrides):
+        sender = overrides["from"]
+        return getattr(sender, "address", sender)
+
+    def act(self, trackedUsers, action, confirm):
+        """
+        Mines a block, runs action and returns (before, receipt, after)
+        before / after are None unless a resolver will check them
+        """
+        snapshots = confirm and self.resolver is not None
+        before = self.snap(trackedUsers) if snapshots else None
+        self.mine()
+        checkpoint = self.checkpoint()
+        try:
+            value = action()
+        except SimulationRevert:
+            ## The block is still mined, like a reverted tx
+            self.restore(checkpoint)
+            raise
+        tx = self.receipt(return_value=value)
+        after = self.snap(trackedUsers) if snapshots else None
+        return before, tx, after
+
+    def settDeposit(self, amount, overrides, confirm=True):
+        user = self.user(overrides)
+        trackedUsers = {"user": user}
+
+        def deposit():
+            if self.wantBalances[user] < amount:
+                raise SimulationRevert("ERC20: transfer amount exceeds balance")
+            self.wantBalances[user] -= amount
+            return self.sett.deposit(user, amount)
+
+        before, tx, after = self.act(trackedUsers, deposit, confirm)
+        if before is not None:
+            self.resolver.confirm_deposit(before, after, {"user": user, "amount": amount})
+        return tx
+
+    def settDepositAll(self, overrides, confirm=True):
+        return self.settDeposit(self.wantBalances[self.user(overrides)], overrides, confirm)
+
+    def settEarn(self, overrides, confirm=True):
+        user = self.user(overrides)
+        trackedUsers = {"user": user}
+        before, tx, after = self.act(trackedUsers, self.sett.earn, confirm)
+        if before is not None:
+            self.resolver.confirm_earn(before, after, {"user": user})
+        return tx
+
+    def settWithdraw(self, amount, overrides, confirm=True):
+        user = self.user(overrides)
+        trackedUsers = {"user": user}
+
+        def withdraw():
+            received = self.sett.withdraw(user, amount)
+            self.wantBalances[user] += received
+            return received
+
+        before, tx, after = self.act(trackedUsers, withdraw, confirm)
+        if before is not None:
+            self.resolver.confirm_withdraw(
+                before, after, {"user": user, "amount": amount}, tx
+            )
+        return tx
+
+    def settWithdrawAll(self, overrides, confirm=True):
+        return self.settWithdraw(self.sett.balanceOf(self.user(overrides)), overrides, confirm)
+
+    def settHarvest(self, overrides, confirm=True):
+        user = self.user(overrides)
+        trackedUsers = {"user": user}
+
+        def harvest():
+            harvested = self.strategy.harvest()
+            self.sett.report_harvest(harvested, self.timestamp)
+            return harvested
+
+        before, tx, after = self.act(trackedUsers, harvest, confirm)
+        if before is not None:
+            self.resolver.confirm_harvest(before, after, tx)
+        return tx
+
+    def settTend(self, overrides, confirm=True):
+        user = self.user(overrides)
+        trackedUsers = {"user": user}
+        before, tx, after = self.act(trackedUsers, self.strategy.tend, confirm)
+        if before is not None:
+            self.resolver.confirm_tend(before, after, tx)
+        return tx
+
+    # ===== Rendering, used by the resolver =====
+
+    def format(self, key, value):
+        return value
+
+    def diff(self, a, b):
+        if a is MISSING or b is MISSING:
+            return MISSING
+        return b - a
+
+    def printCompare(self, before, after):
+        if isinstance(self.sink, NullSink):
+            return
+        rows = changed_rows(before, after)
+        self.sink.compare(self.key, before, after, rows, self.format, self.diff)
@@ -0,0 +1,235 @@
+"""
+  In-process model of MyStrategy and the GMX staking / vesting contracts it uses
+"""
+from helpers.shares_math import MAX_BPS, SECS_PER_YEAR
+
+ONE = 10 ** 18
+## GmxVester.vestingDuration
+VESTING_DURATION = 365 * 24 * 60 * 60
+## Uniswap V3 fees are in hundredths of a bip
+FEE_DENOMINATOR = 1_000_000
+
+
+class SimulationRevert(Exception):
+    """
+    Raised where the contracts would revert, with the same reason string
+    """
+
+
+class StrategyModel:
+    """
+    MyStrategy: GMX staked in stakedGmxTracker, WETH and esGMX rewards, esGMX vested in GmxVester
+
+    Rewards accrue per staked GMX at weth_rate / esgmx_rate (tokens per GMX per year, 1e18 = 1)
+    gmx_per_weth (1e18 = 1) prices the TWAP quote used by getWETHinGMX
+    quote(amountIn) and swap(amountIn) can be replaced, e.g. by a tick math quote or a pool model
+    By default the swap returns the quote less the pool fee, without price impact
+    """
+
+    def __init__(
+        self,
+        weth_rate=0,
+        esgmx_rate=0,
+        gmx_per_weth=ONE,
+        swap_pool_fee=10_000,
+        twap_interval=600,
+        slip_range=300,
+        withdrawal_max_deviation_threshold=50,
+        quote=None,
+        swap=None,
+    ):
+        self.weth_rate = weth_rate
+        self.esgmx_rate = esgmx_rate
+        self.gmx_per_weth = gmx_per_weth
+        self.swapPoolFee = swap_pool_fee
+        self.twapInterval = twap_interval
+        self.slipRange = slip_range
+        self.withdrawalMaxDeviationThreshold = withdrawal_max_deviation_threshold
+        self.quote = quote if quote is not None else self.price_quote
+        self.swap = swap if swap is not None else self.fee_swap
+
+        ## Token balances of the strategy
+        self.want = 0
+        self.weth = 0
+        self.esgmx = 0
+        ## stakedGmxTracker.depositBalances(strategy, GMX)
+        self.staked = 0
+        ## GmxVester.balances / pairAmounts / claimable
+        self.vester = 0
+        self.pair = 0
+        self.vested = 0
+        ## Rewards not claimed yet
+        self.pending_weth = 0
+        self.pending_esgmx = 0
+        ## Inputs of GmxVester.getPairAmount
+        self.cumulative_esgmx = 0
+        self.average_staked = 0
+
+    # ===== Prices =====
+
+    def price_quote(self, amount):
+        return amount * self.gmx_per_weth // ONE
+
+    def fee_swap(self, amount):
+        return self.quote(amount) * (FEE_DENOMINATOR - self.swapPoolFee) // FEE_DENOMINATOR
+
+    def getWETHinGMX(self, amount):
+        if amount == 0:
+            return 0
+        return self.quote(amount)
+
+    def single_swap(self, amount):
+        """
+        WETH -> want with amountOutMinimum from slipRange, like _singleSwap
+        """
+        if amount == 0:
+            return 0
+        min_out = self.getWETHinGMX(amount) * (MAX_BPS - self.slipRange) // MAX_BPS
+        out = self.swap(amount)
+        if out < min_out:
+            raise SimulationRevert("Too little received")
+        self.weth -= amount
+        self.want += out
+        return out
+
+    # ===== Views =====
+
+    @property
+    def feeGmxTracker(self):
+        ## Tracker tokens paired in the vester leave feeGmxTracker
+        return self.staked - self.pair
+
+    def balanceOfWant(self):
+        return self.want
+
+    def balanceOfPool(self):
+        return self.staked + self.getWETHinGMX(self.weth)
+
+    def balanceOf(self):
+        return self.balanceOfWant() + self.balanceOfPool()
+
+    def getPairAmount(self, amount):
+        if self.cumulative_esgmx == 0:
+            return 0
+        return amount * self.average_staked // self.cumulative_esgmx
+
+    # ===== Time =====
+
+    def accrue(self, seconds):
+        if seconds <= 0:
+            return
+        self.pending_weth += self.staked * self.weth_rate * seconds // SECS_PER_YEAR // ONE
+        esgmx = self.staked * self.esgmx_rate * seconds // SECS_PER_YEAR // ONE
+        self.pending_esgmx += esgmx
+        if esgmx:
+            self.cumulative_esgmx += esgmx
+            self.average_staked = self.staked
+        vested = min(self.vester, self.vester * seconds // VESTING_DURATION)
+        self.vester -= vested
+        self.vested += vested
+
+    # ===== GMX actions =====
+
+    def stakeGmx(self, amount):
+        amount = min(amount, self.want)
+        self.want -= amount
+        self.staked += amount
+
+    def unstakeGmx(self, amount):
+        amount = min(amount, self.staked, self.feeGmxTracker)
+        self.staked -= amount
+        self.want += amount
+
+    def vestEsGmx(self, amount):
+        amount = min(amount, self.esgmx)
+        pair = self.getPairAmount(self.vester + self.vested + amount)
+        if pair - self.pair > self.feeGmxTracker:
+            raise SimulationRevert("Vester: insufficient pairToken balance")
+        self.esgmx -= amount
+        self.vester += amount
+        self.pair = max(self.pair, pair)
+
+    def unvestEsGmx(self):
+        if self.vester == 0:
+            return
+        self.want += self.vested
+        self.esgmx += self.vester
+        self.vester = self.vested = self.pair = 0
+
+    def handleRewards(self):
+        """
+        Claims WETH, esGMX and vested GMX, like RewardRouterV2.handleRewards in _harvest
+        Returns the (weth, esgmx, gmx) claimed
+        """
+        claimed = (self.pending_weth, self.pending_esgmx, self.vested)
+        self.weth += self.pending_weth
+        self.esgmx += self.pending_esgmx
+        self.want += self.vested
+        self.pending_weth = self.pending_esgmx = self.vested = 0
+        return claimed
+
+    # ===== BaseStrategy =====
+
+    def earn(self):
+        if self.want > 0:
+            self.stakeGmx(self.want)
+
+    def harvest(self):
+        """
+        Returns the amount reported to the vault
+        """
+        weth, _, gmx = self.handleRewards()
+        return self.getWETHinGMX(weth) + gmx
+
+    def tend(self):
+        """
+        Returns the (want staked, esGMX vested)
+        """
+        staked = self.want
+        if staked > 0:
+            self.stakeGmx(staked)
+        esgmx = self.esgmx
+        if esgmx == 0:
+            return staked, 0
+        next_pair = self.getPairAmount(self.vester + self.vested + esgmx)
+        if next_pair <= self.pair or self.feeGmxTracker >= next_pair - self.pair:
+            self.vestEsGmx(esgmx)
+            return staked, esgmx
+        return staked, 0
+
+    def withdrawSome(self, amount):
+        self.single_swap(self.weth)
+        want = self.want
+        if amount < want:
+            return amount
+        self.unvestEsGmx()
+        if amount < want + self.staked:
+            self.unstakeGmx(amount - want)
+        else:
+            self.unstakeGmx(self.staked)
+        return self.want - want
+
+    def withdraw(self, amount):
+        """
+        BaseStrategy.withdraw, returns the want sent to the vault
+        """
+        if amount == 0:
+            raise SimulationRevert("Amount 0")
+        self.withdrawSome(amount)
+        post = self.want
+        if post < amount:
+            if amount - post > amount * self.withdrawalMaxDeviationThreshold // MAX_BPS:
+                raise SimulationRevert("withdraw-exceed-max-deviation-threshold")
+        sent = min(post, amount)
+        self.want -= sent
+        return sent
+
+    def withdrawAll(self):
+        """
+        Returns the want sent to the vault
+        """
+        self.unvestEsGmx()
+        self.unstakeGmx(self.staked)
+        self.single_swap(self.weth)
+        sent, self.want = self.want, 0
+        return sent
@@ -0,0 +1,177 @@
+"""
+  Fee parameter sweeps: depositor yield and fee shares for every combination of fees
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from tabulate import tabulate
+
+from helpers.shares_math import MAX_BPS, SECS_PER_YEAR, get_report_fees_batch
+
+from _setup.config import (
+    MANAGEMENT_FEE,
+    PERFORMANCE_FEE_GOVERNANCE,
+    PERFORMANCE_FEE_STRATEGIST,
+    WITHDRAWAL_FEE,
+)
+
+ONE = 10 ** 18
+DAY = 24 * 60 * 60
+
+PARAMETERS = (
+    "performance_fee_governance",
+    "performance_fee_strategist",
+    "management_fee",
+    "withdrawal_fee",
+)
+COLUMNS = PARAMETERS + (
+    "net_yield_bps",
+    "net_apr_bps",
+    "depositor_want",
+    "treasury_shares",
+    "strategist_shares",
+    "treasury_want",
+    "strategist_want",
+    "withdrawal_fee_want",
+)
+
+
+def fee_grid(
+    performance_fee_governance=(PERFORMANCE_FEE_GOVERNANCE,),
+    performance_fee_strategist=(PERFORMANCE_FEE_STRATEGIST,),
+    management_fee=(MANAGEMENT_FEE,),
+    withdrawal_fee=(WITHDRAWAL_FEE,),
+):
+    """
+    Every combination of the given fee values (bps), defaults to _setup/config.py
+    """
+    return list(
+        product(
+            performance_fee_governance,
+            performance_fee_strategist,
+            management_fee,
+            withdrawal_fee,
+        )
+    )
+
+
+def harvest_schedule(apr_bps, days, interval=DAY):
+    """
+    One harvest every interval seconds for days, each gaining apr_bps pro rata
+    Returns [(seconds since last harvest, gain per want, 1e18 = 100%)]
+    """
+    rate = apr_bps * ONE * interval // SECS_PER_YEAR // MAX_BPS
+    return [(interval, rate)] * (days * DAY // interval)
+
+
+def _report_columns(fees):
+    ## A list of DotMaps without NumPy, a DotMap of arrays with it
+    keys = ("shares_perf_treasury", "shares_management", "shares_perf_strategist")
+    if isinstance(fees, list):
+        return [[fee[key] for fee in fees] for key in keys]
+    return [[int(value) for value in fees[key]] for key in keys]
+
+
+def evaluate_grid(grid, schedule, deposit):
+    """
+    Runs the harvest schedule for every fee combination of grid, then withdraws the deposit
+    A single depositor deposits into an empty vault, so it starts with deposit shares
+    Returns one row of COLUMNS per combination
+    """
+    size = len(grid)
+    governance, strategist, management, withdrawal = [list(column) for column in zip(*grid)]
+    supply = [deposit] * size
+    balance = [deposit] * size
+    treasuryShares = [0] * size
+    strategistShares = [0] * size
+
+    elapsed = 0
+    for seconds, rate in schedule:
+        elapsed += seconds
+        gains = [value * rate // ONE for value in balance]
+        perfTreasury, managementShares, perfStrategist = _report_columns(
+            get_report_fees_batch(
+                gains, governance, strategist, management, seconds, supply, balance
+            )
+        )
+        for i in range(size):
+            issued = perfTreasury[i] + managementShares[i]
+            treasuryShares[i] += issued
+            strategistShares[i] += perfStrategist[i]
+            supply[i] += issued + perfStrategist[i]
+            balance[i] += gains[i]
+
+    rows = []
+    for i in range(size):
+        want = balance[i] * deposit // supply[i]
+        fee = want * withdrawal[i] // MAX_BPS
+        net = (want - fee - deposit) * MAX_BPS // deposit
+        rows.append(
+            grid[i]
+            + (
+                net,
+                net * SECS_PER_YEAR // elapsed if elapsed else 0,
+                want - fee,
+                treasuryShares[i],
+                strategistShares[i],
+                balance[i] * treasuryShares[i] // supply[i],
+                balance[i] * strategistShares[i] // supply[i],
+                fee,
+            )
+        )
+    return rows
+
+
+def _evaluate_chunk(args):
+    return evaluate_grid(*args)
+
+
+def sweep_fees(grid, schedule, deposit=1_000 * ONE, max_workers=None, chunk_size=256):
+    """
+    evaluate_grid spread over a process pool, chunk_size fee combinations per task
+    max_workers=1 runs in process
+    """
+    grid = [tuple(parameters) for parameters in grid]
+    chunks = [
+        (grid[i : i + chunk_size], schedule, deposit)
+        for i in range(0, len(grid), chunk_size)
+    ]
+    if max_workers == 1 or len(chunks) <= 1:
+        results = map(_evaluate_chunk, chunks)
+        return SweepTable([row for rows in results for row in rows])
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_evaluate_chunk, chunks)
+        return SweepTable([row for rows in results for row in rows])
+
+
+class SweepTable:
+    """
+    Rows of COLUMNS, in grid order
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, name):
+        index = COLUMNS.index(name)
+        return [row[index] for row in self.rows]
+
+    def rank(self, by="net_yield_bps", descending=True):
+        index = COLUMNS.index(by)
+        return SweepTable(sorted(self.rows, key=lambda row: row[index], reverse=descending))
+
+    def where(self, predicate):
+        """
+        Rows for which predicate(row as a dict) is True
+        """
+        return SweepTable([row for row in self.rows if predicate(dict(zip(COLUMNS, row)))])
+
+    def as_dicts(self):
+        return [dict(zip(COLUMNS, row)) for row in self.rows]
+
+    def report(self, limit=20):
+        return tabulate(self.rows[:limit], headers=COLUMNS)
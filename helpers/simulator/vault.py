@@ -0,0 +1,144 @@
+"""
+  In-process model of TheVault (badger Vault v1.5) share accounting
+"""
+from collections import defaultdict
+
+from helpers.shares_math import (
+    MAX_BPS,
+    from_want_to_shares,
+    get_management_fees_want,
+    get_performance_fees_want,
+)
+from helpers.simulator.strategy import SimulationRevert
+
+
+class VaultModel:
+    """
+    Shares, idle want and fees of the vault, the strategy holds the rest of balance()
+    Accounts are any hashable, SimulationManager uses entity keys
+    """
+
+    def __init__(
+        self,
+        strategy,
+        performance_fee_governance=0,
+        performance_fee_strategist=0,
+        withdrawal_fee=0,
+        management_fee=0,
+        to_earn_bps=9_500,
+        decimals=18,
+        treasury="treasury",
+        strategist="strategist",
+        now=0,
+    ):
+        self.strategy = strategy
+        self.performanceFeeGovernance = performance_fee_governance
+        self.performanceFeeStrategist = performance_fee_strategist
+        self.withdrawalFee = withdrawal_fee
+        self.managementFee = management_fee
+        self.toEarnBps = to_earn_bps
+        self.decimals = decimals
+        self.treasury = treasury
+        self.strategist = strategist
+        self.lastHarvestedAt = now
+
+        ## Want held by the vault
+        self.want = 0
+        self.shares = defaultdict(int)
+        self.totalSupply = 0
+
+    # ===== Views =====
+
+    def balance(self):
+        return self.want + self.strategy.balanceOf()
+
+    def available(self):
+        return self.want * self.toEarnBps // MAX_BPS
+
+    def getPricePerFullShare(self):
+        if self.totalSupply == 0:
+            return 10 ** self.decimals
+        return self.balance() * 10 ** self.decimals // self.totalSupply
+
+    def balanceOf(self, account):
+        return self.shares[account]
+
+    # ===== Shares =====
+
+    def mint_shares_for(self, account, amount, pool):
+        if self.totalSupply == 0:
+            shares = amount
+        else:
+            shares = from_want_to_shares(amount, self.totalSupply, pool)
+        self.shares[account] += shares
+        self.totalSupply += shares
+        return shares
+
+    def burn(self, account, shares):
+        if self.shares[account] < shares:
+            raise SimulationRevert("ERC20: burn amount exceeds balance")
+        self.shares[account] -= shares
+        self.totalSupply -= shares
+
+    # ===== Actions =====
+
+    def deposit(self, account, amount):
+        """
+        Returns the shares minted, the caller has already taken amount of want from account
+        """
+        pool = self.balance()
+        self.want += amount
+        return self.mint_shares_for(account, amount, pool)
+
+    def withdraw(self, account, shares):
+        """
+        Returns the want sent to account
+        """
+        if shares == 0:
+            raise SimulationRevert("0 Shares")
+        r = self.balance() * shares // self.totalSupply
+        self.burn(account, shares)
+
+        b = self.want
+        if b < r:
+            toWithdraw = r - b
+            received = self.strategy.withdraw(toWithdraw)
+            self.want += received
+            if received < toWithdraw:
+                r = b + received
+
+        fee = r * self.withdrawalFee // MAX_BPS
+        self.want -= r - fee
+        if fee > 0:
+            ## The fee stays in the vault, as if the treasury deposited it
+            self.mint_shares_for(self.treasury, fee, self.balance() - fee)
+        return r - fee
+
+    def earn(self):
+        amount = self.available()
+        self.want -= amount
+        self.strategy.want += amount
+        self.strategy.earn()
+        return amount
+
+    def report_harvest(self, harvested, now):
+        """
+        Vault.reportHarvest: mints performance and management fees
+        The treasury gets one mint for its performance and management fees like _handleFees,
+        get_report_fees splits it in two so the shares can differ by rounding
+        """
+        feeGovernance = get_performance_fees_want(harvested, self.performanceFeeGovernance)
+        feeStrategist = get_performance_fees_want(harvested, self.performanceFeeStrategist)
+        duration = now - self.lastHarvestedAt
+        managementFee = get_management_fees_want(
+            self.balance() - harvested, duration, self.managementFee
+        )
+        totalGovernanceFee = feeGovernance + managementFee
+
+        pool = self.balance() - totalGovernanceFee - feeStrategist
+        if totalGovernanceFee != 0:
+            self.mint_shares_for(self.treasury, totalGovernanceFee, pool)
+        if feeStrategist != 0:
+            self.mint_shares_for(self.strategist, feeStrategist, pool + totalGovernanceFee)
+
+        self.lastHarvestedAt = now
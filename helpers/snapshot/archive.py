@@ -0,0 +1,370 @@
+"""
+  Delta encoded snapshot archive
+
+  file   := MAGIC record*
+  record := kind:u8 length:varint payload
+    KEY       payload := slot:varint key:str
+    KEYFRAME  payload := block:varint entityKeys count:varint (slot:varint value)*
+    DELTA     payload := block:varint hasEntityKeys:u8 [entityKeys] count:varint (slot:varint value)*
+  value  := tag:u8 ...  big ints are zigzag varints
+
+  Every snap is stored as the keys that changed since the previous one,
+  with a full keyframe every `keyframe_interval` snaps so any block can be
+  rebuilt by replaying from the nearest keyframe.
+"""
+from bisect import bisect_right
+
+from helpers.multicall import MISSING
+from helpers.snapshot.snap import ABSENT, Snap
+
+## The last byte of MAGIC is the format version
+FORMAT = b"SNAPARC"
+VERSION = b"1"
+MAGIC = FORMAT + VERSION
+DEFAULT_KEYFRAME_INTERVAL = 256
+
+KEY = 0
+KEYFRAME = 1
+DELTA = 2
+
+T_INT = 0
+T_FALSE = 1
+T_TRUE = 2
+T_STR = 3
+T_MISSING = 4
+T_ABSENT = 5
+T_TUPLE = 6
+T_BYTES = 7
+
+
+# ===== Encoding =====
+
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def read_varint(buffer, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def write_str(out, value):
+    raw = value.encode()
+    write_varint(out, len(raw))
+    out += raw
+
+
+def read_str(buffer, offset):
+    size, offset = read_varint(buffer, offset)
+    return bytes(buffer[offset : offset + size]).decode(), offset + size
+
+
+def write_value(out, value):
+    if value is MISSING:
+        out.append(T_MISSING)
+    elif value is ABSENT:
+        out.append(T_ABSENT)
+    elif value is True:
+        out.append(T_TRUE)
+    elif value is False:
+        out.append(T_FALSE)
+    elif isinstance(value, int):
+        out.append(T_INT)
+        write_varint(out, zigzag(value))
+    elif isinstance(value, str):
+        out.append(T_STR)
+        write_str(out, value)
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(T_BYTES)
+        write_varint(out, len(value))
+        out += value
+    elif isinstance(value, (tuple, list)):
+        out.append(T_TUPLE)
+        write_varint(out, len(value))
+        for item in value:
+            write_value(out, item)
+    else:
+        raise TypeError("Can't archive {!r}".format(value))
+
+
+def read_value(buffer, offset):
+    tag = buffer[offset]
+    offset += 1
+    if tag == T_INT:
+        value, offset = read_varint(buffer, offset)
+        return unzigzag(value), offset
+    if tag == T_TRUE:
+        return True, offset
+    if tag == T_FALSE:
+        return False, offset
+    if tag == T_STR:
+        return read_str(buffer, offset)
+    if tag == T_MISSING:
+        return MISSING, offset
+    if tag == T_ABSENT:
+        return ABSENT, offset
+    if tag == T_BYTES:
+        size, offset = read_varint(buffer, offset)
+        return bytes(buffer[offset : offset + size]), offset + size
+    if tag == T_TUPLE:
+        size, offset = read_varint(buffer, offset)
+        items = []
+        for _ in range(size):
+            item, offset = read_value(buffer, offset)
+            items.append(item)
+        return tuple(items), offset
+    raise ValueError("Unknown value tag {}".format(tag))
+
+
+def write_entity_keys(out, entityKeys):
+    write_varint(out, len(entityKeys))
+    for key in entityKeys:
+        write_str(out, key)
+
+
+def read_entity_keys(buffer, offset):
+    size, offset = read_varint(buffer, offset)
+    keys = []
+    for _ in range(size):
+        key, offset = read_str(buffer, offset)
+        keys.append(key)
+    return keys, offset
+
+
+# ===== Writer =====
+
+
+class ArchiveWriter:
+    """
+    Appends snaps, in block order, to a new archive file
+
+    with ArchiveWriter(path) as archive:
+        for snap in manager.snaps.range():
+            archive.write(snap)
+    """
+
+    def __init__(self, path, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.keyframe_interval = keyframe_interval
+        self.slots = {}
+        self.previous = {}
+        self.entityKeys = None
+        self.written = 0
+        self.last_block = None
+
+    def _record(self, kind, payload):
+        out = bytearray([kind])
+        write_varint(out, len(payload))
+        self.file.write(out)
+        self.file.write(payload)
+
+    def _slot(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = len(self.slots)
+            self.slots[key] = slot
+            payload = bytearray()
+            write_varint(payload, slot)
+            write_str(payload, key)
+            self._record(KEY, payload)
+        return slot
+
+    def write(self, snap):
+        if self.last_block is not None and snap.block <= self.last_block:
+            raise ValueError(
+                "Snaps must be written in block order, got {} after {}".format(
+                    snap.block, self.last_block
+                )
+            )
+        current = dict(snap.data.items())
+        entityKeys = list(snap.entityKeys)
+        keyframe = self.written % self.keyframe_interval == 0
+
+        if keyframe:
+            changes = current
+        else:
+            changes = {
+                key: value
+                for key, value in current.items()
+                if key not in self.previous or self.previous[key] != value
+                or type(self.previous[key]) is not type(value)
+            }
+            for key in self.previous:
+                if key not in current:
+                    changes[key] = ABSENT
+
+        slots = [(self._slot(key), value) for key, value in changes.items()]
+        payload = bytearray()
+        write_varint(payload, snap.block)
+        if keyframe:
+            write_entity_keys(payload, entityKeys)
+        elif entityKeys != self.entityKeys:
+            payload.append(1)
+            write_entity_keys(payload, entityKeys)
+        else:
+            payload.append(0)
+        write_varint(payload, len(slots))
+        for slot, value in slots:
+            write_varint(payload, slot)
+            write_value(payload, value)
+        self._record(KEYFRAME if keyframe else DELTA, payload)
+
+        self.previous = current
+        self.entityKeys = entityKeys
+        self.written += 1
+        self.last_block = snap.block
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===== Reader =====
+
+
+class ArchiveReader:
+    """
+    Random access to an archive, indexes the records on open and rebuilds
+    a block by replaying deltas from the closest keyframe before it
+    """
+
+    def __init__(self, path, schema=None):
+        with open(path, "rb") as file:
+            self.buffer = memoryview(file.read())
+        header = bytes(self.buffer[: len(MAGIC)])
+        if header[: len(FORMAT)] != FORMAT or len(header) != len(MAGIC):
+            raise ValueError("{} is not a snapshot archive".format(path))
+        if header != MAGIC:
+            raise ValueError(
+                "{} is a version {} snapshot archive, expected version {}".format(
+                    path, header[len(FORMAT) :].decode(errors="replace"), VERSION.decode()
+                )
+            )
+        self.schema = schema
+        self.keys = {}
+        ## Parallel lists, one entry per snap in block order
+        self.blocks = []
+        self.offsets = []
+        self.keyframes = []
+        self._index()
+        self.is_keyframe = set(self.keyframes)
+
+    def _index(self):
+        buffer = self.buffer
+        offset = len(MAGIC)
+        while offset < len(buffer):
+            kind = buffer[offset]
+            try:
+                length, start = read_varint(buffer, offset + 1)
+            except IndexError:
+                length, start = 0, len(buffer) + 1
+            end = start + length
+            if end > len(buffer):
+                raise ValueError("Snapshot archive is truncated at byte {}".format(offset))
+            if kind == KEY:
+                slot, position = read_varint(buffer, start)
+                self.keys[slot], _ = read_str(buffer, position)
+            elif kind in (KEYFRAME, DELTA):
+                block, _ = read_varint(buffer, start)
+                if kind == KEYFRAME:
+                    self.keyframes.append(len(self.blocks))
+                self.blocks.append(block)
+                self.offsets.append(start)
+            else:
+                raise ValueError("Unknown record kind {} at byte {}".format(kind, offset))
+            offset = end
+
+    def _apply(self, index, values, entityKeys):
+        buffer = self.buffer
+        offset = self.offsets[index]
+        _, offset = read_varint(buffer, offset)
+        if index in self.is_keyframe:
+            values.clear()
+            entityKeys, offset = read_entity_keys(buffer, offset)
+        else:
+            changed = buffer[offset]
+            offset += 1
+            if changed:
+                entityKeys, offset = read_entity_keys(buffer, offset)
+        count, offset = read_varint(buffer, offset)
+        for _ in range(count):
+            slot, offset = read_varint(buffer, offset)
+            value, offset = read_value(buffer, offset)
+            key = self.keys[slot]
+            if value is ABSENT:
+                values.pop(key, None)
+            else:
+                values[key] = value
+        return entityKeys
+
+    def _snap(self, index, values, entityKeys):
+        return Snap(dict(values), self.blocks[index], list(entityKeys), schema=self.schema)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __contains__(self, block):
+        index = bisect_right(self.blocks, block) - 1
+        return index >= 0 and self.blocks[index] == block
+
+    def __getitem__(self, block):
+        index = bisect_right(self.blocks, block) - 1
+        if index < 0 or self.blocks[index] != block:
+            raise KeyError(block)
+        return self._rebuild(index)
+
+    def at(self, block):
+        """
+        Latest archived snap at or before block
+        """
+        index = bisect_right(self.blocks, block) - 1
+        if index < 0:
+            raise KeyError(block)
+        return self._rebuild(index)
+
+    def _rebuild(self, index):
+        keyframe = self.keyframes[bisect_right(self.keyframes, index) - 1]
+        values = {}
+        entityKeys = []
+        for position in range(keyframe, index + 1):
+            entityKeys = self._apply(position, values, entityKeys)
+        return self._snap(index, values, entityKeys)
+
+    def __iter__(self):
+        """
+        Every snap in block order, replayed sequentially
+        """
+        values = {}
+        entityKeys = []
+        for index in range(len(self.blocks)):
+            entityKeys = self._apply(index, values, entityKeys)
+            yield self._snap(index, values, entityKeys)
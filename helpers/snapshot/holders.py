@@ -0,0 +1,107 @@
+"""
+  Balances of many holders, see SnapshotManager.snap_holders
+"""
+from helpers.multicall import MISSING, Call, func
+from helpers.multicall.calldata import CalldataTemplate
+
+balanceOfTemplate = CalldataTemplate(func.erc20.balanceOf)
+
+
+def holder_calls(tokens, holders, offset=0):
+    """
+    One balanceOf call per (token, holder), returning under the key (tokenKey, holder index)
+    tokens is {tokenKey: address}, holders a list of addresses starting at index offset
+    """
+    calls = []
+    for tokenKey, token in tokens.items():
+        for i, data in enumerate(balanceOfTemplate.render_many(holders), offset):
+            calls.append(
+                Call(
+                    token,
+                    balanceOfTemplate.signature.signature,
+                    [[(tokenKey, i), None]],
+                    data=data,
+                )
+            )
+    return calls
+
+
+class HolderBalances:
+    """
+    Token x holder balance matrix at one block
+    Every token has one list of balances, indexed like holders
+    Balances of reverted calls are MISSING
+    """
+
+    __slots__ = ("block", "tokens", "holders", "index", "balances")
+
+    def __init__(self, block, tokens):
+        self.block = block
+        self.tokens = list(tokens)
+        self.holders = []
+        ## holder -> column
+        self.index = {}
+        ## tokenKey -> [balance per holder]
+        self.balances = {tokenKey: [] for tokenKey in self.tokens}
+
+    def add_holders(self, holders):
+        """
+        Appends the holders not seen yet, returns their addresses
+        holders can be address strings or brownie Accounts / Contracts
+        """
+        added = []
+        for holder in holders:
+            holder = str(holder)
+            key = holder.lower()
+            if key in self.index:
+                continue
+            self.index[key] = len(self.holders)
+            self.holders.append(holder)
+            added.append(holder)
+        for column in self.balances.values():
+            column.extend([MISSING] * len(added))
+        return added
+
+    def fill(self, data):
+        """
+        Writes multicall output keyed by (tokenKey, holder index)
+        """
+        for (tokenKey, i), value in data.items():
+            self.balances[tokenKey][i] = value
+
+    def __len__(self):
+        return len(self.holders)
+
+    def __contains__(self, holder):
+        return str(holder).lower() in self.index
+
+    def balance(self, tokenKey, holder):
+        return self.balances[tokenKey][self.index[str(holder).lower()]]
+
+    def column(self, tokenKey):
+        return self.balances[tokenKey]
+
+    def row(self, holder):
+        i = self.index[str(holder).lower()]
+        return {tokenKey: self.balances[tokenKey][i] for tokenKey in self.tokens}
+
+    def total(self, tokenKey):
+        return sum(value for value in self.balances[tokenKey] if value is not MISSING)
+
+    def nonzero(self, tokenKey):
+        """
+        Holders with a balance of tokenKey
+        """
+        return [
+            holder
+            for holder, value in zip(self.holders, self.balances[tokenKey])
+            if value
+        ]
+
+    def missing(self):
+        return [
+            (tokenKey, holder)
+            for tokenKey in self.tokens
+            for holder, value in zip(self.holders, self.balances[tokenKey])
+            if value is MISSING
+        ]
@@ -0,0 +1,182 @@
+"""
+  Opt-in timing of SnapshotManager actions, see SnapshotManager(profile=True)
+"""
+import json
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from tabulate import tabulate
+
+COUNTERS = ("rpc", "request_bytes", "response_bytes")
+
+
+class ActionRecord:
+    """
+    Phases of one settX call: wall time (excluding nested phases) and RPC counters
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.phases = {}
+        self.gas_used = None
+        self.block = None
+
+    def phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = {"wall": 0.0, "rpc": 0, "request_bytes": 0, "response_bytes": 0}
+        return self.phases[name]
+
+    def as_dict(self):
+        return {
+            "action": self.action,
+            "block": self.block,
+            "gas_used": self.gas_used,
+            "phases": self.phases,
+        }
+
+
+class ActionProfiler:
+    def __init__(self):
+        self.records = []
+        self.current = None
+        ## [(phase name, start, time spent in nested phases)]
+        self.stack = []
+        self.lock = Lock()
+        ## True once attach() counts the requests sent through web3
+        self.counting = False
+        self.web3 = None
+
+    def attach(self, web3):
+        """
+        Counts every request sent through web3, transactions and receipt polling included,
+        in the innermost running phase
+        """
+
+        def middleware(make_request, w3):
+            def request(method, params):
+                self.count()
+                return make_request(method, params)
+
+            return request
+
+        web3.middleware_onion.add(middleware, self.middleware_name())
+        self.web3 = web3
+        self.counting = True
+
+    def detach(self):
+        """
+        Removes the middleware added by attach, web3 is shared by everything in the session
+        """
+        if self.web3 is None:
+            return
+        self.web3.middleware_onion.remove(self.middleware_name())
+        self.web3 = None
+        self.counting = False
+
+    def middleware_name(self):
+        return "profiler-{}".format(id(self))
+
+    @contextmanager
+    def action(self, name):
+        record = ActionRecord(name)
+        self.records.append(record)
+        self.current = record
+        try:
+            ## Time not covered by any named phase
+            with self.phase("overhead"):
+                yield record
+        finally:
+            self.current = None
+
+    @contextmanager
+    def phase(self, name):
+        if self.current is None:
+            yield
+            return
+        frame = [name, time.perf_counter(), 0.0]
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.current.phase(name)["wall"] += elapsed - frame[2]
+            if self.stack:
+                self.stack[-1][2] += elapsed
+
+    def count(self, requests=1):
+        if self.current is None or not self.stack:
+            return
+        with self.lock:
+            self.current.phase(self.stack[-1][0])["rpc"] += requests
+
+    def add_rpc(self, stats):
+        """
+        Adds Multicall.stats to the innermost running phase
+        When attached to web3, only the requests sent outside of it are taken from stats
+        """
+        if self.current is None or not self.stack:
+            return
+        with self.lock:
+            phase = self.current.phase(self.stack[-1][0])
+            phase["rpc"] += stats["direct"] if self.counting else stats["rpc"]
+            phase["request_bytes"] += stats["request_bytes"]
+            phase["response_bytes"] += stats["response_bytes"]
+
+    def add_tx(self, tx):
+        if self.current is not None:
+            self.current.gas_used = tx.gas_used
+            self.current.block = tx.block_number
+
+    # ===== Reporting =====
+
+    def summary(self):
+        """
+        {action: {count, gas_used, phases: {phase: totals}}} summed over all records
+        """
+        summary = {}
+        for record in self.records:
+            action = summary.setdefault(record.action, {"count": 0, "gas_used": 0, "phases": {}})
+            action["count"] += 1
+            action["gas_used"] += record.gas_used or 0
+            for name, values in record.phases.items():
+                totals = action["phases"].setdefault(
+                    name, {"wall": 0.0, "rpc": 0, "request_bytes": 0, "response_bytes": 0}
+                )
+                totals["wall"] += values["wall"]
+                for counter in COUNTERS:
+                    totals[counter] += values[counter]
+        return summary
+
+    def report(self):
+        table = []
+        for name, action in self.summary().items():
+            for phase, totals in action["phases"].items():
+                table.append(
+                    [
+                        name,
+                        phase,
+                        action["count"],
+                        "{:.4f}".format(totals["wall"]),
+                        "{:.4f}".format(totals["wall"] / action["count"]),
+                        totals["rpc"],
+                        totals["request_bytes"],
+                        totals["response_bytes"],
+                    ]
+                )
+            table.append([name, "gas_used", action["count"], "", "", "", "", action["gas_used"]])
+        return tabulate(
+            table,
+            headers=["action", "phase", "count", "wall", "mean", "rpc", "sent", "received"],
+        )
+
+    def to_json(self, path=None):
+        report = {
+            "records": [record.as_dict() for record in self.records],
+            "summary": self.summary(),
+        }
+        if path is None:
+            return json.dumps(report, indent=2)
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
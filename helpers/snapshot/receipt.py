@@ -0,0 +1,79 @@
+"""
+  Find which snapshot calls a transaction may have changed, from its receipt logs
+"""
+from eth_utils import keccak
+
+from helpers.multicall import func
+
+
+def event_topic(signature):
+    return keccak(text=signature)
+
+
+TRANSFER = event_topic("Transfer(address,address,uint256)")
+
+## GMX staking / vesting events, the account is the first (non indexed) word of data
+STAKE_GMX = event_topic("StakeGmx(address,address,uint256)")
+UNSTAKE_GMX = event_topic("UnstakeGmx(address,address,uint256)")
+VESTER_DEPOSIT = event_topic("Deposit(address,uint256)")
+VESTER_WITHDRAW = event_topic("Withdraw(address,uint256,uint256)")
+VESTER_CLAIM = event_topic("Claim(address,uint256)")
+
+STAKING_EVENTS = {STAKE_GMX, UNSTAKE_GMX}
+VESTING_EVENTS = {VESTER_DEPOSIT, VESTER_WITHDRAW, VESTER_CLAIM}
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+def _word_address(word):
+    return "0x" + word[12:32].hex()
+
+
+class DirtyState:
+    """
+    (token, holder) balances and staking accounts touched by a transaction
+    Addresses are kept lowercase
+    """
+
+    def __init__(self):
+        self.balances = set()
+        self.stakers = set()
+
+    def add_balance(self, token, holder):
+        self.balances.add((token.lower(), holder.lower()))
+
+    def needs_refetch(self, call):
+        """
+        Balance calls are only refetched if a log touched them
+        Every other call (sett / strategy metrics) may depend on block time and is always refetched
+        """
+        if call.function == func.erc20.balanceOf and call.args:
+            return (str(call.target).lower(), str(call.args[0]).lower()) in self.balances
+        if call.function == func.stakedGmxTracker.depositBalances and call.args:
+            account = str(call.args[0]).lower()
+            return account in self.stakers or (str(call.target).lower(), account) in self.balances
+        return True
+
+
+def dirty_from_logs(logs):
+    dirty = DirtyState()
+    for log in logs:
+        topics = [_to_bytes(topic) for topic in log["topics"]]
+        if not topics:
+            continue
+        address = log["address"]
+        data = _to_bytes(log["data"])
+
+        if topics[0] == TRANSFER and len(topics) == 3:
+            dirty.add_balance(address, _word_address(topics[1]))
+            dirty.add_balance(address, _word_address(topics[2]))
+        elif topics[0] in STAKING_EVENTS and len(data) >= 32:
+            dirty.stakers.add(_word_address(data))
+        elif topics[0] in VESTING_EVENTS and len(data) >= 32:
+            ## Vesting changes the vester balance of the account
+            dirty.add_balance(address, _word_address(data))
+    return dirty
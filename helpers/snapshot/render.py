@@ -0,0 +1,227 @@
+"""
+  Sinks for SnapshotManager.printCompare / printTable
+  Values are only formatted by the console sink, and only for rows that are shown
+  Wrap a sink in BackgroundSink to render off the settX thread
+"""
+import csv
+import json
+from queue import Queue
+from threading import Thread
+
+from tabulate import tabulate
+from rich.console import Console
+
+from helpers.multicall import MISSING
+from helpers.snapshot.snap import ABSENT
+
+console = Console()
+
+
+def changed_rows(before, after):
+    """
+    [(key, before value, after value)] for keys of before whose value changed
+    Keys after doesn't have are read with after.get, which loads them or raises
+    """
+    keys = before.schema.keys
+    if after.schema is before.schema:
+        afterValues = after.values
+        rows = []
+        for index, a in enumerate(before.values):
+            if a is ABSENT:
+                continue
+            b = afterValues[index] if index < len(afterValues) else ABSENT
+            if b is ABSENT:
+                b = after.get(keys[index])
+            if a != b:
+                rows.append((keys[index], a, b))
+        return rows
+
+    rows = []
+    for key, a in before.data.items():
+        b = after.get(key)
+        if a != b:
+            rows.append((key, a, b))
+    return rows
+
+
+def raw(value):
+    ## JSON / CSV friendly value
+    if value is MISSING:
+        return None
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+class NullSink:
+    """
+    Drops everything, for CI runs where nobody reads the output
+    """
+
+    def compare(self, key, before, after, rows, format, diff):
+        pass
+
+    def table(self, key, snap, rows, format):
+        pass
+
+
+class ConsoleSink:
+    """
+    The tabulate output printCompare / printTable always had
+    """
+
+    def compare(self, key, before, after, rows, format, diff):
+        console.print(
+            "[green]=== Compare: {} Sett {} -> {} ===[/green]".format(
+                key, before.block, after.block
+            )
+        )
+        table = [
+            [metric, format(metric, a), format(metric, b), format(metric, diff(a, b))]
+            for metric, a, b in rows
+        ]
+        print(
+            tabulate(
+                table, headers=["metric", "before", "after", "diff"], tablefmt="grid"
+            )
+        )
+
+    def table(self, key, snap, rows, format):
+        console.print("[green]=== Status Report: {} Sett ===[green]".format(key))
+        table = [[metric, format(metric, value)] for metric, value in rows]
+        table.append(["---------------", "--------------------"])
+        print(tabulate(table, headers=["metric", "value"]))
+
+
+class JsonlSink:
+    """
+    One JSON object per changed metric, raw integer values
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def compare(self, key, before, after, rows, format, diff):
+        for metric, a, b in rows:
+            self.file.write(
+                json.dumps(
+                    {
+                        "kind": "compare",
+                        "sett": key,
+                        "beforeBlock": before.block,
+                        "afterBlock": after.block,
+                        "metric": metric,
+                        "before": raw(a),
+                        "after": raw(b),
+                        "diff": raw(diff(a, b)),
+                    }
+                )
+                + "\n"
+            )
+        self.file.flush()
+
+    def table(self, key, snap, rows, format):
+        for metric, value in rows:
+            self.file.write(
+                json.dumps(
+                    {
+                        "kind": "table",
+                        "sett": key,
+                        "block": snap.block,
+                        "metric": metric,
+                        "value": raw(value),
+                    }
+                )
+                + "\n"
+            )
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvSink:
+    """
+    kind, sett, beforeBlock, afterBlock, metric, before, after, diff
+    printTable rows leave before and diff empty
+    """
+
+    HEADER = ["kind", "sett", "beforeBlock", "afterBlock", "metric", "before", "after", "diff"]
+
+    def __init__(self, path):
+        self.file = open(path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(self.HEADER)
+
+    def compare(self, key, before, after, rows, format, diff):
+        self.writer.writerows(
+            ["compare", key, before.block, after.block, metric, raw(a), raw(b), raw(diff(a, b))]
+            for metric, a, b in rows
+        )
+        self.file.flush()
+
+    def table(self, key, snap, rows, format):
+        self.writer.writerows(
+            ["table", key, "", snap.block, metric, "", raw(value), ""] for metric, value in rows
+        )
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BackgroundSink:
+    """
+    Renders through sink on a worker thread, in call order, so settX doesn't wait on
+    formatting and I/O. flush() waits for pending rows and raises the first render error
+
+    manager = SnapshotManager(..., sink=BackgroundSink(ConsoleSink()))
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.queue = Queue()
+        self.error = None
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                method, args = item
+                if self.error is None:
+                    try:
+                        getattr(self.sink, method)(*args)
+                    except Exception as error:
+                        self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _raise(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def compare(self, key, before, after, rows, format, diff):
+        self._raise()
+        self.queue.put(("compare", (key, before, after, rows, format, diff)))
+
+    def table(self, key, snap, rows, format):
+        self._raise()
+        self.queue.put(("table", (key, snap, rows, format)))
+
+    def flush(self):
+        self.queue.join()
+        self._raise()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if hasattr(self.sink, "close"):
+            self.sink.close()
+        self._raise()
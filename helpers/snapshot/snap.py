@@ -1,27 +1,185 @@
+import sys
+from collections.abc import MutableMapping
+from threading import Lock
+
+from helpers.multicall import MISSING
+
+
+class Absent:
+    """
+    Slot of a key the snap has no value for
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "ABSENT"
+
+
+ABSENT = Absent()
+
+
+class SnapSchema:
+    """
+    Interned key -> slot index, shared by every Snap of a SnapshotManager
+    """
+
+    __slots__ = ("keys", "slots", "lock")
+
+    def __init__(self):
+        self.keys = []
+        self.slots = {}
+        self.lock = Lock()
+
+    def find(self, key):
+        return self.slots.get(key)
+
+    def slot(self, key):
+        index = self.slots.get(key)
+        if index is None:
+            with self.lock:
+                index = self.slots.get(key)
+                if index is None:
+                    index = len(self.keys)
+                    key = sys.intern(key)
+                    self.keys.append(key)
+                    self.slots[key] = index
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class SnapData(MutableMapping):
+    """
+    dict-like view over the values of a Snap
+    """
+
+    __slots__ = ("snap",)
+
+    def __init__(self, snap):
+        self.snap = snap
+
+    def __getitem__(self, key):
+        value = self.snap.value(key)
+        if value is ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.snap.set(key, value)
+
+    def __delitem__(self, key):
+        if self.snap.value(key) is ABSENT:
+            raise KeyError(key)
+        self.snap.set(key, ABSENT)
+
+    def __contains__(self, key):
+        return self.snap.value(key) is not ABSENT
+
+    def __iter__(self):
+        keys = self.snap.schema.keys
+        for index, value in enumerate(self.snap.values):
+            if value is not ABSENT:
+                yield keys[index]
+
+    def __len__(self):
+        return sum(1 for value in self.snap.values if value is not ABSENT)
+
+
 class Snap:
-    def __init__(self, data, block, entityKeys):
-        self.data = data
+    __slots__ = (
+        "schema",
+        "values",
+        "block",
+        "entityKeys",
+        "loader",
+        "strict",
+        "accessed",
+    )
+
+    def __init__(self, data, block, entityKeys, loader=None, strict=False, schema=None):
+        self.schema = schema if schema is not None else SnapSchema()
+        self.values = [ABSENT] * len(self.schema)
         self.block = block
         self.entityKeys = entityKeys
+        ## Fetches the full data when a key that wasn't requested is read
+        self.loader = loader
+        ## Raise on keys that weren't requested instead of loading them
+        self.strict = strict
+        ## Set of keys read through the getters, when tracing
+        self.accessed = None
+
+        for key, value in data.items():
+            self.set(key, value)
+
+    @property
+    def data(self):
+        return SnapData(self)
+
+    def value(self, key):
+        index = self.schema.find(key)
+        if index is None or index >= len(self.values):
+            return ABSENT
+        return self.values[index]
+
+    def read(self, key):
+        if self.accessed is not None:
+            self.accessed.add(key)
+        value = self.value(key)
+        if value is ABSENT:
+            if self.loader is not None:
+                loader, self.loader = self.loader, None
+                for loaded_key, loaded in loader().items():
+                    if self.value(loaded_key) is ABSENT:
+                        self.set(loaded_key, loaded)
+                value = self.value(key)
+            elif self.strict:
+                raise Exception(
+                    "Key {} was never recorded for this action, snap at block {} is strict".format(
+                        key, self.block
+                    )
+                )
+        if value is ABSENT:
+            raise KeyError(key)
+        return value
+
+    def mark_read(self, keys):
+        """
+        Records keys as read when tracing, for rows rendered from the raw values
+        """
+        if self.accessed is not None:
+            self.accessed.update(keys)
 
     # ===== Getters =====
 
     def balances(self, tokenKey, accountKey):
-        return self.data["balances." + tokenKey + "." + accountKey]
+        return self.read("balances." + tokenKey + "." + accountKey)
 
     def shares(self, tokenKey, accountKey):
-        return self.data["shares." + tokenKey + "." + accountKey]
+        return self.read("shares." + tokenKey + "." + accountKey)
 
     def get(self, key):
-        if key not in self.data.keys():
+        if self.value(key) is ABSENT and self.loader is None and not self.strict:
             raise Exception("Key {} not found in snap data".format(key))
-        return self.data[key]
+        return self.read(key)
+
+    def missing(self):
+        """
+        Keys whose call reverted, only set when snapshotting with allow_failure
+        """
+        keys = self.schema.keys
+        return [keys[index] for index, value in enumerate(self.values) if value is MISSING]
 
     # custom test
     def depositBalances(self, tokenKey):
-        return self.data["depositBalances." + tokenKey]
+        return self.read("depositBalances." + tokenKey)
 
     # ===== Setters =====
 
     def set(self, key, value):
-        self.data[key] = value
+        index = self.schema.slot(key)
+        values = self.values
+        if index >= len(values):
+            values.extend([ABSENT] * (len(self.schema) - len(values)))
+        values[index] = value
@@ -0,0 +1,201 @@
+import json
+import os
+import sqlite3
+import tempfile
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from threading import RLock
+
+from helpers.multicall import MISSING
+from helpers.snapshot.snap import ABSENT, Snap
+
+
+def encode_value(value):
+    ## MISSING is stored as NULL, ints are exact in json
+    if value is MISSING:
+        return None
+    return json.dumps(value)
+
+
+def decode_value(text):
+    if text is None:
+        return MISSING
+    value = json.loads(text)
+    return tuple(value) if isinstance(value, list) else value
+
+
+class SnapStore(MutableMapping):
+    """
+    block -> Snap store behind SnapshotManager.snaps
+    The `window` most recently added snaps stay in memory, older ones spill to SQLite
+    With window=None every snap stays in memory and nothing is written to disk
+    """
+
+    def __init__(self, schema, window=None, path=None):
+        self.schema = schema
+        self.window = window
+        self.path = path
+        ## True when path is a temporary file created by the store, removed on close()
+        self.temporary = False
+        self.memory = OrderedDict()
+        self.db = None
+        self.lock = RLock()
+
+    def _connect(self):
+        if self.db is None:
+            if self.path is None:
+                fd, self.path = tempfile.mkstemp(prefix="snaps-", suffix=".sqlite")
+                os.close(fd)
+                self.temporary = True
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS snaps (
+                    block INTEGER PRIMARY KEY,
+                    entityKeys TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS snap_values (
+                    block INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT,
+                    PRIMARY KEY (block, key)
+                );
+                CREATE INDEX IF NOT EXISTS snap_values_by_key ON snap_values (key, block);
+                """
+            )
+        return self.db
+
+    def _spill(self, snap):
+        db = self._connect()
+        keys = self.schema.keys
+        with db:
+            db.execute("DELETE FROM snap_values WHERE block = ?", (snap.block,))
+            db.execute(
+                "INSERT OR REPLACE INTO snaps (block, entityKeys) VALUES (?, ?)",
+                (snap.block, json.dumps(list(snap.entityKeys))),
+            )
+            db.executemany(
+                "INSERT INTO snap_values (block, key, value) VALUES (?, ?, ?)",
+                [
+                    (snap.block, keys[index], encode_value(value))
+                    for index, value in enumerate(snap.values)
+                    if value is not ABSENT
+                ],
+            )
+
+    def _load(self, block):
+        if self.db is None:
+            return None
+        row = self.db.execute(
+            "SELECT entityKeys FROM snaps WHERE block = ?", (block,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = {
+            key: decode_value(value)
+            for key, value in self.db.execute(
+                "SELECT key, value FROM snap_values WHERE block = ?", (block,)
+            )
+        }
+        return Snap(data, block, json.loads(row[0]), schema=self.schema)
+
+    def _disk_blocks(self, start=None, end=None):
+        if self.db is None:
+            return []
+        rows = self.db.execute(
+            "SELECT block FROM snaps WHERE block >= ? AND block <= ? ORDER BY block",
+            (start if start is not None else -1, end if end is not None else 2 ** 62),
+        )
+        return [row[0] for row in rows]
+
+    # ===== Mapping =====
+
+    def __setitem__(self, block, snap):
+        with self.lock:
+            self.memory.pop(block, None)
+            self.memory[block] = snap
+            if self.window is not None:
+                while len(self.memory) > self.window:
+                    _, oldest = self.memory.popitem(last=False)
+                    self._spill(oldest)
+
+    def __getitem__(self, block):
+        with self.lock:
+            if block in self.memory:
+                return self.memory[block]
+            snap = self._load(block)
+        if snap is None:
+            raise KeyError(block)
+        return snap
+
+    def __delitem__(self, block):
+        with self.lock:
+            found = self.memory.pop(block, None) is not None
+            if self.db is not None:
+                with self.db:
+                    deleted = self.db.execute("DELETE FROM snaps WHERE block = ?", (block,))
+                    self.db.execute("DELETE FROM snap_values WHERE block = ?", (block,))
+                found = found or deleted.rowcount > 0
+        if not found:
+            raise KeyError(block)
+
+    def __iter__(self):
+        return iter(self.blocks())
+
+    def __len__(self):
+        return len(self.blocks())
+
+    def blocks(self, start=None, end=None):
+        """
+        Sorted blocks in [start, end], in memory or on disk
+        """
+        with self.lock:
+            blocks = set(self._disk_blocks(start, end))
+            blocks.update(
+                block
+                for block in self.memory
+                if (start is None or block >= start) and (end is None or block <= end)
+            )
+        return sorted(blocks)
+
+    # ===== Queries =====
+
+    def range(self, start=None, end=None):
+        """
+        Snaps with start <= block <= end, in block order
+        """
+        for block in self.blocks(start, end):
+            yield self[block]
+
+    def column(self, key, start=None, end=None):
+        """
+        [(block, value)] of one metric across stored snaps, in block order
+        """
+        values = {}
+        with self.lock:
+            if self.db is not None:
+                rows = self.db.execute(
+                    "SELECT block, value FROM snap_values WHERE key = ? AND block >= ? AND block <= ?",
+                    (key, start if start is not None else -1, end if end is not None else 2 ** 62),
+                )
+                values.update((block, decode_value(value)) for block, value in rows)
+            for block, snap in self.memory.items():
+                if (start is None or block >= start) and (end is None or block <= end):
+                    value = snap.value(key)
+                    if value is not ABSENT:
+                        values[block] = value
+        return sorted(values.items())
+
+    def close(self):
+        """
+        Closes the database, deleting it if it was a temporary file
+        Spilled snaps are gone after closing a temporary store
+        """
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+            if self.temporary:
+                os.remove(self.path)
+                self.path = None
+                self.temporary = False
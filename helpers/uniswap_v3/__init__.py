@@ -0,0 +1,18 @@
+from helpers.uniswap_v3.full_math import mul_div, mul_div_rounding_up
+from helpers.uniswap_v3.tick_math import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+)
+from helpers.uniswap_v3.oracle import QuoteTable, get_quote_at_tick, mean_tick
+from helpers.uniswap_v3.sqrt_price_math import compute_swap_step
+from helpers.uniswap_v3.pool import (
+    PoolSnapshot,
+    SwapRevert,
+    max_amount_in,
+    min_out,
+    slippage_table,
+)
@@ -0,0 +1,25 @@
+"""
+  FullMath: 512 bit intermediate mulDiv, exact with Python ints
+"""
+MAX_UINT256 = 2 ** 256 - 1
+
+
+def mul_div(a, b, denominator):
+    """
+    floor(a * b / denominator), reverts like FullMath.mulDiv on a zero denominator or overflow
+    """
+    if denominator == 0:
+        raise ZeroDivisionError("mulDiv denominator is zero")
+    result = a * b // denominator
+    if result > MAX_UINT256:
+        raise OverflowError("mulDiv overflows uint256")
+    return result
+
+
+def mul_div_rounding_up(a, b, denominator):
+    result = mul_div(a, b, denominator)
+    if a * b % denominator:
+        if result == MAX_UINT256:
+            raise OverflowError("mulDivRoundingUp overflows uint256")
+        result += 1
+    return result
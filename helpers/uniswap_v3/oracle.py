@@ -0,0 +1,99 @@
+"""
+  OracleLibrary.getQuoteAtTick and the TWAP tick of MyStrategy.estimateAmountOut
+"""
+from helpers.uniswap_v3.full_math import mul_div
+from helpers.uniswap_v3.tick_math import MAX_TICK, MIN_TICK, get_sqrt_ratio_at_tick
+
+Q64 = 1 << 64
+Q128 = 1 << 128
+Q192 = 1 << 192
+MAX_UINT128 = 2 ** 128 - 1
+
+
+def sorts_before(tokenA, tokenB):
+    """
+    Solidity's tokenA < tokenB on addresses
+    """
+    return int(tokenA, 16) < int(tokenB, 16)
+
+
+def mean_tick(tick_cumulative_start, tick_cumulative_end, seconds_ago):
+    """
+    Arithmetic mean tick between two observations, rounded to negative infinity
+    """
+    delta = tick_cumulative_end - tick_cumulative_start
+    ## Solidity division truncates toward zero
+    tick = abs(delta) // seconds_ago * (1 if delta >= 0 else -1)
+    if delta < 0 and delta % seconds_ago != 0:
+        tick -= 1
+    return tick
+
+
+def _ratio(sqrt_ratio):
+    """
+    (price, shift) with the price as an X192 or X128 fixed point, as getQuoteAtTick picks them
+    """
+    if sqrt_ratio <= MAX_UINT128:
+        return sqrt_ratio * sqrt_ratio, Q192
+    return mul_div(sqrt_ratio, sqrt_ratio, Q64), Q128
+
+
+def _check_amount(base_amount):
+    if not 0 <= base_amount <= MAX_UINT128:
+        raise ValueError("AmountInError")
+
+
+def get_quote_at_tick(tick, base_amount, base_token, quote_token):
+    """
+    Amount of quote_token for base_amount of base_token at tick
+    """
+    _check_amount(base_amount)
+    ratio, one = _ratio(get_sqrt_ratio_at_tick(tick))
+    if sorts_before(base_token, quote_token):
+        return mul_div(ratio, base_amount, one)
+    return mul_div(one, base_amount, ratio)
+
+
+class QuoteTable:
+    """
+    Prices of every tick in [min_tick, max_tick], precomputed once
+    Keep the range narrow, the full tick range is about 1.77M ticks
+    quote_many prices many amounts at many ticks without recomputing the tick math
+    Ticks outside the range are computed on the fly
+    """
+
+    def __init__(self, min_tick, max_tick):
+        if min_tick < MIN_TICK or max_tick > MAX_TICK or min_tick > max_tick:
+            raise ValueError("T")
+        self.min_tick = min_tick
+        self.max_tick = max_tick
+        self.ratios = [
+            _ratio(get_sqrt_ratio_at_tick(tick)) for tick in range(min_tick, max_tick + 1)
+        ]
+
+    def ratio(self, tick):
+        if self.min_tick <= tick <= self.max_tick:
+            return self.ratios[tick - self.min_tick]
+        return _ratio(get_sqrt_ratio_at_tick(tick))
+
+    def quote(self, tick, base_amount, base_token, quote_token):
+        return self.quote_many([tick], [base_amount], base_token, quote_token)[0][0]
+
+    def quote_many(self, ticks, base_amounts, base_token, quote_token):
+        """
+        Returns [[quote of every amount] for every tick], same results as get_quote_at_tick
+        """
+        for amount in base_amounts:
+            _check_amount(amount)
+        zeroForOne = sorts_before(base_token, quote_token)
+
+        quotes = []
+        for tick in ticks:
+            ratio, one = self.ratio(tick)
+            if zeroForOne:
+                ## one is a power of two, so mulDiv is a shift
+                shift = one.bit_length() - 1
+                quotes.append([ratio * amount >> shift for amount in base_amounts])
+            else:
+                quotes.append([mul_div(one, amount, ratio) for amount in base_amounts])
+        return quotes
@@ -0,0 +1,273 @@
+"""
+  Offline UniswapV3Pool.swap over a tick liquidity snapshot, with the SwapRouter single swaps
+"""
+import json
+from bisect import bisect_left, bisect_right
+
+from dotmap import DotMap
+
+from helpers.uniswap_v3.oracle import QuoteTable, sorts_before
+from helpers.uniswap_v3.sqrt_price_math import compute_swap_step
+from helpers.uniswap_v3.tick_math import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+)
+
+## MyStrategy / BaseStrategy MAX_BPS, slipRange is in bps
+MAX_BPS = 10_000
+MAX_UINT128 = 2 ** 128 - 1
+
+
+class SwapRevert(Exception):
+    """
+    Raised where the pool or router would revert, with the same reason string
+    """
+
+
+class PoolSnapshot:
+    """
+    State of one pool: price, in-range liquidity and the liquidityNet of initialized ticks
+    Swaps never change the snapshot, every swap starts from it
+
+    JSON format, big numbers can be strings:
+    {"token0", "token1", "fee", "tickSpacing", "sqrtPriceX96", "tick", "liquidity",
+     "ticks": {"<tick>": liquidityNet}}
+    """
+
+    def __init__(self, token0, token1, fee, tickSpacing, sqrtPriceX96, tick, liquidity, ticks):
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = fee
+        self.tickSpacing = tickSpacing
+        self.sqrtPriceX96 = sqrtPriceX96
+        self.tick = tick
+        self.liquidity = liquidity
+        ## tick -> liquidityNet
+        self.ticks = ticks
+        ## Initialized ticks compressed by tickSpacing, sorted, the tick bitmap
+        self.compressed = sorted(tick // tickSpacing for tick in ticks)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["token0"],
+            data["token1"],
+            int(data["fee"]),
+            int(data["tickSpacing"]),
+            int(data["sqrtPriceX96"]),
+            int(data["tick"]),
+            int(data["liquidity"]),
+            {int(tick): int(net) for tick, net in data["ticks"].items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def as_dict(self):
+        return {
+            "token0": self.token0,
+            "token1": self.token1,
+            "fee": self.fee,
+            "tickSpacing": self.tickSpacing,
+            "sqrtPriceX96": str(self.sqrtPriceX96),
+            "tick": self.tick,
+            "liquidity": str(self.liquidity),
+            "ticks": {str(tick): str(net) for tick, net in sorted(self.ticks.items())},
+        }
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+    # ===== Pool =====
+
+    def next_initialized_tick_within_one_word(self, tick, lte):
+        """
+        TickBitmap.nextInitializedTickWithinOneWord: (next tick, initialized)
+        Steps stop at word boundaries like on chain, so rounding matches step by step
+        """
+        spacing = self.tickSpacing
+        compressed = tick // spacing
+        if lte:
+            wordStart = (compressed >> 8) << 8
+            i = bisect_right(self.compressed, compressed) - 1
+            if i >= 0 and self.compressed[i] >= wordStart:
+                return self.compressed[i] * spacing, True
+            return wordStart * spacing, False
+
+        compressed += 1
+        wordEnd = ((compressed >> 8) << 8) + 255
+        i = bisect_left(self.compressed, compressed)
+        if i < len(self.compressed) and self.compressed[i] <= wordEnd:
+            return self.compressed[i] * spacing, True
+        return wordEnd * spacing, False
+
+    def swap(self, zero_for_one, amount_specified, sqrt_price_limit=None):
+        """
+        UniswapV3Pool.swap without fee growth, oracle or transfers
+        amount_specified > 0 is exact input, < 0 exact output
+        Returns DotMap(amount0, amount1, sqrtPriceX96, tick, liquidity), pool signed amounts
+        """
+        if amount_specified == 0:
+            raise SwapRevert("AS")
+        if sqrt_price_limit is None:
+            sqrt_price_limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        if zero_for_one:
+            valid = self.sqrtPriceX96 > sqrt_price_limit > MIN_SQRT_RATIO
+        else:
+            valid = self.sqrtPriceX96 < sqrt_price_limit < MAX_SQRT_RATIO
+        if not valid:
+            raise SwapRevert("SPL")
+
+        exact_input = amount_specified > 0
+        remaining = amount_specified
+        calculated = 0
+        sqrt_price = self.sqrtPriceX96
+        tick = self.tick
+        liquidity = self.liquidity
+
+        while remaining != 0 and sqrt_price != sqrt_price_limit:
+            start = sqrt_price
+            tick_next, initialized = self.next_initialized_tick_within_one_word(tick, zero_for_one)
+            tick_next = min(max(tick_next, MIN_TICK), MAX_TICK)
+            sqrt_price_next = get_sqrt_ratio_at_tick(tick_next)
+
+            if zero_for_one:
+                target = sqrt_price_limit if sqrt_price_next < sqrt_price_limit else sqrt_price_next
+            else:
+                target = sqrt_price_limit if sqrt_price_next > sqrt_price_limit else sqrt_price_next
+            sqrt_price, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, self.fee
+            )
+
+            if exact_input:
+                remaining -= amount_in + fee_amount
+                calculated -= amount_out
+            else:
+                remaining += amount_out
+                calculated += amount_in + fee_amount
+
+            if sqrt_price == sqrt_price_next:
+                if initialized:
+                    net = self.ticks[tick_next]
+                    liquidity += -net if zero_for_one else net
+                    if not 0 <= liquidity <= MAX_UINT128:
+                        raise SwapRevert("LS" if liquidity < 0 else "LA")
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+
+        if zero_for_one == exact_input:
+            amount0, amount1 = amount_specified - remaining, calculated
+        else:
+            amount0, amount1 = calculated, amount_specified - remaining
+
+        return DotMap(
+            amount0=amount0,
+            amount1=amount1,
+            sqrtPriceX96=sqrt_price,
+            tick=tick,
+            liquidity=liquidity,
+        )
+
+    # ===== SwapRouter =====
+
+    def zero_for_one(self, token_in, token_out):
+        return sorts_before(token_in, token_out)
+
+    def exact_input(self, token_in, token_out, amount_in, amount_out_minimum=0, sqrt_price_limit=None):
+        """
+        SwapRouter.exactInputSingle, returns the amount out
+        """
+        zero_for_one = self.zero_for_one(token_in, token_out)
+        result = self.swap(zero_for_one, amount_in, sqrt_price_limit)
+        amount_out = -(result.amount1 if zero_for_one else result.amount0)
+        if amount_out < amount_out_minimum:
+            raise SwapRevert("Too little received")
+        return amount_out
+
+    def exact_output(self, token_in, token_out, amount_out, amount_in_maximum=None, sqrt_price_limit=None):
+        """
+        SwapRouter.exactOutputSingle, returns the amount in
+        """
+        zero_for_one = self.zero_for_one(token_in, token_out)
+        result = self.swap(zero_for_one, -amount_out, sqrt_price_limit)
+        if zero_for_one:
+            amount_in, received = result.amount0, -result.amount1
+        else:
+            amount_in, received = result.amount1, -result.amount0
+        ## Without a price limit the router requires the full output
+        if sqrt_price_limit is None and received != amount_out:
+            raise SwapRevert("Not enough liquidity")
+        if amount_in_maximum is not None and amount_in > amount_in_maximum:
+            raise SwapRevert("Too much requested")
+        return amount_in
+
+
+# ===== Slippage analysis =====
+
+
+def min_out(quote, slip_range):
+    """
+    MyStrategy's amountOutMinimum: the TWAP quote less slipRange bps
+    """
+    return quote * (MAX_BPS - slip_range) // MAX_BPS
+
+
+def slippage_table(pool, token_in, token_out, amounts, slip_ranges, twap_tick=None, quotes=None):
+    """
+    For every amount of token_in, swaps it through pool once and checks it against every
+    slipRange like _singleSwap with getWETHinGMX as the quote
+    twap_tick defaults to the pool tick, quotes (a QuoteTable) can be shared between calls
+    Returns [DotMap(amountIn, quote, amountOut, impactBps, reverts {slipRange: bool})]
+    """
+    twap_tick = pool.tick if twap_tick is None else twap_tick
+    quotes = quotes if quotes is not None else QuoteTable(twap_tick, twap_tick)
+    amounts = list(amounts)
+    quoted = quotes.quote_many([twap_tick], amounts, token_in, token_out)[0]
+
+    rows = []
+    for amount, quote in zip(amounts, quoted):
+        try:
+            out = pool.exact_input(token_in, token_out, amount)
+        except SwapRevert:
+            out = 0
+        rows.append(
+            DotMap(
+                amountIn=amount,
+                quote=quote,
+                amountOut=out,
+                impactBps=(quote - out) * MAX_BPS // quote if quote else 0,
+                reverts={slip: out < min_out(quote, slip) for slip in slip_ranges},
+            )
+        )
+    return rows
+
+
+def max_amount_in(pool, token_in, token_out, slip_range, high, twap_tick=None):
+    """
+    Largest amount of token_in up to high that swaps without reverting on slip_range
+    Assumes the output falls behind the quote as the amount grows, as it does with fees
+    """
+    twap_tick = pool.tick if twap_tick is None else twap_tick
+    quotes = QuoteTable(twap_tick, twap_tick)
+
+    def passes(amount):
+        return not slippage_table(pool, token_in, token_out, [amount], [slip_range], twap_tick, quotes)[
+            0
+        ].reverts[slip_range]
+
+    low = 0
+    while low < high:
+        middle = (low + high + 1) // 2
+        if passes(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,145 @@
+"""
+  SqrtPriceMath and SwapMath.computeSwapStep, including the uint256 overflow branches
+"""
+from helpers.uniswap_v3.full_math import mul_div, mul_div_rounding_up
+
+RESOLUTION = 96
+Q96 = 1 << RESOLUTION
+MAX_UINT160 = 2 ** 160 - 1
+MAX_UINT256 = 2 ** 256 - 1
+## Fees are in hundredths of a bip
+FEE_DENOMINATOR = 1_000_000
+
+
+def div_rounding_up(a, b):
+    return -(-a // b)
+
+
+def to_uint160(value):
+    if value > MAX_UINT160:
+        raise OverflowError("uint160 overflow")
+    return value
+
+
+def get_next_sqrt_price_from_amount0_rounding_up(sqrt_price, liquidity, amount, add):
+    if amount == 0:
+        return sqrt_price
+    numerator1 = liquidity << RESOLUTION
+    product = amount * sqrt_price
+
+    if add:
+        if product <= MAX_UINT256:
+            denominator = numerator1 + product
+            if denominator <= MAX_UINT256:
+                return to_uint160(mul_div_rounding_up(numerator1, sqrt_price, denominator))
+        return to_uint160(div_rounding_up(numerator1, numerator1 // sqrt_price + amount))
+
+    if product > MAX_UINT256 or numerator1 <= product:
+        raise ValueError("Amount0 exceeds the liquidity")
+    return to_uint160(mul_div_rounding_up(numerator1, sqrt_price, numerator1 - product))
+
+
+def get_next_sqrt_price_from_amount1_rounding_down(sqrt_price, liquidity, amount, add):
+    if add:
+        return to_uint160(sqrt_price + (amount << RESOLUTION) // liquidity)
+
+    quotient = div_rounding_up(amount << RESOLUTION, liquidity)
+    if sqrt_price <= quotient:
+        raise ValueError("Amount1 exceeds the liquidity")
+    return sqrt_price - quotient
+
+
+def get_next_sqrt_price_from_input(sqrt_price, liquidity, amount_in, zero_for_one):
+    assert sqrt_price > 0 and liquidity > 0
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount0_rounding_up(sqrt_price, liquidity, amount_in, True)
+    return get_next_sqrt_price_from_amount1_rounding_down(sqrt_price, liquidity, amount_in, True)
+
+
+def get_next_sqrt_price_from_output(sqrt_price, liquidity, amount_out, zero_for_one):
+    assert sqrt_price > 0 and liquidity > 0
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount1_rounding_down(sqrt_price, liquidity, amount_out, False)
+    return get_next_sqrt_price_from_amount0_rounding_up(sqrt_price, liquidity, amount_out, False)
+
+
+def get_amount0_delta(sqrt_ratio_a, sqrt_ratio_b, liquidity, round_up):
+    if sqrt_ratio_a > sqrt_ratio_b:
+        sqrt_ratio_a, sqrt_ratio_b = sqrt_ratio_b, sqrt_ratio_a
+    assert sqrt_ratio_a > 0
+    numerator1 = liquidity << RESOLUTION
+    numerator2 = sqrt_ratio_b - sqrt_ratio_a
+    if round_up:
+        return div_rounding_up(
+            mul_div_rounding_up(numerator1, numerator2, sqrt_ratio_b), sqrt_ratio_a
+        )
+    return mul_div(numerator1, numerator2, sqrt_ratio_b) // sqrt_ratio_a
+
+
+def get_amount1_delta(sqrt_ratio_a, sqrt_ratio_b, liquidity, round_up):
+    if sqrt_ratio_a > sqrt_ratio_b:
+        sqrt_ratio_a, sqrt_ratio_b = sqrt_ratio_b, sqrt_ratio_a
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_ratio_b - sqrt_ratio_a, Q96)
+    return mul_div(liquidity, sqrt_ratio_b - sqrt_ratio_a, Q96)
+
+
+def compute_swap_step(sqrt_ratio_current, sqrt_ratio_target, liquidity, amount_remaining, fee_pips):
+    """
+    One step of a swap within a single liquidity range
+    amount_remaining > 0 is exact input, < 0 exact output
+    Returns (sqrt ratio after, amount in, amount out, fee amount)
+    """
+    zero_for_one = sqrt_ratio_current >= sqrt_ratio_target
+    exact_in = amount_remaining >= 0
+
+    if exact_in:
+        remaining_less_fee = mul_div(
+            amount_remaining, FEE_DENOMINATOR - fee_pips, FEE_DENOMINATOR
+        )
+        if zero_for_one:
+            amount_in = get_amount0_delta(sqrt_ratio_target, sqrt_ratio_current, liquidity, True)
+        else:
+            amount_in = get_amount1_delta(sqrt_ratio_current, sqrt_ratio_target, liquidity, True)
+        if remaining_less_fee >= amount_in:
+            sqrt_ratio_next = sqrt_ratio_target
+        else:
+            sqrt_ratio_next = get_next_sqrt_price_from_input(
+                sqrt_ratio_current, liquidity, remaining_less_fee, zero_for_one
+            )
+    else:
+        if zero_for_one:
+            amount_out = get_amount1_delta(sqrt_ratio_target, sqrt_ratio_current, liquidity, False)
+        else:
+            amount_out = get_amount0_delta(sqrt_ratio_current, sqrt_ratio_target, liquidity, False)
+        if -amount_remaining >= amount_out:
+            sqrt_ratio_next = sqrt_ratio_target
+        else:
+            sqrt_ratio_next = get_next_sqrt_price_from_output(
+                sqrt_ratio_current, liquidity, -amount_remaining, zero_for_one
+            )
+
+    reached = sqrt_ratio_target == sqrt_ratio_next
+
+    if zero_for_one:
+        if not (reached and exact_in):
+            amount_in = get_amount0_delta(sqrt_ratio_next, sqrt_ratio_current, liquidity, True)
+        if not (reached and not exact_in):
+            amount_out = get_amount1_delta(sqrt_ratio_next, sqrt_ratio_current, liquidity, False)
+    else:
+        if not (reached and exact_in):
+            amount_in = get_amount1_delta(sqrt_ratio_current, sqrt_ratio_next, liquidity, True)
+        if not (reached and not exact_in):
+            amount_out = get_amount0_delta(sqrt_ratio_current, sqrt_ratio_next, liquidity, False)
+
+    ## The output can't exceed what was asked for
+    if not exact_in and amount_out > -amount_remaining:
+        amount_out = -amount_remaining
+
+    if exact_in and sqrt_ratio_next != sqrt_ratio_target:
+        ## Didn't reach the target, so the rest of the input is the fee
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = mul_div_rounding_up(amount_in, fee_pips, FEE_DENOMINATOR - fee_pips)
+
+    return sqrt_ratio_next, amount_in, amount_out, fee_amount
@@ -1,3 +1,5 @@
+from brownie import chain, interface
+
 # Assert approximate integer
 def approx(actual, expected, percentage_threshold):
     print(actual, expected, percentage_threshold)
@@ -8,11 +10,47 @@ def approx(actual, expected, percentage_threshold):
     return diff < (actual * percentage_threshold // 100)
 
 
+## (chain id, token address) -> decimals
+_decimals = {}
+
+
+def token_decimals(token):
+    """
+    decimals() of token (address or contract), fetched once per chain
+    """
+    address = str(getattr(token, "address", token))
+    key = (chain.id, address.lower())
+    if key not in _decimals:
+        _decimals[key] = interface.IERC20Detailed(address).decimals()
+    return _decimals[key]
+
+
+def format_fixed(amount, decimals=18, places=18):
+    """
+    Exact "{:,.<places>f}" of amount / 10 ** decimals using integers only
+    Rounds half up when decimals > places
+    """
+    sign = "-" if amount < 0 else ""
+    amount = abs(amount)
+    if decimals > places:
+        unit = 10 ** (decimals - places)
+        amount, remainder = divmod(amount, unit)
+        if remainder * 2 >= unit:
+            amount += 1
+    else:
+        amount *= 10 ** (places - decimals)
+
+    whole, fraction = divmod(amount, 10 ** places)
+    if not places:
+        return "{}{:,}".format(sign, whole)
+    return "{}{:,}.{}".format(sign, whole, str(fraction).rjust(places, "0"))
+
+
 def val(amount=0, decimals=18, token=None):
     # return amount
     # return "{:,.0f}".format(amount)
     # If no token specified, use decimals
     if token:
-        decimals = interface.IERC20Detailed(token).decimals()
+        decimals = token_decimals(token)
 
-    return "{:,.18f}".format(amount / 10 ** decimals)
+    return format_fixed(amount, decimals)
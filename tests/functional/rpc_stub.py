@@ -0,0 +1,279 @@
+"""
+  Local JSON-RPC node for the multicall tests, balanceOf(holder) == holder
+  Runs on a thread so both requests (sync) and aiohttp (async) clients can use it
+"""
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+from dotmap import DotMap
+from eth_abi import decode_single, encode_single
+import requests
+
+from helpers.multicall import batch, multicall
+from helpers.multicall.constants import MULTICALL3_ADDRESSES, MULTICALL_ADDRESSES, Network
+
+BLOCK = 1234
+REVERT = {"code": 3, "message": "execution reverted"}
+
+
+class Reverted(Exception):
+    pass
+
+
+def balance_of(data):
+    return int.from_bytes(data[-20:], "big").to_bytes(32, "big")
+
+
+def holder_of(data):
+    return "0x" + data[-20:].hex()
+
+
+class StubRPC:
+    """
+    with StubRPC() as rpc: ... rpc.endpoint, rpc.requests, rpc.web3
+
+    Answers eth_chainId, eth_blockNumber, eth_getCode, eth_getBlockByHash / ByNumber and eth_call
+    for aggregate, aggregate3 and plain balanceOf calls, one by one or in batches
+    balanceOf of a holder in reverts reverts, deployed=False leaves the aggregators without code
+    With jitter, every answer is delayed up to jitter seconds and batches come back shuffled
+    Set hashes[number] to give a block number another hash, like after chain.revert()
+    mine({holder: delta}) adds a block changing those balances from then on
+    results[calldata] is returned for any other call with that calldata
+    """
+
+    def __init__(self, chain_id=Network.Arbitrum, deployed=True, reverts=(), jitter=0, blocks=None):
+        self.chain_id = chain_id
+        self.deployed = deployed
+        self.reverts = {holder.lower() for holder in reverts}
+        self.jitter = jitter
+        ## block hash -> block number
+        self.blocks = blocks or {}
+        ## block number -> block hash, defaults to the number padded to 32 bytes
+        self.hashes = {}
+        self.height = BLOCK
+        ## block number -> {holder: balance change mined in that block}
+        self.deltas = {}
+        ## calldata -> ABI encoded output
+        self.results = {}
+        self.requests = []
+        self.lock = Lock()
+
+    def calls(self, method="eth_call"):
+        return [request for request in self.requests if request["method"] == method]
+
+    def mine(self, deltas):
+        self.height += 1
+        self.deltas[self.height] = {holder.lower(): delta for holder, delta in deltas.items()}
+        return self.height
+
+    def block_number(self, block):
+        if isinstance(block, dict):
+            return self.blocks[block["blockHash"]]
+        if block in ("latest", "pending"):
+            return self.height
+        return int(block, 16)
+
+    def balance(self, data, block=BLOCK):
+        if data in self.results:
+            return self.results[data]
+        holder = holder_of(data)
+        if holder in self.reverts:
+            raise Reverted()
+        balance = int.from_bytes(balance_of(data), "big")
+        for number, deltas in self.deltas.items():
+            if number <= block:
+                balance += deltas.get(holder, 0)
+        return balance.to_bytes(32, "big")
+
+    def eth_call(self, tx, block="latest"):
+        to = tx["to"].lower()
+        data = bytes.fromhex(tx["data"][2:])
+        block = self.block_number(block)
+        if to == MULTICALL_ADDRESSES.get(self.chain_id, "").lower():
+            (calls,) = decode_single("((address,bytes)[])", data[4:])
+            outputs = [self.balance(call_data, block) for _, call_data in calls]
+            return encode_single("(uint256,bytes[])", [block, outputs])
+        if to == MULTICALL3_ADDRESSES.get(self.chain_id, "").lower():
+            (calls,) = decode_single("((address,bool,bytes)[])", data[4:])
+            results = []
+            for _, allow_failure, call_data in calls:
+                try:
+                    results.append((True, self.balance(call_data, block)))
+                except Reverted:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+            return encode_single("((bool,bytes)[])", [results])
+        return self.balance(data, block)
+
+    def answer(self, body):
+        with self.lock:
+            self.requests.append(body)
+        if self.jitter:
+            time.sleep(random.random() * self.jitter)
+
+        method, params = body["method"], body["params"]
+        result = None
+        if method == "eth_chainId":
+            result = hex(self.chain_id)
+        elif method == "eth_blockNumber":
+            result = hex(self.height)
+        elif method == "eth_getCode":
+            result = "0x6080" if self.deployed else "0x"
+        elif method == "eth_getBlockByHash":
+            result = {"hash": params[0], "number": hex(self.blocks[params[0]])}
+        elif method == "eth_getBlockByNumber":
+            number = int(params[0], 16)
+            result = {"hash": self.hashes.get(number, "0x{:064x}".format(number)), "number": params[0]}
+        elif method == "eth_call":
+            try:
+                result = "0x" + self.eth_call(*params).hex()
+            except Reverted:
+                return {"jsonrpc": "2.0", "id": body["id"], "error": REVERT}
+        return {"jsonrpc": "2.0", "id": body["id"], "result": result}
+
+    def handle(self, body):
+        if isinstance(body, list):
+            answers = [self.answer(item) for item in body]
+            if self.jitter:
+                random.shuffle(answers)
+            return answers
+        return self.answer(body)
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                payload = json.dumps(stub.handle(body)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+        self.web3 = StubWeb3(self.endpoint)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubEth:
+    """
+    The part of brownie's web3.eth the multicall helpers use, over the stub node
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def request(self, method, params):
+        body = requests.post(
+            self.endpoint, json={"jsonrpc": "2.0", "id": 0, "method": method, "params": params}
+        ).json()
+        if "error" in body:
+            raise ValueError(body["error"])
+        return body["result"]
+
+    @property
+    def chainId(self):
+        return int(self.request("eth_chainId", []), 16)
+
+    @property
+    def block_number(self):
+        return int(self.request("eth_blockNumber", []), 16)
+
+    def get_code(self, address):
+        return bytes.fromhex(self.request("eth_getCode", [address, "latest"])[2:])
+
+    def get_block(self, block):
+        if isinstance(block, int):
+            result = self.request("eth_getBlockByNumber", [hex(block), False])
+        else:
+            result = self.request("eth_getBlockByHash", [block, False])
+        return DotMap(hash=result["hash"], number=int(result["number"], 16))
+
+    def call(self, tx, block="latest"):
+        return bytes.fromhex(
+            self.request("eth_call", [tx, batch.to_block_param(block)])[2:]
+        )
+
+
+class StubWeb3:
+    def __init__(self, endpoint):
+        self.eth = StubEth(endpoint)
+        self.provider = DotMap(endpoint_uri=endpoint)
+
+
+class StubChain:
+    """
+    brownie's chain, its height follows rpc.mine
+    """
+
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self.id = rpc.chain_id
+
+    @property
+    def height(self):
+        return self.rpc.height
+
+
+def use_stub(monkeypatch, rpc):
+    """
+    Points Multicall and the batch fallback at rpc instead of brownie's web3
+    """
+    monkeypatch.setattr(multicall, "web3", rpc.web3)
+    monkeypatch.setattr(batch, "web3", rpc.web3)
+    ## Aggregator code checks are cached per chain in the process
+    multicall.deployed_aggregators.clear()
+
+
+def stub_manager(monkeypatch, rpc, calls, **attrs):
+    """
+    SnapshotManager reading calls from rpc, without the sett, strategy and resolver
+    attrs override the constructor defaults, e.g. allow_failure=True
+    """
+    from helpers import SnapshotManager as module
+    from helpers.multicall.cache import CallCache
+    from helpers.snapshot.render import NullSink
+    from helpers.snapshot.snap import SnapSchema
+    from helpers.snapshot.store import SnapStore
+
+    use_stub(monkeypatch, rpc)
+    monkeypatch.setattr(module, "web3", rpc.web3)
+    monkeypatch.setattr(module, "chain", StubChain(rpc))
+
+    manager = module.SnapshotManager.__new__(module.SnapshotManager)
+    manager.key = "stub"
+    manager.profiler = None
+    manager.allow_failure = False
+    manager.derive_before = False
+    manager.incremental = False
+    manager.access_mode = None
+    manager.access_profiles = {}
+    manager.cache = CallCache()
+    manager.sink = NullSink()
+    manager.schema = SnapSchema()
+    manager.snaps = SnapStore(manager.schema)
+    manager.settSnaps = {}
+    manager.entities = {}
+    manager.tokens = {}
+    for name, value in attrs.items():
+        setattr(manager, name, value)
+    monkeypatch.setattr(manager, "add_snap_calls", lambda entities: calls)
+    return manager
@@ -0,0 +1,122 @@
+import pytest
+from dotmap import DotMap
+from rpc_stub import StubRPC, stub_manager
+
+from helpers.multicall import Call, func
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+KEYS = ["sett.balance", "sett.totalSupply", "strategy.balanceOf", "balances.want.user"]
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def compare(self, key, before, after, rows, format, diff):
+        self.rows.append([metric for metric, _, _ in rows])
+
+    def table(self, key, snap, rows, format):
+        self.rows.append([metric for metric, _ in rows])
+
+
+def snap_calls():
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, "0x{:040x}".format(i + 1)], [[key, None]])
+        for i, key in enumerate(KEYS)
+    ]
+
+
+class Chain:
+    """
+    Mocked SnapshotManager.fetch: records the keys of every fetch
+    Only sett.balance and strategy.balanceOf change with the tx
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.fetched = []
+
+    def fetch(self, calls, block):
+        keys = [name for call in calls for name, _ in call.returns]
+        self.fetched.append(keys)
+        return {
+            key: 100 + (self.sent if key in ("sett.balance", "strategy.balanceOf") else 0)
+            for key in keys
+        }
+
+    def send(self):
+        self.sent += 1
+        return DotMap(block_number=1)
+
+
+def manager_for(monkeypatch, rpc, access_mode):
+    manager = stub_manager(monkeypatch, rpc, snap_calls(), access_mode=access_mode, sink=ListSink())
+    chain = Chain()
+    monkeypatch.setattr(manager, "fetch", chain.fetch)
+    return manager, chain
+
+
+def deposit(manager, chain):
+    """
+    A settDeposit whose confirm only reads sett.totalSupply, then prints the compare table
+    """
+    before, tx, after = manager.snap_tx(chain.send, {}, "deposit")
+    assert after.get("sett.totalSupply") == before.get("sett.totalSupply")
+    manager.printCompare(before, after)
+    return before, after
+
+
+def test_record_then_replay(monkeypatch):
+    with StubRPC() as rpc:
+        manager, chain = manager_for(monkeypatch, rpc, "record")
+        deposit(manager, chain)
+
+        ## Read by confirm, and the two keys shown by printCompare
+        recorded = {"sett.totalSupply", "sett.balance", "strategy.balanceOf"}
+        assert manager.access_profiles["deposit"] == recorded
+        assert chain.fetched == [KEYS, KEYS]
+
+        manager.access_mode = "replay"
+        chain.fetched = []
+        before, after = deposit(manager, chain)
+
+    ## Replays only fetch the recorded keys, and the compare table is unchanged
+    assert [set(keys) for keys in chain.fetched] == [recorded, recorded]
+    assert manager.sink.rows == [["sett.balance", "strategy.balanceOf"]] * 2
+
+    ## Reading a key that wasn't recorded loads the rest of the snap
+    assert after.balances("want", "user") == 100
+    assert chain.fetched[-1] == KEYS
+    assert "balances.want.user" in manager.access_profiles["deposit"]
+
+
+def test_strict_mode(monkeypatch):
+    with StubRPC() as rpc:
+        manager, chain = manager_for(monkeypatch, rpc, "record")
+        deposit(manager, chain)
+
+        manager.access_mode = "strict"
+        chain.fetched = []
+        before, after = deposit(manager, chain)
+
+    assert len(chain.fetched) == 2
+    assert manager.sink.rows[-1] == ["sett.balance", "strategy.balanceOf"]
+    with pytest.raises(Exception, match="never recorded"):
+        after.balances("want", "user")
+    ## Strict snaps never load the rest
+    assert len(chain.fetched) == 2
+
+
+def test_replay_without_a_recording_fetches_everything(monkeypatch):
+    with StubRPC() as rpc:
+        manager, chain = manager_for(monkeypatch, rpc, "replay")
+        deposit(manager, chain)
+    assert chain.fetched == [KEYS, KEYS]
+
+
+def test_print_table_records_rows(monkeypatch):
+    with StubRPC() as rpc:
+        manager, chain = manager_for(monkeypatch, rpc, "record")
+        before, tx, after = manager.snap_tx(chain.send, {}, "earn")
+        manager.printTable(after)
+    assert manager.access_profiles["earn"] == set(KEYS)
@@ -0,0 +1,75 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+from rpc_stub import BLOCK, StubRPC
+
+pytest.importorskip("aiohttp")
+
+from helpers.multicall import AsyncMulticall, AsyncRPC, Call, func
+from helpers.multicall.multicall import deployed_aggregators
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+
+
+def balance_calls(holders):
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, holder], [["balances." + str(i), None]])
+        for i, holder in enumerate(holders)
+    ]
+
+
+def test_async_multicall_against_stub_rpc():
+    holders = ["0x{:040x}".format(i + 1) for i in range(10)]
+
+    async def run(endpoint):
+        async with AsyncRPC(endpoint) as rpc:
+            single = await AsyncMulticall(balance_calls(holders), rpc)()
+            chunked = await AsyncMulticall(balance_calls(holders), rpc, chunk_size=3)()
+        return single, chunked
+
+    deployed_aggregators.clear()
+    with StubRPC() as stub:
+        single, chunked = asyncio.run(run(stub.endpoint))
+    requests = stub.requests
+
+    expected = {"balances." + str(i): i + 1 for i in range(10)}
+    assert single == expected
+    assert chunked == expected
+    assert list(chunked) == list(expected)
+
+    ## Chunks are pinned to one block and the chain id is only fetched once
+    calls = [r for r in requests if r["method"] == "eth_call"]
+    assert len(calls) == 5
+    assert {r["params"][1] for r in calls[1:]} == {hex(BLOCK)}
+    assert len([r for r in requests if r["method"] == "eth_chainId"]) == 1
+
+
+def test_async_multicall_batch_fallback_without_aggregator():
+    holders = ["0x{:040x}".format(i + 1) for i in range(4)]
+
+    async def run(endpoint):
+        async with AsyncRPC(endpoint) as rpc:
+            return await AsyncMulticall(balance_calls(holders), rpc)()
+
+    with StubRPC(chain_id=999) as stub:
+        result = asyncio.run(run(stub.endpoint))
+    requests = stub.requests
+
+    assert result == {"balances." + str(i): i + 1 for i in range(4)}
+    ## One batch of eth_calls, all pinned to the same block
+    calls = [r for r in requests if r["method"] == "eth_call"]
+    assert len(calls) == 4
+    assert {r["params"][1] for r in calls} == {hex(BLOCK)}
+
+
+def test_async_client_is_imported_on_first_use():
+    ## aiohttp is only needed once AsyncMulticall / AsyncRPC are used
+    code = (
+        "import sys, helpers.multicall as multicall;"
+        "assert 'helpers.multicall.async_multicall' not in sys.modules;"
+        "multicall.AsyncRPC;"
+        "assert 'helpers.multicall.async_multicall' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
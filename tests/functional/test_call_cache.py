@@ -0,0 +1,117 @@
+from rpc_stub import StubRPC, stub_manager
+
+from helpers.multicall import Call, func
+from helpers.multicall.cache import CallCache
+
+CHAIN = 42161
+TOKEN = "0x00000000000000000000000000000000000000aa"
+HOLDER = "0x00000000000000000000000000000000000000bb"
+BLOCK_HASH = "0x" + "ab" * 32
+
+
+def balance_call(holder=HOLDER, immutable=False):
+    return Call(TOKEN, [func.erc20.balanceOf, holder], [["balance", None]], immutable=immutable)
+
+
+def test_hit_and_miss():
+    cache = CallCache()
+    call = balance_call()
+
+    assert cache.get(CHAIN, 10, call) is None
+    cache.put(CHAIN, 10, call, True, b"\x01")
+    assert cache.get(CHAIN, 10, call) == (True, b"\x01")
+    ## Other blocks, chains and calldata miss
+    assert cache.get(CHAIN, 11, call) is None
+    assert cache.get(1, 10, call) is None
+    assert cache.get(CHAIN, 10, balance_call(TOKEN)) is None
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_latest_is_never_cached():
+    cache = CallCache()
+    call = balance_call()
+    for block in (None, "latest", "pending"):
+        cache.put(CHAIN, block, call, True, b"\x01")
+        assert cache.get(CHAIN, block, call) is None
+    assert len(cache) == 0
+
+
+def test_block_hash_entries():
+    cache = CallCache()
+    call = balance_call()
+    cache.put(CHAIN, {"blockHash": BLOCK_HASH}, call, True, b"\x02")
+    assert cache.get(CHAIN, {"blockHash": BLOCK_HASH}, call) == (True, b"\x02")
+    assert cache.get(CHAIN, {"blockHash": "0x" + "cd" * 32}, call) is None
+    ## A hash is never invalidated by a reverted block number
+    cache.check(CHAIN, 0, "0x01")
+    cache.check(CHAIN, 0, "0x02")
+    assert cache.get(CHAIN, {"blockHash": BLOCK_HASH}, call) == (True, b"\x02")
+
+
+def test_immutable_entries_ignore_the_block():
+    cache = CallCache(max_entries=1)
+    decimals = balance_call(immutable=True)
+    cache.put(CHAIN, 10, decimals, True, b"\x12")
+    assert cache.get(CHAIN, 99, decimals) == (True, b"\x12")
+    assert cache.get(CHAIN, "latest", decimals) == (True, b"\x12")
+
+    ## Failed immutable calls aren't kept, and immutable entries are never evicted
+    cache.put(CHAIN, 10, balance_call(TOKEN, immutable=True), False, b"")
+    for block in range(5):
+        cache.put(CHAIN, block, balance_call(), True, b"\x01")
+    assert len(cache.entries) == 1
+    assert cache.get(CHAIN, 10, decimals) == (True, b"\x12")
+
+
+def test_lru_eviction():
+    cache = CallCache(max_entries=2)
+    call = balance_call()
+    cache.put(CHAIN, 1, call, True, b"\x01")
+    cache.put(CHAIN, 2, call, True, b"\x02")
+    cache.get(CHAIN, 1, call)
+    cache.put(CHAIN, 3, call, True, b"\x03")
+    assert cache.get(CHAIN, 2, call) is None
+    assert cache.get(CHAIN, 1, call) == (True, b"\x01")
+
+
+def test_reverted_block_is_invalidated():
+    cache = CallCache()
+    call = balance_call()
+    for block in (9, 10, 11):
+        cache.check(CHAIN, block, "0x{:x}".format(block))
+        cache.put(CHAIN, block, call, True, bytes([block]))
+    cache.put(1, 10, call, True, b"\x0a")
+
+    ## Same hash, nothing changes
+    cache.check(CHAIN, 10, "0xa")
+    assert cache.get(CHAIN, 10, call) == (True, b"\x0a")
+    assert cache.invalidations == 0
+
+    ## After a revert block 10 is another block, it and every later block are dropped
+    cache.check(CHAIN, 10, "0xdead")
+    assert cache.invalidations == 1
+    assert cache.get(CHAIN, 9, call) == (True, b"\x09")
+    assert cache.get(CHAIN, 10, call) is None
+    assert cache.get(CHAIN, 11, call) is None
+    assert cache.get(1, 10, call) == (True, b"\x0a")
+    assert cache.hashes == {(CHAIN, 9): "0x9", (CHAIN, 10): "0xdead"}
+
+
+def test_snap_refetches_after_revert(monkeypatch):
+    calls = [balance_call("0x{:040x}".format(i + 1)) for i in range(3)]
+    for i, call in enumerate(calls):
+        call.returns = [["balances." + str(i), None]]
+
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, calls)
+        manager.snap(block=50)
+        manager.snap(block=50)
+        assert len(rpc.calls()) == 1
+
+        ## chain.revert() and a new tx: block 50 is now another block
+        rpc.hashes[50] = "0x" + "ee" * 32
+        snap = manager.snap(block=50)
+        assert len(rpc.calls()) == 2
+
+    assert [snap.get("balances." + str(i)) for i in range(3)] == [1, 2, 3]
+    assert manager.cache.invalidations == 1
@@ -0,0 +1,26 @@
+from helpers.shares_math import get_report_fees
+from helpers.simulator.sweep import ONE, fee_grid, harvest_schedule, sweep_fees
+
+
+def test_sweep_matches_scalar_fees():
+    grid = fee_grid((0, 1_000, 2_000), (0, 1_000), (0, 200), (0, 10))
+    schedule = harvest_schedule(1_500, 30)
+
+    table = sweep_fees(grid, schedule, deposit=1_000 * ONE, max_workers=2, chunk_size=8)
+    assert table.rows == sweep_fees(grid, schedule, deposit=1_000 * ONE, max_workers=1).rows
+
+    ## No fees ranks first, every fee at its max last
+    ranked = table.rank("net_yield_bps")
+    assert ranked.rows[0][:4] == (0, 0, 0, 0)
+    assert ranked.rows[-1][:4] == (2_000, 1_000, 200, 10)
+
+    governance, strategist, management, _ = grid[-1]
+    supply = balance = 1_000 * ONE
+    treasuryShares = 0
+    for seconds, rate in schedule:
+        gain = balance * rate // ONE
+        fees = get_report_fees(gain, governance, strategist, management, seconds, supply, balance)
+        treasuryShares += fees.shares_perf_treasury + fees.shares_management
+        supply += fees.shares_perf_treasury + fees.shares_management + fees.shares_perf_strategist
+        balance += gain
+    assert table.as_dicts()[-1]["treasury_shares"] == treasuryShares
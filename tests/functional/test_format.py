@@ -0,0 +1,113 @@
+import pytest
+from dotmap import DotMap
+
+from helpers import utils
+from helpers.SnapshotManager import SnapshotManager
+from helpers.multicall import MISSING
+from helpers.utils import format_fixed, token_decimals, val
+
+WANT = "0xfc5A1A6EB076a2C7aD06eD22C90d7E710E35ad0a"
+USDC = "0xFF970A61A04b1cA14834A43f5dE4533eBDDB5CC8"
+SETT = "0x00000000000000000000000000000000000005e7"
+DECIMALS = {WANT.lower(): 18, USDC.lower(): 6, SETT.lower(): 18}
+
+
+class Interface:
+    """
+    brownie's interface, decimals() calls are counted
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def IERC20Detailed(self, address):
+        def decimals():
+            self.calls.append(address)
+            return DECIMALS[address.lower()]
+
+        return DotMap(decimals=decimals)
+
+
+@pytest.fixture
+def interface(monkeypatch):
+    interface = Interface()
+    monkeypatch.setattr(utils, "interface", interface)
+    monkeypatch.setattr(utils, "chain", DotMap(id=42161))
+    monkeypatch.setattr(utils, "_decimals", {})
+    return interface
+
+
+def test_matches_float_format_on_exact_values():
+    amounts = [0, 10 ** 18, 5 * 10 ** 17, 10 ** 18 // 8, 1234375 * 10 ** 15, -2750 * 10 ** 15]
+    for amount in amounts + [123456789 * 10 ** 18]:
+        assert format_fixed(amount) == "{:,.18f}".format(amount / 10 ** 18)
+    assert format_fixed(1_500_000, 6) == "{:,.18f}".format(1.5)
+
+
+def test_exact_where_floats_are_not():
+    assert "{:,.18f}".format(3 * 10 ** 17 / 10 ** 18) == "0.299999999999999989"
+    assert format_fixed(3 * 10 ** 17) == "0.300000000000000000"
+    assert format_fixed(2 ** 200, 18, 0) == "{:,}".format((2 ** 200 + 5 * 10 ** 17) // 10 ** 18)
+
+
+def test_negative_values():
+    assert format_fixed(-1) == "-0.000000000000000001"
+    assert format_fixed(-1_234_567, 6, 2) == "-1.23"
+    assert format_fixed(-1_235_000, 6, 2) == "-1.24"
+    ## Rounds the magnitude like the positive value, and keeps the sign like float formatting
+    assert format_fixed(-4, 6, 5) == "{:.5f}".format(-4 / 10 ** 6) == "-0.00000"
+    assert format_fixed(-5, 6, 5) == "-0.00001"
+
+
+def test_rounding_when_decimals_exceed_places():
+    assert format_fixed(1_234_499, 6, 3) == "1.234"
+    assert format_fixed(1_234_500, 6, 3) == "1.235"
+    assert format_fixed(999_999_999, 6, 2) == "1,000.00"
+    assert format_fixed(10 ** 18 - 1, 18, 17) == "1.00000000000000000"
+
+
+def test_zero_places():
+    assert format_fixed(1_499_999, 6, 0) == "1"
+    assert format_fixed(1_500_000, 6, 0) == "2"
+    assert format_fixed(1_234_567 * 10 ** 18, 18, 0) == "1,234,567"
+    assert format_fixed(-2_500_000, 6, 0) == "-3"
+    assert format_fixed(42, 0, 0) == "42"
+
+
+def test_places_beyond_decimals_pad_with_zeros():
+    assert format_fixed(1_500_000, 6) == "1.500000000000000000"
+    assert format_fixed(7, 0, 3) == "7.000"
+
+
+def test_token_decimals_are_cached_per_token(interface):
+    assert val(1_500_000, token=USDC) == "1.500000000000000000"
+    assert val(1_500_000, token=USDC.lower()) == "1.500000000000000000"
+    assert val(10 ** 18, token=DotMap(address=WANT)) == "1.000000000000000000"
+    assert token_decimals(WANT) == 18
+    assert interface.calls == [USDC, WANT]
+
+    ## Another chain fetches again
+    utils.chain.id = 1
+    assert token_decimals(USDC) == 6
+    assert interface.calls == [USDC, WANT, USDC]
+
+
+def test_manager_format(interface):
+    manager = SnapshotManager.__new__(SnapshotManager)
+    manager.tokens = {"want": DotMap(address=WANT), "usdc": DotMap(address=USDC)}
+    manager.want = DotMap(address=WANT)
+    manager.sett = DotMap(address=SETT)
+
+    assert manager.format("balances.usdc.user", 2_500_000) == "2.500000000000000000"
+    assert manager.format("shares.want.user", 10 ** 18 // 4) == "0.250000000000000000"
+    assert manager.format("depositBalances.sgTracker", 3 * 10 ** 18) == "3.000000000000000000"
+    assert manager.format("sett.balance", 10 ** 18) == "1.000000000000000000"
+    assert manager.format("sett.totalSupply", 2 * 10 ** 18) == "2.000000000000000000"
+    assert manager.format("sett.getPricePerFullShare", 10 ** 18 + 5 * 10 ** 16) == "1.050000000000000000"
+    ## Fees in bps, timestamps and values that aren't ints are left as they are
+    assert manager.format("sett.performanceFeeGovernance", 1_000) == 1_000
+    assert manager.format("strategy.lastHarvest", 1_650_000_000) == 1_650_000_000
+    assert manager.format("balances.unknown.user", 7) == 7
+    assert manager.format("sett.balance", MISSING) is MISSING
+    assert manager.format("strategy.getName", "StrategyGMX") == "StrategyGMX"
+    assert sorted(interface.calls) == sorted([USDC, WANT, SETT])
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from eth_abi import decode_single
+from rpc_stub import StubRPC, use_stub
+
+from helpers.multicall import MISSING, Call, Multicall, func
+from helpers.multicall.constants import MULTICALL3_ADDRESS
+from helpers.snapshot.snap import Snap
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+HOLDERS = ["0x{:040x}".format(i + 1) for i in range(5)]
+REVERTING = HOLDERS[2]
+
+
+def balance_calls():
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, holder], [["balances." + str(i), None]])
+        for i, holder in enumerate(HOLDERS)
+    ]
+
+
+def check_result(result):
+    assert result == {
+        "balances.0": 1,
+        "balances.1": 2,
+        "balances.2": MISSING,
+        "balances.3": 4,
+        "balances.4": 5,
+    }
+    assert Snap(result, 1234, []).missing() == ["balances.2"]
+
+
+def test_reverting_call_is_missing(monkeypatch):
+    with StubRPC(reverts=[REVERTING]) as rpc:
+        use_stub(monkeypatch, rpc)
+        check_result(Multicall(balance_calls(), require_success=False)())
+
+    ## One aggregate3 call with allowFailure set on every call
+    (call,) = rpc.calls()
+    assert call["params"][0]["to"] == MULTICALL3_ADDRESS
+    (sent,) = decode_single(
+        "((address,bool,bytes)[])", bytes.fromhex(call["params"][0]["data"][10:])
+    )
+    assert [allow_failure for _, allow_failure, _ in sent] == [True] * len(HOLDERS)
+
+
+def test_reverting_call_is_missing_across_chunks(monkeypatch):
+    with StubRPC(reverts=[REVERTING]) as rpc:
+        use_stub(monkeypatch, rpc)
+        check_result(Multicall(balance_calls(), require_success=False, chunk_size=2)())
+    assert len(rpc.calls()) == 3
+
+
+def test_reverting_call_fails_the_aggregate(monkeypatch):
+    with StubRPC(reverts=[REVERTING]) as rpc:
+        use_stub(monkeypatch, rpc)
+        with pytest.raises(ValueError):
+            Multicall(balance_calls())()
+
+
+def test_async_reverting_call_is_missing(monkeypatch):
+    pytest.importorskip("aiohttp")
+    from helpers.multicall import AsyncMulticall, AsyncRPC
+
+    async def run(endpoint):
+        async with AsyncRPC(endpoint) as rpc:
+            return await AsyncMulticall(balance_calls(), rpc, require_success=False)()
+
+    with StubRPC(reverts=[REVERTING]) as rpc:
+        use_stub(monkeypatch, rpc)
+        check_result(asyncio.run(run(rpc.endpoint)))
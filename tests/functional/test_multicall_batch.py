@@ -0,0 +1,74 @@
+import pytest
+from rpc_stub import BLOCK, StubRPC, use_stub
+
+from helpers.multicall import MISSING, Call, Multicall, func
+from helpers.multicall.batch import BatchCallError, batch_eth_call
+from helpers.multicall.constants import Network
+from helpers.multicall.multicall import deployed_aggregators, get_aggregator
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+
+
+def balance_calls(count):
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, "0x{:040x}".format(i + 1)], [["balances." + str(i), None]])
+        for i in range(count)
+    ]
+
+
+def test_no_aggregator_with_code(monkeypatch):
+    with StubRPC(deployed=False) as rpc:
+        use_stub(monkeypatch, rpc)
+        assert get_aggregator(Network.Arbitrum) is None
+        assert get_aggregator(Network.Arbitrum, require_success=False) is None
+        ## The code check is cached
+        assert get_aggregator(Network.Arbitrum) is None
+    assert len(rpc.calls("eth_getCode")) == 2
+    assert set(deployed_aggregators.values()) == {False}
+
+
+def test_batch_fallback_keeps_order(monkeypatch):
+    ## Answers come back shuffled, results must still follow the calls
+    with StubRPC(deployed=False, jitter=0.001) as rpc:
+        use_stub(monkeypatch, rpc)
+        result = Multicall(balance_calls(20))()
+
+    expected = {"balances." + str(i): i + 1 for i in range(20)}
+    assert result == expected
+    assert list(result) == list(expected)
+
+    ## One batch of eth_calls sent straight to the token, pinned to the current block
+    calls = rpc.calls()
+    assert len(calls) == 20
+    assert {call["params"][0]["to"].lower() for call in calls} == {TOKEN}
+    assert {call["params"][1] for call in calls} == {hex(BLOCK)}
+    assert len(rpc.calls("eth_blockNumber")) == 1
+
+
+def test_batch_fallback_on_chain_without_aggregator(monkeypatch):
+    with StubRPC(chain_id=999) as rpc:
+        use_stub(monkeypatch, rpc)
+        result = Multicall(balance_calls(5), block=77, chunk_size=2)()
+
+    assert result == {"balances." + str(i): i + 1 for i in range(5)}
+    assert rpc.calls("eth_getCode") == []
+    assert {call["params"][1] for call in rpc.calls()} == {hex(77)}
+
+
+def test_batch_eth_call_failures(monkeypatch):
+    calls = balance_calls(4)
+    with StubRPC(deployed=False, reverts=["0x{:040x}".format(2)], jitter=0.001) as rpc:
+        use_stub(monkeypatch, rpc)
+        successes, outputs = batch_eth_call(calls, BLOCK, require_success=False)
+        assert successes == [True, False, True, True]
+        assert [int.from_bytes(output, "big") for output in outputs] == [1, 0, 3, 4]
+
+        with pytest.raises(BatchCallError):
+            batch_eth_call(calls, BLOCK)
+
+        assert Multicall(calls, require_success=False)() == {
+            "balances.0": 1,
+            "balances.1": MISSING,
+            "balances.2": 3,
+            "balances.3": 4,
+        }
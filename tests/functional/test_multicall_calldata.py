@@ -0,0 +1,93 @@
+import pytest
+from eth_abi import decode_single, encode_single
+
+from helpers.multicall import func, get_signature
+from helpers.multicall.calldata import (
+    CalldataTemplate,
+    encode_address,
+    encode_aggregate,
+    encode_aggregate3,
+)
+from helpers.multicall.multicall import AGGREGATE, AGGREGATE3
+
+TARGETS = [
+    "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1",
+    "0xfc5a1a6eb076a2c7ad06ed22c90d7e710e35ad0a",
+    "0x0000000000000000000000000000000000000001",
+]
+## Lengths around the 32 byte word boundary
+CALLDATA = [bytes([i % 256]) * size for i, size in enumerate((4, 31, 32, 33, 36, 68, 100))]
+
+
+def mixed_calls():
+    return [(TARGETS[i % len(TARGETS)], data) for i, data in enumerate(CALLDATA)]
+
+
+def test_encode_aggregate_matches_eth_abi():
+    selector = get_signature(AGGREGATE).fourbyte
+    for calls in (mixed_calls()[:1], mixed_calls()):
+        expected = selector + encode_single("((address,bytes)[])", [calls])
+        assert encode_aggregate(selector, calls) == expected
+
+
+def test_encode_aggregate3_matches_eth_abi():
+    selector = get_signature(AGGREGATE3).fourbyte
+    for allow_failure in (True, False):
+        for calls in (mixed_calls()[:1], mixed_calls()):
+            expected = selector + encode_single(
+                "((address,bool,bytes)[])",
+                [[(target, allow_failure, data) for target, data in calls]],
+            )
+            assert encode_aggregate3(selector, calls, allow_failure) == expected
+
+
+def test_empty_calls_decode_like_eth_abi():
+    ## eth_abi 2.x appends an extra zero word to empty arrays and bytes, both decode the same
+    selector = get_signature(AGGREGATE3).fourbyte
+    for allow_failure in (True, False):
+        encoded = encode_aggregate3(selector, [], allow_failure)
+        assert len(encoded) == 4 + 2 * 32
+        assert decode_single("((address,bool,bytes)[])", encoded[4:]) == ((),)
+    encoded = encode_aggregate(selector, [])
+    assert decode_single("((address,bytes)[])", encoded[4:]) == ((),)
+
+
+def test_empty_calldata_decodes_like_eth_abi():
+    calls = [(TARGETS[0], b""), (TARGETS[1], CALLDATA[3])]
+    selector = get_signature(AGGREGATE3).fourbyte
+
+    (decoded,) = decode_single(
+        "((address,bool,bytes)[])", encode_aggregate3(selector, calls, False)[4:]
+    )
+    assert [(target.lower(), flag, data) for target, flag, data in decoded] == [
+        (target.lower(), False, data) for target, data in calls
+    ]
+
+    (decoded,) = decode_single(
+        "((address,bytes)[])", encode_aggregate(selector, calls)[4:]
+    )
+    assert [(target.lower(), data) for target, data in decoded] == [
+        (target.lower(), data) for target, data in calls
+    ]
+
+
+def test_calldata_template_matches_signature_encoding():
+    template = CalldataTemplate(func.erc20.balanceOf)
+    signature = get_signature(func.erc20.balanceOf)
+
+    assert template.render_many(TARGETS) == [
+        signature.encode_data([target]) for target in TARGETS
+    ]
+    assert template.render(TARGETS[1]) == signature.encode_data([TARGETS[1]])
+
+    pair = CalldataTemplate("allowance(address,address)(uint256)")
+    assert pair.render(TARGETS[0], TARGETS[2]) == get_signature(
+        "allowance(address,address)(uint256)"
+    ).encode_data([TARGETS[0], TARGETS[2]])
+
+
+def test_calldata_template_rejects_non_address_inputs():
+    with pytest.raises(ValueError):
+        CalldataTemplate(func.erc20.transfer)
+    with pytest.raises(ValueError):
+        encode_address("0x1234")
@@ -0,0 +1,81 @@
+from rpc_stub import BLOCK, StubRPC, use_stub
+
+from helpers.multicall import Call, Multicall, func
+from helpers.multicall.multicall import chunk_calls
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+
+
+def balance_calls(count):
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, "0x{:040x}".format(i + 1)], [["balances." + str(i), None]])
+        for i in range(count)
+    ]
+
+
+def expected(count):
+    return {"balances." + str(i): i + 1 for i in range(count)}
+
+
+def test_chunk_calls_by_size():
+    calls = list(range(10))
+    assert chunk_calls(calls, 3) == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    assert chunk_calls(calls, 10) == [calls]
+    assert chunk_calls(calls, 0) == [calls]
+    assert chunk_calls(calls, None) == [calls]
+    assert chunk_calls([], 3) == []
+
+
+def test_chunk_calls_by_gas_budget():
+    calls = list(range(10))
+    ## The smaller of the two bounds wins
+    assert chunk_calls(calls, 5, gas_limit=250_000, gas_per_call=100_000) == [
+        [0, 1], [2, 3], [4, 5], [6, 7], [8, 9]
+    ]
+    assert chunk_calls(calls, 2, gas_limit=10_000_000) == chunk_calls(calls, 2)
+    ## At least one call per chunk, even over budget
+    assert chunk_calls(calls, 5, gas_limit=1, gas_per_call=100_000) == [[i] for i in calls]
+    assert [i for chunk in chunk_calls(calls, 4, 300_000, 100_000) for i in chunk] == calls
+
+
+def test_chunks_keep_call_order_across_threads(monkeypatch):
+    with StubRPC(jitter=0.02) as rpc:
+        use_stub(monkeypatch, rpc)
+        multi = Multicall(balance_calls(25), chunk_size=3, max_workers=4)
+        result = multi()
+
+    assert result == expected(25)
+    assert list(result) == list(expected(25))
+    assert len(rpc.calls()) == 9
+    assert multi.stats["rpc"] == len(rpc.requests) - len(rpc.calls("eth_getCode"))
+
+
+def test_chunks_are_pinned_to_one_block(monkeypatch):
+    with StubRPC() as rpc:
+        use_stub(monkeypatch, rpc)
+        assert Multicall(balance_calls(10), chunk_size=4)() == expected(10)
+
+    ## block=None reads the height once and every chunk uses it
+    assert len(rpc.calls("eth_blockNumber")) == 1
+    assert [call["params"][1] for call in rpc.calls()] == [hex(BLOCK)] * 3
+
+
+def test_single_chunk_reads_latest(monkeypatch):
+    with StubRPC() as rpc:
+        use_stub(monkeypatch, rpc)
+        assert Multicall(balance_calls(10))() == expected(10)
+
+    assert rpc.calls("eth_blockNumber") == []
+    assert [call["params"][1] for call in rpc.calls()] == ["latest"]
+
+
+def test_gas_budget_splits_chunks(monkeypatch):
+    with StubRPC() as rpc:
+        use_stub(monkeypatch, rpc)
+        multi = Multicall(balance_calls(10), gas_limit=300_000, gas_per_call=100_000)
+        assert multi() == expected(10)
+
+    calls = rpc.calls()
+    assert len(calls) == 4
+    assert {call["params"][0]["gas"] for call in calls} == {hex(300_000)}
+    assert {call["params"][1] for call in calls} == {hex(BLOCK)}
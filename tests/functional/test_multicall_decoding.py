@@ -0,0 +1,120 @@
+import pytest
+from eth_abi import decode_single, encode_single
+from eth_abi.exceptions import DecodingError, InsufficientDataBytes
+
+from helpers.multicall import MISSING, Call
+from helpers.multicall.decoding import (
+    decode_aggregate3_output,
+    decode_aggregate_output,
+    decode_outputs,
+)
+
+TARGET = "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1"
+HOLDER = "0xfc5a1a6eb076a2c7ad06ed22c90d7e710e35ad0a"
+
+## (signature, value) pairs, the fast decoders and the eth_abi fallback
+CASES = [
+    ("balanceOf(address)(uint256)", 0),
+    ("balanceOf(address)(uint256)", 2 ** 256 - 1),
+    ("paused()(bool)", True),
+    ("paused()(bool)", False),
+    ("owner()(address)", HOLDER),
+    ("delta()(int256)", -(10 ** 18)),
+    ("delta()(int256)", -(2 ** 255)),
+    ("delta()(int128)", -1),
+    ("decimals()(uint8)", 18),
+]
+
+
+def call(signature, name="value"):
+    return Call(TARGET, signature, [[name, None]])
+
+
+def test_decode_outputs_matches_eth_abi():
+    calls = [call(signature, i) for i, (signature, _) in enumerate(CASES)]
+    outputs = [
+        encode_single(signature[signature.rindex("(") :], [value])
+        for signature, value in CASES
+    ]
+    result = decode_outputs(calls, outputs)
+
+    for i, (signature, value) in enumerate(CASES):
+        (expected,) = decode_single(signature[signature.rindex("(") :], outputs[i])
+        assert result[i] == expected == value
+
+
+def test_decode_outputs_accepts_memoryviews():
+    output = memoryview(encode_single("(int256)", [-7]))
+    assert decode_outputs([call("delta()(int256)")], [output]) == {"value": -7}
+
+
+def test_invalid_words_fall_back_to_eth_abi():
+    dirty_bool = (2).to_bytes(32, "big")
+    dirty_address = b"\x01" + bytes(11) + bytes.fromhex(HOLDER[2:])
+    for signature, output in (("paused()(bool)", dirty_bool), ("owner()(address)", dirty_address)):
+        with pytest.raises(DecodingError):
+            decode_outputs([call(signature)], [output])
+        ## With successes, a value eth_abi rejects is MISSING
+        assert decode_outputs([call(signature)], [output], successes=[True]) == {
+            "value": MISSING
+        }
+
+
+def test_failed_and_empty_outputs_are_missing():
+    calls = [call("balanceOf(address)(uint256)", name) for name in ("ok", "failed", "empty", "short")]
+    outputs = [(5).to_bytes(32, "big"), b"revert", b"", bytes(31)]
+    result = decode_outputs(calls, outputs, successes=[True, False, True, True])
+    assert result == {"ok": 5, "failed": MISSING, "empty": MISSING, "short": MISSING}
+    assert not result["failed"]
+
+    for output in (b"", bytes(31)):
+        with pytest.raises(InsufficientDataBytes):
+            decode_outputs(calls[:1], [output])
+
+
+def test_decode_aggregate_output_matches_eth_abi():
+    blobs = [b"", (1).to_bytes(32, "big"), b"\xff" * 33, encode_single("(int256)", [-1])]
+    output = encode_single("(uint256,bytes[])", [1234, blobs])
+
+    block, outputs = decode_aggregate_output(output)
+    expected_block, expected = decode_single("(uint256,bytes[])", output)
+    assert (block, [bytes(o) for o in outputs]) == (expected_block, list(expected))
+    assert all(isinstance(o, memoryview) for o in outputs)
+
+    block, outputs = decode_aggregate_output(encode_single("(uint256,bytes[])", [7, []]))
+    assert (block, outputs) == (7, [])
+
+
+def test_decode_aggregate3_output_matches_eth_abi():
+    revert = bytes.fromhex("08c379a0") + encode_single("(string)", ["nope"])
+    results = [
+        (True, (3).to_bytes(32, "big")),
+        (False, revert),
+        (False, b""),
+        (True, encode_single("(int256)", [-3])),
+    ]
+    output = encode_single("((bool,bytes)[])", [results])
+
+    successes, outputs = decode_aggregate3_output(output)
+    (expected,) = decode_single("((bool,bytes)[])", output)
+    assert list(zip(successes, [bytes(o) for o in outputs])) == list(expected)
+
+    calls = [call("balanceOf(address)(uint256)", i) for i in range(3)] + [call("delta()(int256)", 3)]
+    assert decode_outputs(calls, outputs, successes=successes) == {
+        0: 3,
+        1: MISSING,
+        2: MISSING,
+        3: -3,
+    }
+
+
+def test_short_aggregate_outputs_raise():
+    output = encode_single("(uint256,bytes[])", [1, [b"\x01" * 64]])
+    for broken in (b"", output[:31], output[:-1]):
+        with pytest.raises(InsufficientDataBytes):
+            decode_aggregate_output(broken)
+
+    output = encode_single("((bool,bytes)[])", [[(True, b"\x01" * 64)]])
+    for broken in (b"", output[:63], output[:-1]):
+        with pytest.raises(InsufficientDataBytes):
+            decode_aggregate3_output(broken)
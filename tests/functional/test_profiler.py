@@ -0,0 +1,177 @@
+import json
+import time
+
+from dotmap import DotMap
+from rpc_stub import StubRPC, stub_manager
+
+from helpers.multicall import Call, func
+from helpers.snapshot.profiler import ActionProfiler
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+
+
+class MiddlewareOnion:
+    def __init__(self):
+        self.middlewares = []
+
+    def add(self, middleware, name):
+        self.middlewares.append((name, middleware))
+
+    def remove(self, name):
+        (middleware,) = [entry for entry in self.middlewares if entry[0] == name]
+        self.middlewares.remove(middleware)
+
+
+class FakeWeb3:
+    """
+    Sends requests through its middlewares like web3 does, to nowhere
+    """
+
+    def __init__(self):
+        self.middleware_onion = MiddlewareOnion()
+        self.sent = []
+
+    def request(self, method, params=()):
+        make_request = lambda method, params: self.sent.append(method)
+        for _, middleware in reversed(self.middleware_onion.middlewares):
+            make_request = middleware(make_request, self)
+        return make_request(method, params)
+
+
+def stats(rpc, direct=0):
+    return {"rpc": rpc, "direct": direct, "request_bytes": 10 * rpc, "response_bytes": 100 * rpc}
+
+
+def test_nested_phases_are_exclusive():
+    profiler = ActionProfiler()
+    with profiler.action("deposit") as record:
+        with profiler.phase("before"):
+            time.sleep(0.02)
+            with profiler.phase("load"):
+                time.sleep(0.05)
+        with profiler.phase("tx"):
+            pass
+        profiler.add_tx(DotMap(gas_used=21_000, block_number=7))
+
+    phases = record.phases
+    assert list(phases) == ["load", "before", "tx", "overhead"]
+    assert phases["load"]["wall"] >= 0.05
+    ## before doesn't include the nested load
+    assert 0.02 <= phases["before"]["wall"] < phases["load"]["wall"]
+    assert phases["overhead"]["wall"] < 0.02
+    total = sum(phase["wall"] for phase in phases.values())
+    assert total >= 0.07
+    assert (record.gas_used, record.block) == (21_000, 7)
+
+
+def test_rpc_counts_without_web3():
+    profiler = ActionProfiler()
+    profiler.add_rpc(stats(5))
+    with profiler.action("earn") as record:
+        profiler.add_rpc(stats(2, direct=1))
+        with profiler.phase("after"):
+            profiler.add_rpc(stats(3))
+    profiler.add_rpc(stats(5))
+
+    assert record.phases["overhead"] == {
+        "wall": record.phases["overhead"]["wall"],
+        "rpc": 2,
+        "request_bytes": 20,
+        "response_bytes": 200,
+    }
+    assert record.phases["after"]["rpc"] == 3
+
+
+def test_web3_requests_are_counted_once():
+    web3 = FakeWeb3()
+    profiler = ActionProfiler()
+    profiler.attach(web3)
+
+    web3.request("eth_chainId")
+    with profiler.action("harvest") as record:
+        with profiler.phase("tx"):
+            for method in ("eth_estimateGas", "eth_sendTransaction", "eth_getTransactionReceipt"):
+                web3.request(method)
+        with profiler.phase("after"):
+            ## A multicall: 2 requests through web3, 1 JSON-RPC batch sent directly
+            web3.request("eth_call")
+            web3.request("eth_call")
+            profiler.add_rpc(stats(3, direct=1))
+
+    assert len(web3.sent) == 6
+    assert record.phases["tx"]["rpc"] == 3
+    assert record.phases["after"]["rpc"] == 3
+    assert record.phases["after"]["request_bytes"] == 30
+
+
+def test_detach_removes_the_middleware(monkeypatch):
+    web3 = FakeWeb3()
+    profilers = [ActionProfiler(), ActionProfiler()]
+    for profiler in profilers:
+        profiler.attach(web3)
+    assert len(web3.middleware_onion.middlewares) == 2
+
+    profilers[0].detach()
+    profilers[0].detach()
+    assert [name for name, _ in web3.middleware_onion.middlewares] == [profilers[1].middleware_name()]
+    with profilers[0].action("deposit") as stale, profilers[1].action("deposit") as record:
+        web3.request("eth_call")
+    assert stale.phases["overhead"]["rpc"] == 0
+    assert record.phases["overhead"]["rpc"] == 1
+
+    ## SnapshotManager.close detaches its profiler
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, [], profiler=profilers[1])
+        manager.close()
+    assert web3.middleware_onion.middlewares == []
+    assert not profilers[1].counting
+
+
+def test_json_export(tmp_path):
+    profiler = ActionProfiler()
+    for gas in (100, 300):
+        with profiler.action("deposit"):
+            with profiler.phase("tx"):
+                profiler.add_rpc(stats(1))
+            profiler.add_tx(DotMap(gas_used=gas, block_number=gas))
+    with profiler.action("withdraw"):
+        pass
+
+    report = json.loads(profiler.to_json())
+    assert [record["action"] for record in report["records"]] == ["deposit", "deposit", "withdraw"]
+    assert report["records"][1]["gas_used"] == 300
+    assert report["records"][1]["block"] == 300
+    assert report["records"][2]["gas_used"] is None
+
+    deposit = report["summary"]["deposit"]
+    assert (deposit["count"], deposit["gas_used"]) == (2, 400)
+    assert deposit["phases"]["tx"]["rpc"] == 2
+    assert deposit["phases"]["tx"]["response_bytes"] == 200
+    assert set(deposit["phases"]) == {"tx", "overhead"}
+
+    path = tmp_path / "profile.json"
+    profiler.to_json(str(path))
+    assert json.loads(path.read_text()) == report
+
+    table = profiler.report()
+    assert "deposit" in table and "withdraw" in table and "gas_used" in table
+
+
+def test_loader_fetches_are_their_own_phase(monkeypatch):
+    calls = [
+        Call(TOKEN, [func.erc20.balanceOf, "0x{:040x}".format(i + 1)], [["balances." + str(i), None]])
+        for i in range(3)
+    ]
+    profiler = ActionProfiler()
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, calls, profiler=profiler)
+        with manager.profile("deposit"):
+            with manager.phase("before"):
+                snap = manager.snap(keys=["balances.0"])
+            with manager.phase("confirm"):
+                assert snap.get("balances.2") == 3
+
+    (record,) = profiler.records
+    assert record.phases["before"]["rpc"] > 0
+    assert record.phases["load"]["rpc"] > 0
+    assert record.phases["confirm"]["rpc"] == 0
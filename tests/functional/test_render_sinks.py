@@ -0,0 +1,191 @@
+import csv
+import json
+import threading
+
+import pytest
+
+from helpers.multicall import MISSING
+from helpers.snapshot.render import (
+    BackgroundSink,
+    ConsoleSink,
+    CsvSink,
+    JsonlSink,
+    NullSink,
+    changed_rows,
+)
+from helpers.snapshot.snap import Snap, SnapSchema
+
+
+def diff(a, b):
+    if a is MISSING or b is MISSING:
+        return MISSING
+    if type(a) is int and type(b) is int:
+        return b - a
+    return "-"
+
+
+def format(key, value):
+    return "<{}>".format(value)
+
+
+def snaps(schema=None, after_schema=None):
+    schema = schema or SnapSchema()
+    before = Snap(
+        {"sett.balance": 10, "sett.totalSupply": 5, "strategy.want": MISSING, "name": "a"},
+        1,
+        [],
+        schema=schema,
+    )
+    after = Snap(
+        {"sett.balance": 12, "sett.totalSupply": 5, "strategy.want": 3, "name": "b"},
+        2,
+        [],
+        schema=after_schema or schema,
+    )
+    return before, after
+
+
+ROWS = [
+    ("sett.balance", 10, 12),
+    ("strategy.want", MISSING, 3),
+    ("name", "a", "b"),
+]
+
+
+def test_changed_rows():
+    assert changed_rows(*snaps()) == ROWS
+    ## Snaps from two managers don't share slots
+    assert changed_rows(*snaps(SnapSchema(), SnapSchema())) == ROWS
+
+
+def test_changed_rows_raises_on_keys_after_does_not_have():
+    for after_schema in (None, SnapSchema()):
+        before, after = snaps(after_schema=after_schema)
+        before.set("sett.available", 1)
+        with pytest.raises(Exception, match="sett.available"):
+            changed_rows(before, after)
+
+
+def test_changed_rows_loads_missing_keys():
+    before, after = snaps()
+    before.set("sett.available", 1)
+    after.loader = lambda: {"sett.available": 4}
+    assert changed_rows(before, after) == ROWS + [("sett.available", 1, 4)]
+
+
+def test_console_sink(capsys):
+    before, after = snaps()
+    ConsoleSink().compare("GMX", before, after, ROWS, format, diff)
+    ConsoleSink().table("GMX", after, [("sett.balance", 12)], format)
+    out = capsys.readouterr().out
+    assert "Compare: GMX Sett 1 -> 2" in out
+    assert "<10>" in out and "<12>" in out and "<2>" in out and "<MISSING>" in out
+    assert "Status Report: GMX Sett" in out
+
+
+def test_null_sink(capsys):
+    before, after = snaps()
+    NullSink().compare("GMX", before, after, ROWS, format, diff)
+    NullSink().table("GMX", after, ROWS, format)
+    assert capsys.readouterr().out == ""
+
+
+def test_jsonl_sink(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    before, after = snaps()
+    sink = JsonlSink(str(path))
+    sink.compare("GMX", before, after, ROWS, format, diff)
+    sink.table("GMX", after, [("sett.balance", 12), ("pair", (1, 2))], format)
+    sink.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0] == {
+        "kind": "compare",
+        "sett": "GMX",
+        "beforeBlock": 1,
+        "afterBlock": 2,
+        "metric": "sett.balance",
+        "before": 10,
+        "after": 12,
+        "diff": 2,
+    }
+    ## Raw values, MISSING is null and nothing goes through format
+    assert (lines[1]["before"], lines[1]["diff"]) == (None, None)
+    assert lines[2]["diff"] == "-"
+    assert lines[3:] == [
+        {"kind": "table", "sett": "GMX", "block": 2, "metric": "sett.balance", "value": 12},
+        {"kind": "table", "sett": "GMX", "block": 2, "metric": "pair", "value": [1, 2]},
+    ]
+
+
+def test_csv_sink_appends_with_one_header(tmp_path):
+    path = str(tmp_path / "rows.csv")
+    before, after = snaps()
+    for _ in range(2):
+        sink = CsvSink(path)
+        sink.compare("GMX", before, after, ROWS[:1], format, diff)
+        sink.table("GMX", after, [("sett.balance", 12)], format)
+        sink.close()
+
+    with open(path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == CsvSink.HEADER
+    assert rows[1:] == [
+        ["compare", "GMX", "1", "2", "sett.balance", "10", "12", "2"],
+        ["table", "GMX", "", "2", "sett.balance", "", "12", ""],
+    ] * 2
+
+
+class SlowSink:
+    def __init__(self):
+        self.calls = []
+        self.threads = set()
+        self.release = threading.Event()
+
+    def compare(self, key, before, after, rows, format, diff):
+        self.release.wait(5)
+        self.threads.add(threading.get_ident())
+        self.calls.append(("compare", before.block, [format(m, a) for m, a, _ in rows]))
+
+    def table(self, key, snap, rows, format):
+        self.threads.add(threading.get_ident())
+        self.calls.append(("table", snap.block, rows))
+        if rows == "fail":
+            raise RuntimeError("render failed")
+
+    def close(self):
+        self.calls.append("close")
+
+
+def test_background_sink_renders_in_order_off_thread():
+    before, after = snaps()
+    inner = SlowSink()
+    sink = BackgroundSink(inner)
+
+    ## Returns while the first render is still blocked
+    sink.compare("GMX", before, after, ROWS, format, diff)
+    sink.table("GMX", after, [("x", 1)], format)
+    assert inner.calls == []
+
+    inner.release.set()
+    sink.flush()
+    assert inner.calls == [
+        ("compare", 1, ["<10>", "<MISSING>", "<a>"]),
+        ("table", 2, [("x", 1)]),
+    ]
+    assert threading.get_ident() not in inner.threads
+
+    sink.close()
+    assert inner.calls[-1] == "close"
+
+
+def test_background_sink_raises_render_errors():
+    inner = SlowSink()
+    sink = BackgroundSink(inner)
+    sink.table("GMX", snaps()[1], "fail", format)
+    with pytest.raises(RuntimeError, match="render failed"):
+        sink.flush()
+    ## The error is raised once, later rows render again
+    sink.table("GMX", snaps()[1], [], format)
+    sink.close()
+    assert inner.calls[-2:] == [("table", 2, []), "close"]
@@ -0,0 +1,101 @@
+import json
+
+from dotmap import DotMap
+from eth_abi import decode_single, encode_single
+from eth_utils import to_checksum_address
+from rpc_stub import StubRPC, stub_manager
+
+from helpers import SnapshotManager as module
+
+SETT = "0x00000000000000000000000000000000000005e7"
+STRATEGY = "0x000000000000000000000000000000000000057a"
+ROLES = ("sett.treasury", "strategy.governance", "strategy.strategist")
+
+
+def address(i):
+    return to_checksum_address("0x{:040x}".format(0xA000 + i))
+
+
+def answer(rpc, manager, roles=0):
+    """
+    Every setup call gets its own address, roles start at address(100 + roles)
+    """
+    values = {}
+    for i, call in enumerate(manager.setup_calls()):
+        ((name, _),) = call.returns
+        if name == "strategy.getName":
+            values[name] = "StrategyGMX"
+            rpc.results[call.data] = encode_single("(string)", ["StrategyGMX"])
+            continue
+        values[name] = address(100 + roles + i if name in ROLES else i)
+        rpc.results[call.data] = encode_single("address", values[name])
+    return values
+
+
+def sent_calls(rpc):
+    """
+    Calldata of every call inside the aggregates sent to rpc
+    """
+    sent = []
+    for request in rpc.calls():
+        data = bytes.fromhex(request["params"][0]["data"][2:])
+        (calls,) = decode_single("((address,bytes)[])", data[4:])
+        sent.append([call_data for _, call_data in calls])
+    return sent
+
+
+def setup_manager(monkeypatch, rpc):
+    manager = stub_manager(monkeypatch, rpc, [])
+    manager.sett = DotMap(address=SETT)
+    manager.strategy = DotMap(address=STRATEGY)
+    return manager
+
+
+def test_setup_is_one_multicall_and_cache_hits_read_the_roles(monkeypatch, tmp_path):
+    path = str(tmp_path / "setup.json")
+    monkeypatch.setattr(module, "_setup_cache", {})
+    with StubRPC() as rpc:
+        manager = setup_manager(monkeypatch, rpc)
+        values = answer(rpc, manager)
+        assert manager.fetch_setup(path) == values
+
+        ## A cache hit in the process refetches only the roles, which can change
+        changed = answer(rpc, manager, roles=50)
+        assert manager.fetch_setup(path) == changed
+        roles = [call.data for call in manager.setup_calls(immutable=False)]
+        assert sent_calls(rpc) == [[call.data for call in manager.setup_calls()], roles]
+
+    assert {name: values[name] for name in ROLES} != {name: changed[name] for name in ROLES}
+    assert {name: value for name, value in values.items() if name not in ROLES} == {
+        name: value for name, value in changed.items() if name not in ROLES
+    }
+
+
+def test_setup_cache_file_round_trips(monkeypatch, tmp_path):
+    path = str(tmp_path / "setup.json")
+    monkeypatch.setattr(module, "_setup_cache", {})
+    with StubRPC() as rpc:
+        manager = setup_manager(monkeypatch, rpc)
+        values = answer(rpc, manager)
+        manager.fetch_setup(path)
+
+    key = "{}:{}:{}".format(rpc.chain_id, SETT, STRATEGY)
+    with open(path) as file:
+        saved = json.load(file)
+    ## Only immutable values are written, the roles are always read
+    assert list(saved) == [key]
+    assert set(saved[key]) == set(values) - set(ROLES)
+    assert saved[key]["strategy.getName"] == "StrategyGMX"
+    assert to_checksum_address(saved[key]["sett.token"]) == values["sett.token"]
+
+    ## A new process reads the file and only fetches the roles
+    monkeypatch.setattr(module, "_setup_cache", {})
+    with StubRPC() as rpc:
+        manager = setup_manager(monkeypatch, rpc)
+        changed = answer(rpc, manager, roles=50)
+        assert manager.fetch_setup(path) == changed
+        assert [len(calls) for calls in sent_calls(rpc)] == [len(ROLES)]
+    assert module._setup_cache == saved
+
+    with open(path) as file:
+        assert json.load(file) == saved
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from helpers.shares_math import (
+    from_want_to_shares,
+    from_want_to_shares_batch,
+    get_report_fees,
+    get_report_fees_batch,
+    get_withdrawal_fees_in_shares,
+    get_withdrawal_fees_in_shares_batch,
+)
+
+E18 = 10 ** 18
+
+
+def scenarios(count, magnitude):
+    rng = random.Random(magnitude)
+    return [rng.randrange(1, magnitude) for _ in range(count)]
+
+
+def report_column(fees, key):
+    ## A list of DotMaps without NumPy
+    if isinstance(fees, list):
+        return [fee[key] for fee in fees]
+    return [int(value) for value in fees[key]]
+
+
+def test_report_fees_batch_matches_scalar():
+    ## Small values take the int64 path when NumPy is installed, wei values the exact one
+    for magnitude in (10 ** 6, 10 ** 6 * E18):
+        gains = scenarios(500, magnitude)
+        times = scenarios(500, 30 * 24 * 60 * 60)
+        supplies = scenarios(500, magnitude)
+        balances = scenarios(500, magnitude)
+
+        fees = get_report_fees_batch(gains, 1_000, 1_000, 200, times, supplies, balances)
+        expected = [
+            get_report_fees(gains[i], 1_000, 1_000, 200, times[i], supplies[i], balances[i])
+            for i in range(500)
+        ]
+
+        for key in ("shares_perf_treasury", "shares_management", "shares_perf_strategist"):
+            assert report_column(fees, key) == [fee[key] for fee in expected]
+
+
+def test_withdrawal_fees_batch_matches_scalar():
+    shares = scenarios(500, 10 ** 6 * E18)
+    ppfs = [E18 + x for x in scenarios(500, E18)]
+    supplies = scenarios(500, 10 ** 6 * E18)
+    balances = scenarios(500, 10 ** 6 * E18)
+
+    fees = get_withdrawal_fees_in_shares_batch(shares, ppfs, 18, 10, supplies, balances)
+
+    assert [int(fee) for fee in fees] == [
+        get_withdrawal_fees_in_shares(shares[i], ppfs[i], 18, 10, supplies[i], balances[i])
+        for i in range(500)
+    ]
+
+
+def test_numpy_int64_inputs_above_the_safe_bound():
+    ## int64 arrays whose products overflow take the exact path with Python ints
+    np = pytest.importorskip("numpy")
+    fees = get_report_fees_batch(
+        np.array([10 ** 17]),
+        1_000,
+        1_000,
+        200,
+        np.array([86400]),
+        np.array([4 * E18]),
+        np.array([5 * E18]),
+    )
+    expected = get_report_fees(10 ** 17, 1_000, 1_000, 200, 86400, 4 * E18, 5 * E18)
+    assert expected.shares_perf_treasury == 7874440147339675
+    for key in ("shares_perf_treasury", "shares_management", "shares_perf_strategist"):
+        assert report_column(fees, key) == [expected[key]]
+
+    shares = from_want_to_shares_batch(np.array([2 ** 40]), np.array([2 ** 40]), 3)
+    assert [int(value) for value in shares] == [from_want_to_shares(2 ** 40, 2 ** 40, 3)]
+
+    shares, ppfs, supplies, balances = (
+        np.array(scenarios(200, magnitude * E18), dtype=np.int64) for magnitude in (9, 8, 7, 6)
+    )
+    fees = get_withdrawal_fees_in_shares_batch(shares, ppfs, np.int64(18), 10, supplies, balances)
+    assert [int(fee) for fee in fees] == [
+        get_withdrawal_fees_in_shares(
+            int(shares[i]), int(ppfs[i]), 18, 10, int(supplies[i]), int(balances[i])
+        )
+        for i in range(200)
+    ]
@@ -0,0 +1,89 @@
+import pytest
+
+from helpers.multicall import MISSING
+from helpers.snapshot.snap import ABSENT, Snap, SnapSchema
+
+
+def test_get_raises_on_unknown_keys():
+    snap = Snap({"sett.balance": 10}, 1, [])
+    assert snap.get("sett.balance") == 10
+    with pytest.raises(Exception, match="Key sett.pricePerFullShare not found in snap data"):
+        snap.get("sett.pricePerFullShare")
+
+    ## A key another snap of the schema has is still unknown here
+    other = Snap({"sett.pricePerFullShare": 1}, 2, [], schema=snap.schema)
+    assert other.get("sett.pricePerFullShare") == 1
+    with pytest.raises(Exception, match="not found"):
+        snap.get("sett.pricePerFullShare")
+    with pytest.raises(KeyError):
+        snap.balances("want", "user")
+
+
+def test_data_view():
+    snap = Snap({"sett.balance": 10, "sett.totalSupply": 5}, 1, [])
+    data = snap.data
+
+    assert dict(data) == {"sett.balance": 10, "sett.totalSupply": 5}
+    assert list(data) == ["sett.balance", "sett.totalSupply"]
+    assert "sett.balance" in data and "unknown" not in data
+    assert data.get("unknown") is None
+    with pytest.raises(KeyError):
+        data["unknown"]
+
+    ## Writes go through to the snap
+    data["balances.want.user"] = 3
+    assert snap.balances("want", "user") == 3
+    assert data.items() == {"sett.balance": 10, "sett.totalSupply": 5, "balances.want.user": 3}.items()
+
+
+def test_missing_is_a_value():
+    snap = Snap({"sett.balance": MISSING, "sett.totalSupply": 5}, 1, [])
+    assert "sett.balance" in snap.data
+    assert snap.get("sett.balance") is MISSING
+    assert snap.missing() == ["sett.balance"]
+
+
+def test_delete_and_len():
+    snap = Snap({"sett.balance": 10, "sett.totalSupply": 5, "sett.available": 0}, 1, [])
+    assert len(snap.data) == 3
+
+    del snap.data["sett.totalSupply"]
+    assert len(snap.data) == 2
+    assert "sett.totalSupply" not in snap.data
+    assert snap.value("sett.totalSupply") is ABSENT
+    assert list(snap.data) == ["sett.balance", "sett.available"]
+    with pytest.raises(KeyError):
+        del snap.data["sett.totalSupply"]
+    with pytest.raises(KeyError):
+        del snap.data["unknown"]
+
+    ## The slot stays in the schema and can be set again
+    snap.set("sett.totalSupply", 6)
+    assert len(snap.data) == 3
+    assert snap.get("sett.totalSupply") == 6
+
+
+def test_schema_grows_across_snaps():
+    schema = SnapSchema()
+    first = Snap({"a": 1, "b": 2}, 1, [], schema=schema)
+    second = Snap({"b": 3, "c": 4}, 2, [], schema=schema)
+    assert schema.keys == ["a", "b", "c"]
+    assert len(schema) == 3
+    ## One slot per key, whichever snap added it
+    assert schema.find("b") == schema.slot("b") == 1
+    assert schema.find("d") is None
+
+    ## first predates "c", its values list is shorter than the schema
+    assert len(first.values) == 2
+    assert first.value("c") is ABSENT
+    assert "c" not in first.data and len(first.data) == 2
+    first.set("d", 5)
+    assert schema.keys == ["a", "b", "c", "d"]
+    assert first.values == [1, 2, ABSENT, 5]
+    assert second.value("d") is ABSENT
+    assert dict(second.data) == {"b": 3, "c": 4}
+
+    ## Snaps with their own schema share nothing
+    alone = Snap({"c": 1}, 3, [])
+    assert alone.schema is not schema
+    assert alone.schema.keys == ["c"]
@@ -0,0 +1,175 @@
+from dotmap import DotMap
+from eth_abi import encode_single
+from rpc_stub import StubRPC, stub_manager
+
+from helpers.multicall import Call, func
+from helpers.snapshot.receipt import (
+    STAKE_GMX,
+    TRANSFER,
+    VESTER_DEPOSIT,
+    dirty_from_logs,
+    event_topic,
+)
+from helpers.snapshot.snap import Snap
+
+WANT = "0xfc5A1A6EB076a2C7aD06eD22C90d7E710E35ad0a"
+VESTER = "0x199070DDfd1CFb69173aa2F7e20906F26B363004"
+REWARD_ROUTER = "0xA906F338CB21815cBc4Bc87ace9e68c87eF8d8F1"
+STAKED_TRACKER = "0x908C4D94D34924765f1eDc22A1DD098397c59dD4"
+SETT = "0x00000000000000000000000000000000000005e7"
+ENTITIES = {
+    "user": "0x00000000000000000000000000000000000000aa",
+    "strategy": "0x00000000000000000000000000000000000000bb",
+    "treasury": "0x00000000000000000000000000000000000000cc",
+}
+
+
+def topic(address):
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def transfer(token, sender, receiver, amount):
+    return {
+        "address": token,
+        "topics": [TRANSFER, topic(sender), topic(receiver)],
+        "data": "0x" + encode_single("uint256", amount).hex(),
+    }
+
+
+def stake_gmx(account, amount):
+    return {
+        "address": REWARD_ROUTER,
+        "topics": ["0x" + STAKE_GMX.hex()],
+        "data": encode_single("(address,address,uint256)", [account, WANT, amount]),
+    }
+
+
+def vester_deposit(account, amount):
+    return {
+        "address": VESTER,
+        "topics": [VESTER_DEPOSIT],
+        "data": "0x" + encode_single("(address,uint256)", [account, amount]).hex(),
+    }
+
+
+def snap_calls(entities=ENTITIES):
+    calls = []
+    for tokenKey, token in (("want", WANT), ("GmxVester", VESTER)):
+        for entityKey, entity in entities.items():
+            calls.append(
+                Call(token, [func.erc20.balanceOf, entity], [["balances." + tokenKey + "." + entityKey, None]])
+            )
+    calls.append(
+        Call(
+            STAKED_TRACKER,
+            [func.stakedGmxTracker.depositBalances, entities["strategy"], WANT],
+            [["depositBalances.sgTracker", None]],
+        )
+    )
+    calls.append(Call(SETT, [func.sett.balance], [["sett.balance", None]]))
+    return calls
+
+
+def test_dirty_from_logs():
+    user, strategy = ENTITIES["user"], ENTITIES["strategy"]
+    logs = [
+        transfer(WANT, user, strategy, 10),
+        stake_gmx(strategy, 10),
+        vester_deposit(user, 5),
+        ## ERC721 Transfer has the id indexed too, and unknown events are skipped
+        {"address": WANT, "topics": [TRANSFER, topic(user), topic(strategy), bytes(32)], "data": "0x"},
+        {"address": WANT, "topics": [event_topic("Sync(uint112,uint112)")], "data": bytes(64)},
+        {"address": WANT, "topics": [], "data": "0x"},
+    ]
+    dirty = dirty_from_logs(logs)
+
+    assert dirty.balances == {
+        (WANT.lower(), user),
+        (WANT.lower(), strategy),
+        (VESTER.lower(), user),
+    }
+    assert dirty.stakers == {strategy}
+
+    refetched = {
+        name for call in snap_calls() if dirty.needs_refetch(call) for name, _ in call.returns
+    }
+    assert refetched == {
+        "balances.want.user",
+        "balances.want.strategy",
+        "balances.GmxVester.user",
+        "depositBalances.sgTracker",
+        "sett.balance",
+    }
+
+
+class Account:
+    def __init__(self, address):
+        self.address = address
+
+    def __str__(self):
+        return self.address
+
+
+def test_needs_refetch_takes_accounts():
+    ## snap passes brownie Accounts as call args, they have no lower()
+    user, strategy = ENTITIES["user"], ENTITIES["strategy"]
+    dirty = dirty_from_logs([transfer(WANT, user, strategy, 10), stake_gmx(strategy, 10)])
+    accounts = {key: Account(entity) for key, entity in ENTITIES.items()}
+    refetched = {
+        name for call in snap_calls(accounts) if dirty.needs_refetch(call) for name, _ in call.returns
+    }
+    assert refetched == {
+        "balances.want.user",
+        "balances.want.strategy",
+        "depositBalances.sgTracker",
+        "sett.balance",
+    }
+
+
+def test_depositBalances_follows_transfers_of_the_tracker():
+    dirty = dirty_from_logs([transfer(STAKED_TRACKER, ENTITIES["treasury"], ENTITIES["strategy"], 1)])
+    (depositBalances,) = [call for call in snap_calls() if call.function == func.stakedGmxTracker.depositBalances]
+    assert dirty.needs_refetch(depositBalances)
+    assert not dirty_from_logs([]).needs_refetch(depositBalances)
+
+
+def test_snap_after_copies_untouched_balances(monkeypatch):
+    user, strategy = ENTITIES["user"], ENTITIES["strategy"]
+    fetched = []
+
+    def fetch(calls, block):
+        fetched.append(block)
+        fetched.extend(name for call in calls for name, _ in call.returns)
+        return {name: 2 for call in calls for name, _ in call.returns}
+
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, snap_calls(), entities=dict(ENTITIES))
+        monkeypatch.setattr(manager, "fetch", fetch)
+
+        names = [name for call in snap_calls() for name, _ in call.returns]
+        before = Snap({name: 1 for name in names}, 10, list(ENTITIES), schema=manager.schema)
+        tx = DotMap(block_number=11, logs=[transfer(WANT, user, strategy, 10), vester_deposit(user, 5)])
+        after = manager.snap_after(before, tx)
+
+    ## Only the balances the logs touched and the non balance metrics are refetched
+    assert fetched == [
+        11,
+        "balances.want.user",
+        "balances.want.strategy",
+        "balances.GmxVester.user",
+        "sett.balance",
+    ]
+    assert after.block == 11
+    assert manager.snaps[11] is after
+    assert {name: after.get(name) for name in names} == {
+        "balances.want.user": 2,
+        "balances.want.strategy": 2,
+        "balances.want.treasury": 1,
+        "balances.GmxVester.user": 2,
+        "balances.GmxVester.strategy": 1,
+        "balances.GmxVester.treasury": 1,
+        "depositBalances.sgTracker": 1,
+        "sett.balance": 2,
+    }
+    ## before is left as it was
+    assert {before.get(name) for name in names} == {1}
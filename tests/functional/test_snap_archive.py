@@ -0,0 +1,130 @@
+import pytest
+
+from helpers.multicall import MISSING
+from helpers.snapshot.archive import MAGIC, ArchiveReader, ArchiveWriter
+from helpers.snapshot.snap import ABSENT, Snap, SnapSchema
+
+
+def history():
+    """
+    Snaps with negative deltas, keys coming and going, MISSING values, entity changes
+    and ints far above 2**64
+    """
+    schema = SnapSchema()
+    rows = [
+        {"sett.balance": 10 ** 18, "sett.totalSupply": 2 ** 200, "paused": False},
+        {"sett.balance": 10 ** 18 - 5, "sett.totalSupply": 2 ** 200 - 2 ** 70, "paused": False},
+        {"sett.balance": 0, "sett.totalSupply": 2 ** 256 - 1, "paused": True, "balances.want.user": 7},
+        {"sett.balance": -(2 ** 100), "sett.totalSupply": 1, "balances.want.user": MISSING},
+        {"sett.balance": 3, "sett.totalSupply": 1, "balances.want.user": 8, "name": "GMX"},
+        {"sett.balance": 3, "sett.totalSupply": 1, "name": "GMX", "pair": (1, -1, b"\x00\xff")},
+        {"sett.balance": 1, "sett.totalSupply": True, "pair": (1, -1, b"\x00\xff")},
+        {},
+        {"sett.balance": 2 ** 64, "sett.totalSupply": 2 ** 64 + 1},
+    ]
+    entities = [["user"], ["user"], ["user", "treasury"], ["user", "treasury"], ["user"]]
+    return [
+        Snap(data, 100 + 10 * i, entities[min(i, len(entities) - 1)], schema=schema)
+        for i, data in enumerate(rows)
+    ]
+
+
+def same(a, b):
+    assert a.block == b.block
+    assert a.entityKeys == b.entityKeys
+    assert dict(a.data) == dict(b.data)
+    ## True and 1 compare equal, the archive must keep the type
+    assert [type(value) for value in a.data.values()] == [type(b.data[key]) for key in a.data]
+
+
+def write(path, snaps, interval):
+    with ArchiveWriter(path, keyframe_interval=interval) as archive:
+        for snap in snaps:
+            archive.write(snap)
+
+
+@pytest.mark.parametrize("interval", [1, 2, 3, 4, 256])
+def test_round_trip_across_keyframe_boundaries(tmp_path, interval):
+    path = str(tmp_path / "snaps.arc")
+    snaps = history()
+    write(path, snaps, interval)
+    reader = ArchiveReader(path)
+
+    assert len(reader) == len(snaps)
+    assert reader.keyframes == list(range(0, len(snaps), interval))
+    ## Random access, in reverse so nothing depends on the previous read
+    for snap in reversed(snaps):
+        assert snap.block in reader
+        same(reader[snap.block], snap)
+    for archived, snap in zip(reader, snaps):
+        same(archived, snap)
+
+
+def test_missing_and_absent_values(tmp_path):
+    path = str(tmp_path / "snaps.arc")
+    snaps = history()
+    write(path, snaps, 4)
+    reader = ArchiveReader(path)
+
+    snap = reader[130]
+    assert snap.get("balances.want.user") is MISSING
+    assert snap.missing() == ["balances.want.user"]
+    ## Removed keys are ABSENT, not None or MISSING
+    assert snap.value("paused") is ABSENT
+    assert "balances.want.user" not in reader[150].data
+    assert len(reader[170].data) == 0
+
+
+def test_at_and_unknown_blocks(tmp_path):
+    path = str(tmp_path / "snaps.arc")
+    write(path, history(), 3)
+    reader = ArchiveReader(path)
+
+    assert reader.at(135).block == 130
+    assert reader.at(10 ** 9).block == 180
+    with pytest.raises(KeyError):
+        reader[135]
+    with pytest.raises(KeyError):
+        reader.at(99)
+    assert 99 not in reader
+
+
+def test_blocks_must_increase(tmp_path):
+    with ArchiveWriter(str(tmp_path / "snaps.arc")) as archive:
+        archive.write(Snap({"a": 1}, 10, []))
+        with pytest.raises(ValueError):
+            archive.write(Snap({"a": 1}, 10, []))
+
+
+def test_unsupported_values(tmp_path):
+    with ArchiveWriter(str(tmp_path / "snaps.arc")) as archive:
+        with pytest.raises(TypeError):
+            archive.write(Snap({"a": 1.5}, 10, []))
+
+
+def test_rejects_other_formats_and_versions(tmp_path):
+    path = str(tmp_path / "snaps.arc")
+    write(path, history(), 3)
+    with open(path, "rb") as file:
+        content = file.read()
+
+    other = tmp_path / "other.arc"
+    other.write_bytes(b"SQLite format 3\x00" + content)
+    with pytest.raises(ValueError, match="not a snapshot archive"):
+        ArchiveReader(str(other))
+
+    other.write_bytes(b"SNAP")
+    with pytest.raises(ValueError, match="not a snapshot archive"):
+        ArchiveReader(str(other))
+
+    other.write_bytes(MAGIC[:-1] + b"2" + content[len(MAGIC) :])
+    with pytest.raises(ValueError, match="version 2"):
+        ArchiveReader(str(other))
+
+    other.write_bytes(content[:-3])
+    with pytest.raises(ValueError, match="truncated"):
+        ArchiveReader(str(other))
+
+    other.write_bytes(content + b"\x09\x00")
+    with pytest.raises(ValueError, match="Unknown record kind"):
+        ArchiveReader(str(other))
@@ -0,0 +1,82 @@
+from dotmap import DotMap
+from rpc_stub import BLOCK, StubRPC, stub_manager
+
+from helpers import SnapshotManager
+from helpers.multicall import MISSING
+from helpers.multicall.calldata import encode_address
+
+WANT = "0xfc5A1A6EB076a2C7aD06eD22C90d7E710E35ad0a"
+SETT = "0x00000000000000000000000000000000000005e7"
+
+
+class Account:
+    """
+    Like a brownie Account or Contract: str() is the checksummed address, there is no lower()
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+    def __str__(self):
+        return self.address
+
+
+def address(i):
+    return "0x{:040X}".format(i)
+
+
+class FakeMulticall:
+    """
+    Returns the holder's address as its balance, holder 3 reverts
+    """
+
+    instances = []
+
+    def __init__(self, calls, block=None, chunk_size=None, require_success=True):
+        self.calls = calls
+        self.block = block
+        self.chunk_size = chunk_size
+        self.stats = {"rpc": 1, "direct": 0, "request_bytes": 0, "response_bytes": 0}
+        FakeMulticall.instances.append(self)
+
+    def __call__(self):
+        result = {}
+        for call in self.calls:
+            holder = int.from_bytes(call.data[-20:], "big")
+            ((key, _),) = call.returns
+            result[key] = MISSING if holder == 3 else holder
+        return result
+
+
+def test_snap_holders_takes_accounts(monkeypatch):
+    FakeMulticall.instances = []
+    monkeypatch.setattr(SnapshotManager, "Multicall", FakeMulticall)
+    holders = [Account(address(1)), address(2), Account(address(3)), address(1).lower(), Account(address(4))]
+
+    with StubRPC() as rpc:
+        manager = stub_manager(
+            monkeypatch,
+            rpc,
+            [],
+            allow_failure=True,
+            tokens={"want": DotMap(address=WANT), "sett": DotMap(address=SETT)},
+        )
+        result = manager.snap_holders(iter(holders), chunk_size=2)
+
+    ## Duplicates are dropped across chunks, whatever their type or case
+    assert result.holders == [address(i) for i in (1, 2, 3, 4)]
+    assert [len(multi.calls) for multi in FakeMulticall.instances] == [4, 2, 2]
+    assert {multi.block for multi in FakeMulticall.instances} == {BLOCK}
+    for multi in FakeMulticall.instances:
+        for call in multi.calls:
+            (((tokenKey, i), _),) = call.returns
+            assert call.data[4:] == encode_address(result.holders[i])
+
+    assert result.block == BLOCK
+    assert result.column("want") == [1, 2, MISSING, 4]
+    assert result.balance("sett", Account(address(2))) == 2
+    assert result.row(Account(address(4))) == {"want": 4, "sett": 4}
+    assert Account(address(1)) in result and address(4).lower() in result
+    assert Account(address(5)) not in result
+    assert result.missing() == [("want", address(3)), ("sett", address(3))]
+    assert result.total("want") == 7
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from helpers.multicall import MISSING
+from helpers.snapshot.snap import Snap, SnapSchema
+from helpers.snapshot.store import SnapStore
+
+
+def make_snap(schema, block, **values):
+    data = {"sett.balance": block * 10, "sett.totalSupply": block}
+    data.update(values)
+    return Snap(data, block, ["user", "sett"], schema=schema)
+
+
+def fill(store, blocks):
+    for block in blocks:
+        store[block] = make_snap(store.schema, block)
+
+
+def test_spills_past_the_window():
+    store = SnapStore(SnapSchema(), window=2)
+    fill(store, [1, 2])
+    assert store.db is None
+
+    fill(store, [3, 4, 5])
+    assert list(store.memory) == [4, 5]
+    assert store._disk_blocks() == [1, 2, 3]
+    assert len(store) == 5
+    assert list(store) == [1, 2, 3, 4, 5]
+
+    ## Spilled snaps load back with their values and entities
+    snap = store[2]
+    assert snap.block == 2
+    assert snap.entityKeys == ["user", "sett"]
+    assert dict(snap.data) == {"sett.balance": 20, "sett.totalSupply": 2}
+    store.close()
+
+
+def test_without_window_nothing_is_written():
+    store = SnapStore(SnapSchema())
+    fill(store, range(100))
+    assert store.db is None and store.path is None
+    assert len(store) == 100
+
+
+def test_values_round_trip():
+    store = SnapStore(SnapSchema(), window=1)
+    store[1] = make_snap(store.schema, 1, **{"sett.missing": MISSING, "big": 2 ** 200, "pair": (1, "a")})
+    store[2] = make_snap(store.schema, 2)
+
+    snap = store[1]
+    assert snap.get("sett.missing") is MISSING
+    assert snap.get("big") == 2 ** 200
+    assert snap.get("pair") == (1, "a")
+    assert snap.missing() == ["sett.missing"]
+    store.close()
+
+
+def test_column_and_range_queries():
+    store = SnapStore(SnapSchema(), window=2)
+    fill(store, [10, 20, 30, 40, 50])
+
+    assert store.column("sett.totalSupply") == [(b, b) for b in (10, 20, 30, 40, 50)]
+    ## Bounds are inclusive and span disk and memory
+    assert store.column("sett.balance", 20, 40) == [(20, 200), (30, 300), (40, 400)]
+    assert store.column("sett.balance", start=35) == [(40, 400), (50, 500)]
+    assert store.column("unknown") == []
+
+    assert [snap.block for snap in store.range(15, 45)] == [20, 30, 40]
+    assert [snap.block for snap in store.range()] == [10, 20, 30, 40, 50]
+    assert store.blocks(end=20) == [10, 20]
+    store.close()
+
+
+def test_overwrite_and_delete():
+    store = SnapStore(SnapSchema(), window=1)
+    fill(store, [1, 2])
+    store[1] = make_snap(store.schema, 1, **{"sett.balance": 7})
+    assert store[1].get("sett.balance") == 7
+    assert len(store) == 2
+
+    del store[1]
+    del store[2]
+    assert len(store) == 0
+    with pytest.raises(KeyError):
+        store[1]
+    with pytest.raises(KeyError):
+        del store[3]
+    store.close()
+
+
+def test_close_removes_the_temporary_file():
+    store = SnapStore(SnapSchema(), window=1)
+    fill(store, [1, 2])
+    path = store.path
+    assert os.path.exists(path)
+
+    store.close()
+    assert not os.path.exists(path)
+    assert store.path is None
+    store.close()
+
+
+def test_close_keeps_a_given_path(tmp_path):
+    path = str(tmp_path / "snaps.sqlite")
+    store = SnapStore(SnapSchema(), window=1, path=path)
+    fill(store, [1, 2, 3])
+    store.close()
+    assert os.path.exists(path)
+
+    ## Reopening the file finds the spilled snaps
+    reopened = SnapStore(store.schema, window=1, path=path)
+    reopened._connect()
+    assert len(reopened) == 2
+    assert reopened.column("sett.totalSupply") == [(1, 1), (2, 2)]
+    reopened.close()
+    assert os.path.exists(path)
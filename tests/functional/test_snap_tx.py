@@ -0,0 +1,83 @@
+import pytest
+from dotmap import DotMap
+from eth_abi import encode_single
+from rpc_stub import BLOCK, StubRPC, stub_manager
+
+from helpers.multicall import Call, func
+from helpers.snapshot.receipt import TRANSFER
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+HOLDERS = ["0x{:040x}".format(i + 1) for i in range(4)]
+KEYS = ["balances." + str(i) for i in range(len(HOLDERS))]
+
+
+def balance_calls():
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, holder], [[key, None]])
+        for key, holder in zip(KEYS, HOLDERS)
+    ]
+
+
+def topic(address):
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def sender(rpc):
+    """
+    Mines a block moving 1 from the first holder to the third, returns its receipt
+    """
+
+    def send():
+        block = rpc.mine({HOLDERS[0]: -1, HOLDERS[2]: 1})
+        log = {
+            "address": TOKEN,
+            "topics": [TRANSFER, topic(HOLDERS[0]), topic(HOLDERS[2])],
+            "data": "0x" + encode_single("uint256", 1).hex(),
+        }
+        return DotMap(block_number=block, logs=[log])
+
+    return send
+
+
+def values(snap):
+    return {key: snap.get(key) for key in KEYS}
+
+
+def run(monkeypatch, **attrs):
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, balance_calls(), **attrs)
+        ## A block mined before the tx, so before must not read an older one
+        rpc.mine({HOLDERS[1]: 10})
+        before, tx, after = manager.snap_tx(sender(rpc), {}, action="deposit")
+    return before, tx, after
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_derive_before_matches_sequential_snaps(monkeypatch, incremental):
+    sequential = run(monkeypatch, incremental=incremental)
+    derived = run(monkeypatch, incremental=incremental, derive_before=True)
+
+    for before, tx, after in (sequential, derived):
+        assert tx.block_number == BLOCK + 2
+        assert (before.block, after.block) == (tx.block_number - 1, tx.block_number)
+        assert values(before) == {"balances.0": 1, "balances.1": 12, "balances.2": 3, "balances.3": 4}
+        assert values(after) == {"balances.0": 0, "balances.1": 12, "balances.2": 4, "balances.3": 4}
+        assert before.entityKeys == after.entityKeys == []
+
+    (before, _, after), (derivedBefore, _, derivedAfter) = sequential, derived
+    assert values(derivedBefore) == values(before)
+    assert values(derivedAfter) == values(after)
+
+
+def test_snap_around_reads_the_parent_block(monkeypatch):
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, balance_calls())
+        tx = sender(rpc)()
+        rpc.mine({HOLDERS[3]: 100})
+        before, after = manager.snap_around(tx)
+
+    ## Pinned to the tx block and its parent, not the current height
+    assert (before.block, after.block) == (BLOCK, BLOCK + 1)
+    assert values(before) == {"balances.0": 1, "balances.1": 2, "balances.2": 3, "balances.3": 4}
+    assert values(after) == {"balances.0": 0, "balances.1": 2, "balances.2": 4, "balances.3": 4}
+    assert sorted(call["params"][1] for call in rpc.calls()) == [hex(BLOCK), hex(BLOCK + 1)]
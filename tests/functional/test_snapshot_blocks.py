@@ -0,0 +1,78 @@
+from collections import Counter
+
+from rpc_stub import BLOCK, StubRPC, stub_manager
+
+from helpers.multicall import Call, func
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+BLOCK_HASH = "0x" + "ab" * 32
+## More than DEFAULT_CHUNK_SIZE, so every snap is two chunked eth_calls
+COUNT = 600
+
+
+def balance_calls():
+    return [
+        Call(TOKEN, [func.erc20.balanceOf, "0x{:040x}".format(i + 1)], [["balances." + str(i), None]])
+        for i in range(COUNT)
+    ]
+
+
+def check_values(snap):
+    assert [snap.get("balances." + str(i)) for i in range(COUNT)] == list(range(1, COUNT + 1))
+
+
+def block_params(rpc):
+    return [call["params"][1] for call in rpc.calls()]
+
+
+def test_snap_defaults_to_current_height(monkeypatch):
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, balance_calls())
+        snap = manager.snap()
+
+    check_values(snap)
+    assert snap.block == BLOCK
+    assert block_params(rpc) == [hex(BLOCK)] * 2
+
+
+def test_snap_at_block_number(monkeypatch):
+    with StubRPC() as rpc:
+        manager = stub_manager(monkeypatch, rpc, balance_calls())
+        snap = manager.snap(block=100)
+
+    check_values(snap)
+    assert snap.block == 100
+    assert manager.snaps[100] is snap
+    assert block_params(rpc) == [hex(100)] * 2
+
+
+def test_snap_at_block_hash(monkeypatch):
+    with StubRPC(blocks={BLOCK_HASH: 321}) as rpc:
+        manager = stub_manager(monkeypatch, rpc, balance_calls())
+        snap = manager.snap(block=BLOCK_HASH)
+        ## HexBytes / bytes hashes as brownie returns them
+        raw = manager.snap(block=bytes.fromhex(BLOCK_HASH[2:]))
+
+    check_values(snap)
+    check_values(raw)
+    assert snap.block == raw.block == 321
+    ## Calls are pinned by hash (EIP-1898), not by the number it resolved to,
+    ## and the second snap of the same hash is read from the cache
+    assert block_params(rpc) == [{"blockHash": BLOCK_HASH}] * 2
+
+
+def test_snap_range_order_and_pinning(monkeypatch):
+    blocks = [7, 3, 9, 5]
+    with StubRPC(jitter=0.01) as rpc:
+        manager = stub_manager(monkeypatch, rpc, balance_calls())
+        snaps = manager.snap_range(blocks, max_workers=4)
+
+    assert list(snaps) == blocks
+    for block, snap in snaps.items():
+        assert snap.block == block
+        check_values(snap)
+    assert manager.snaps.blocks() == sorted(blocks)
+
+    ## Both chunks of every snap read its block, and nothing reads latest
+    assert Counter(block_params(rpc)) == {hex(block): 2 for block in blocks}
+    assert rpc.calls("eth_blockNumber") == []
@@ -0,0 +1,104 @@
+from decimal import Decimal, getcontext
+
+import pytest
+
+from helpers.uniswap_v3 import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    QuoteTable,
+    get_quote_at_tick,
+    get_sqrt_ratio_at_tick,
+    mean_tick,
+)
+
+WETH = "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1"
+GMX = "0xfc5A1A6EB076a2C7aD06eD22C90d7E710E35ad0a"
+MAX_UINT128 = 2 ** 128 - 1
+
+## Outputs of the Solidity TickMath / OracleLibrary
+SQRT_RATIOS = {
+    MIN_TICK: MIN_SQRT_RATIO,
+    MIN_TICK + 1: 4295343490,
+    0: 2 ** 96,
+    MAX_TICK - 1: 1461373636630004318706518188784493106690254656249,
+    MAX_TICK: MAX_SQRT_RATIO,
+}
+## From the Uniswap v3-core TickMath test snapshot, WETH sorts before GMX so the
+## GMX/WETH pool trades around tick 30_000 - 50_000 (20 - 150 GMX per WETH)
+SQRT_RATIOS.update(
+    {
+        5000: 101729702841318637793976746270,
+        -5000: 61703726247759831737814779831,
+        50000: 965075977353221155028623082916,
+        -50000: 6504256538020985011912221507,
+        150000: 143194173941309278083010301478497,
+        -150000: 43836292794701720435367485,
+        500000: 5697689776495288729098254600827762987878,
+        -500000: 1101692437043807371,
+    }
+)
+QUOTES = [
+    (0, 10 ** 18, WETH, GMX, 10 ** 18),
+    (MIN_TICK, MAX_UINT128, WETH, GMX, 1),
+    (MAX_TICK, MAX_UINT128, GMX, WETH, 1),
+    ## 1 WETH is 148.37 GMX at tick 50_000
+    (50000, 10 ** 18, WETH, GMX, 148376062923074618982),
+    (50000, 10 ** 18, GMX, WETH, 6739631584094859),
+    (50000, 12345 * 10 ** 18, WETH, GMX, 1831702496785356171342586),
+    (50000, 12345 * 10 ** 18, GMX, WETH, 83200751905651045217),
+    (5000, 10 ** 18, WETH, GMX, 1648680055931175769),
+    (5000, 12345 * 10 ** 18, GMX, WETH, 7487808174538470085541),
+]
+
+
+def test_sqrt_ratio_fixtures():
+    for tick, sqrt_ratio in SQRT_RATIOS.items():
+        assert get_sqrt_ratio_at_tick(tick) == sqrt_ratio
+
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(MAX_TICK + 1)
+
+
+def test_sqrt_ratio_is_close_to_exact():
+    getcontext().prec = 80
+    for tick in range(-50_000, 50_000, 997):
+        exact = (Decimal("1.0001") ** tick).sqrt() * 2 ** 96
+        assert abs(get_sqrt_ratio_at_tick(tick) - exact) / exact < Decimal(10) ** -20
+
+
+def test_quote_fixtures():
+    for tick, amount, base, quote, expected in QUOTES:
+        assert get_quote_at_tick(tick, amount, base, quote) == expected
+
+    with pytest.raises(ValueError, match="^AmountInError$"):
+        get_quote_at_tick(0, MAX_UINT128 + 1, WETH, GMX)
+
+
+def test_quote_table_matches_quote_at_tick():
+    table = QuoteTable(30_000, 50_000)
+    ticks = [45_000, 41_234, 30_000, 5_000, 50_000, 60_000]
+    amounts = [1, 12_345, 10 ** 17, 3 * 10 ** 18]
+    for base, quote in ((WETH, GMX), (GMX, WETH)):
+        assert table.quote_many(ticks, amounts, base, quote) == [
+            [get_quote_at_tick(tick, amount, base, quote) for amount in amounts]
+            for tick in ticks
+        ]
+    with pytest.raises(ValueError, match="^AmountInError$"):
+        table.quote_many(ticks, [MAX_UINT128 + 1], WETH, GMX)
+
+
+def test_quote_table_needs_a_range():
+    with pytest.raises(TypeError):
+        QuoteTable()
+    with pytest.raises(ValueError):
+        QuoteTable(50_000, 30_000)
+    with pytest.raises(ValueError):
+        QuoteTable(MIN_TICK - 1, 0)
+
+
+def test_mean_tick_rounds_down():
+    assert mean_tick(0, 601, 600) == 1
+    assert mean_tick(0, -600, 600) == -1
+    assert mean_tick(0, -601, 600) == -2
@@ -0,0 +1,98 @@
+from decimal import ROUND_FLOOR, Decimal, getcontext
+
+import pytest
+
+from helpers.uniswap_v3 import (
+    PoolSnapshot,
+    SwapRevert,
+    compute_swap_step,
+    get_sqrt_ratio_at_tick,
+    max_amount_in,
+    slippage_table,
+)
+
+WETH = "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1"
+GMX = "0xfc5A1A6EB076a2C7aD06eD22C90d7E710E35ad0a"
+E18 = 10 ** 18
+
+
+def encode_price_sqrt(reserve1, reserve0):
+    getcontext().prec = 60
+    price = (Decimal(reserve1) / Decimal(reserve0)).sqrt() * 2 ** 96
+    return int(price.to_integral_value(rounding=ROUND_FLOOR))
+
+
+def new_pool():
+    tick = 41_950
+    return PoolSnapshot(
+        WETH,
+        GMX,
+        10_000,
+        200,
+        get_sqrt_ratio_at_tick(tick) + 12_345,
+        tick,
+        800 * E18,
+        {40_000: 500 * E18, 41_800: 300 * E18, 42_200: -300 * E18, 44_000: -500 * E18},
+    )
+
+
+def test_swap_step_fixtures():
+    ## Outputs of the Solidity SwapMath.computeSwapStep
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(101, 100)
+    assert compute_swap_step(price, target, 2 * E18, E18, 600) == (
+        target,
+        9975124224178055,
+        9925619580021728,
+        5988667735148,
+    )
+    assert compute_swap_step(price, encode_price_sqrt(10000, 100), 2 * E18, -E18, 600)[1:] == (
+        2 * E18,
+        E18,
+        1200720432259356,
+    )
+    assert compute_swap_step(
+        417332158212080721273783715441582,
+        1452870262520218020823638996,
+        159344665391607089467575320103,
+        -1,
+        1,
+    ) == (417332158212080721273783715441581, 1, 1, 1)
+    assert compute_swap_step(2413, 79887613182836312, 1985041575832132834610021537970, 10, 1872) == (
+        2413,
+        0,
+        0,
+        10,
+    )
+
+
+def test_exact_input_and_output_agree(tmp_path):
+    path = tmp_path / "pool.json"
+    new_pool().save(path)
+    pool = PoolSnapshot.load(path)
+
+    for amount in (10 ** 16, E18, 3 * E18):
+        out = pool.exact_input(WETH, GMX, amount)
+        assert pool.exact_output(WETH, GMX, out) <= amount
+        assert pool.exact_output(WETH, GMX, out, amount_in_maximum=amount) <= amount
+
+    ## Crossing 41_800 on the way down leaves the 40_000 range only
+    result = pool.swap(True, 3 * E18)
+    assert result.tick < 41_800 and result.liquidity == 500 * E18
+
+    with pytest.raises(SwapRevert):
+        pool.exact_input(WETH, GMX, E18, amount_out_minimum=10 ** 30)
+
+
+def test_slippage_table_flags_reverts():
+    pool = new_pool()
+    rows = slippage_table(pool, WETH, GMX, [10 ** 16, E18, 10 * E18], [100, 300, 500])
+
+    assert [row.amountIn for row in rows] == [10 ** 16, E18, 10 * E18]
+    assert all(row.amountOut < row.quote for row in rows)
+    ## Bigger swaps move the price more
+    assert rows[0].impactBps < rows[1].impactBps < rows[2].impactBps
+    assert all(rows[2].reverts[slip] for slip in (100, 300, 500))
+
+    limit = max_amount_in(pool, WETH, GMX, 300, 10 * E18)
+    assert not slippage_table(pool, WETH, GMX, [limit], [300])[0].reverts[300]
+    assert slippage_table(pool, WETH, GMX, [limit + 1], [300])[0].reverts[300]
@@ -0,0 +1,69 @@
+import pytest
+
+from helpers.shares_math import get_withdrawal_fees_in_want
+from helpers.simulator import SimulationManager, SimulationRevert, StrategyModel
+
+from _setup.StrategyResolver import StrategyResolver
+
+E18 = 10 ** 18
+DAY = 24 * 60 * 60
+
+
+def new_simulation(resolver=None):
+    strategy = StrategyModel(weth_rate=E18 // 50, esgmx_rate=E18 // 10, gmx_per_weth=40 * E18)
+    sim = SimulationManager(strategy=strategy, resolver=resolver)
+    sim.fund("user", 100 * E18)
+    return sim
+
+
+def test_simulated_flow_passes_resolver_checks():
+    """
+    Every confirm_* of the resolver holds on the simulated vault
+    """
+    sim = new_simulation(StrategyResolver)
+    overrides = {"from": "user"}
+
+    sim.settDeposit(50 * E18, overrides)
+    sim.settDepositAll(overrides)
+    sim.settEarn(overrides)
+
+    sim.sleep(30 * DAY)
+    sim.settHarvest(overrides)
+    sim.settTend(overrides)
+
+    sim.sleep(30 * DAY)
+    sim.settHarvest(overrides)
+    sim.settWithdraw(sim.sett.balanceOf("user") // 2, overrides)
+    sim.settWithdrawAll(overrides)
+
+    assert sim.sett.balanceOf("user") == 0
+    assert sim.wantBalances["user"] > 100 * E18
+    assert sim.sett.balanceOf("treasury") > 0
+    assert sim.sett.balanceOf("strategist") > 0
+
+
+def test_withdraw_from_idle_want_takes_fee():
+    sim = new_simulation()
+    overrides = {"from": "user"}
+    sim.settDeposit(10 * E18, overrides)
+
+    shares = sim.sett.balanceOf("user") // 2
+    ppfs = sim.sett.getPricePerFullShare()
+    sim.settWithdraw(shares, overrides)
+
+    fee = get_withdrawal_fees_in_want(shares, ppfs, 18, sim.sett.withdrawalFee)
+    assert sim.wantBalances["user"] == 95 * E18 - fee
+    assert sim.sett.balanceOf("treasury") > 0
+
+
+def test_revert_restores_state():
+    sim = new_simulation()
+    overrides = {"from": "user"}
+    sim.settDeposit(10 * E18, overrides)
+    supply = sim.sett.totalSupply
+
+    with pytest.raises(SimulationRevert):
+        sim.settWithdraw(supply + 1, overrides)
+
+    assert sim.sett.totalSupply == supply
+    assert sim.sett.balanceOf("user") == supply